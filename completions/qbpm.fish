@@ -9,26 +9,62 @@ function __fish_qbpm
     eval qbpm $global_args $saved_args
 end
 
-set -l commands new from-session desktop launch list edit choose
+set -l commands new new-many clone from-session desktop launch list edit choose open ephemeral menus daemon share-adblock dedupe du status top hibernate gc vacuum history session
 set -l data_home (set -q XDG_DATA_HOME; and echo $XDG_DATA_HOME; or echo ~/.local/share)
 
 complete -c qbpm -f
 complete -c qbpm -s h -l help
-complete -c qbpm -s l -l log-level -a "debug info error"
+complete -c qbpm -s l -l log-level -a "debug info warning error"
 complete -c qbpm -s C -l config-dir -r
 complete -c qbpm -s P -l profile-dir -r
 
 complete -c qbpm -n "not __fish_seen_subcommand_from $commands" -a "$commands"
 
-complete -c qbpm -n "__fish_seen_subcommand_from new from_session" -s l -l launch
-complete -c qbpm -n "__fish_seen_subcommand_from new from_session" -l desktop-file
-complete -c qbpm -n "__fish_seen_subcommand_from new from_session" -l no-desktop-file
-complete -c qbpm -n "__fish_seen_subcommand_from new from_session" -l overwrite
-complete -c qbpm -n "__fish_seen_subcommand_from new from_session launch choose" -s f -l foreground
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -s l -l launch
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -l desktop-file
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -l no-desktop-file
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -l overwrite
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -l share-adblock
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session" -l no-share-adblock
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many clone from_session launch choose open ephemeral" -s f -l foreground
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many" -s F -l file -r -F
+complete -c qbpm -n "__fish_seen_subcommand_from new new-many" -s j -l jobs -x
+complete -c qbpm -n "__fish_seen_subcommand_from clone dedupe" -l hardlink
+complete -c qbpm -n "__fish_seen_subcommand_from dedupe gc hibernate" -s n -l dry-run
+complete -c qbpm -n "__fish_seen_subcommand_from dedupe vacuum" -s j -l jobs -x
+complete -c qbpm -n "__fish_seen_subcommand_from du" -s s -l sort -x -a "name total cache webengine history sessions config other"
+complete -c qbpm -n "__fish_seen_subcommand_from du status top" -l json
+complete -c qbpm -n "__fish_seen_subcommand_from du" -l no-cache
+complete -c qbpm -n "__fish_seen_subcommand_from top" -s i -l interval -x
+complete -c qbpm -n "__fish_seen_subcommand_from top" -l once
+complete -c qbpm -n "__fish_seen_subcommand_from hibernate" -s i -l idle -x
+complete -c qbpm -n "__fish_seen_subcommand_from gc" -s b -l budget -x
+complete -c qbpm -n "__fish_seen_subcommand_from vacuum" -l prune-days -x
+complete -c qbpm -n "__fish_seen_subcommand_from history; and not __fish_seen_subcommand_from search" -a search
+complete -c qbpm -n "__fish_seen_subcommand_from search" -s p -l profile -x -a "(__fish_qbpm list)"
+complete -c qbpm -n "__fish_seen_subcommand_from search" -s l -l limit -x
+complete -c qbpm -n "__fish_seen_subcommand_from search" -l glob
+complete -c qbpm -n "__fish_seen_subcommand_from search" -l json
+complete -c qbpm -n "__fish_seen_subcommand_from search" -s o -l open
+complete -c qbpm -n "__fish_seen_subcommand_from from-session" -l compact -x
+complete -c qbpm -n "__fish_seen_subcommand_from from-session" -l split-by -x -a "window domain"
+complete -c qbpm -n "__fish_seen_subcommand_from session; and not __fish_seen_subcommand_from compact" -a compact
+complete -c qbpm -n "__fish_seen_subcommand_from compact" -s s -l session -x
+complete -c qbpm -n "__fish_seen_subcommand_from compact" -l max-history -x
 
+complete -c qbpm -n "__fish_seen_subcommand_from launch choose open ephemeral" -s w -l wait-ready
+complete -c qbpm -n "__fish_seen_subcommand_from launch choose open ephemeral" -l ready-timeout -r
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l nice -x
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l io-class -x -a "realtime best-effort idle"
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l io-priority -x -a "0 1 2 3 4 5 6 7"
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l cpus -x
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l max-address-space -x
+complete -c qbpm -n "__fish_seen_subcommand_from launch" -l max-open-files -x
 complete -c qbpm -n "__fish_seen_subcommand_from launch" -s c -l create
 complete -c qbpm -n "__fish_seen_subcommand_from choose" -s m -l menu -r
-complete -c qbpm -n "__fish_seen_subcommand_from launch choose" -w qutebrowser
+complete -c qbpm -n "__fish_seen_subcommand_from menus" -l probe
+complete -c qbpm -n "__fish_seen_subcommand_from choose" -s o -l order -x -a "alphabetical frecency"
+complete -c qbpm -n "__fish_seen_subcommand_from launch choose ephemeral" -w qutebrowser
 
-complete -c qbpm -n "__fish_seen_subcommand_from launch edit desktop" -a "(__fish_qbpm list)"
+complete -c qbpm -n "__fish_seen_subcommand_from launch edit desktop clone dedupe du status top hibernate vacuum share-adblock compact" -a "(__fish_qbpm list)"
 complete -c qbpm -n "__fish_seen_subcommand_from from-session" -a "(ls $data_home/qutebrowser/sessions | xargs basename -a -s .yml)"
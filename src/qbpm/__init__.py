@@ -1,7 +1,9 @@
-from pathlib import Path
+# imported by qbpm.client before it knows whether the daemon can handle a
+# command, so everything else is imported lazily
+from typing import TYPE_CHECKING
 
-from .log import error
-from .paths import qutebrowser_exe
+if TYPE_CHECKING:
+    from pathlib import Path
 
 try:
     from qbpm.version import version as __version__  # type: ignore
@@ -11,21 +13,25 @@ except ImportError:
 
 class Profile:
     name: str
-    profile_dir: Path
-    root: Path
+    profile_dir: "Path"
+    root: "Path"
 
-    def __init__(self, name: str, profile_dir: Path) -> None:
+    def __init__(self, name: str, profile_dir: "Path") -> None:
         self.name = name
         self.profile_dir = profile_dir
         self.root = self.profile_dir / name
 
     def check_name(self) -> bool:
         if "/" in self.name or self.name in [".", ".."]:
+            from .log import error
+
             error("profile name cannot be a path")
             return False
         return True
 
     def cmdline(self) -> list[str]:
+        from .paths import qutebrowser_exe
+
         return [
             qutebrowser_exe(),
             "-B",
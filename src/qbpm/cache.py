@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from typing import Any
+
+from . import __version__
+from .log import info
+from .paths import default_qbpm_cache_dir
+
+# like git, don't trust an mtime that may not change on the next modification
+RACY_MTIME_NS = 2_000_000_000
+
+# entries this process has already read or written, so a long-running process
+# like the daemon only has to check their keys. Values are kept encoded, so every
+# caller gets its own copy to change.
+_memory: dict[str, tuple[str, str]] = {}
+
+
+def load(name: str, key: object) -> Any:  # noqa: ANN401
+    """Return the JSON value stored as name, or None if it was stored with another
+    key.
+
+    Entries written by other versions of qbpm never match.
+    """
+    encoded_key = json.dumps([__version__, key])
+    if name in _memory:
+        stored_key, value = _memory[name]
+        if stored_key == encoded_key:
+            return json.loads(value)
+    try:
+        text = (default_qbpm_cache_dir() / name).read_text(encoding="utf-8")
+        # the key is on its own line so a mismatch is found without decoding the value
+        stored_key, _, value = text.partition("\n")
+        if stored_key != encoded_key:
+            return None
+        decoded = json.loads(value)
+    except Exception:
+        return None
+    _memory[name] = (encoded_key, value)
+    return decoded
+
+
+def store(name: str, key: object, value: object) -> None:
+    """Store value, which must be representable as JSON, as name."""
+    path = default_qbpm_cache_dir() / name
+    tmp = path.with_name(f".{name}.{os.getpid()}")
+    encoded_key = json.dumps([__version__, key])
+    encoded = json.dumps(value)
+    _memory[name] = (encoded_key, encoded)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(f"{encoded_key}\n{encoded}\n", encoding="utf-8")
+        tmp.replace(path)
+    except OSError as e:
+        info(f"failed to write {path}: {e}")
+
+
+def stable_mtime(mtime_ns: int) -> bool:
+    """Whether a later change to a file with this mtime is sure to update it."""
+    return time.time_ns() - mtime_ns > RACY_MTIME_NS
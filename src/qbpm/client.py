@@ -0,0 +1,72 @@
+"""Hands commands to a running qbpm daemon, if there is one.
+
+This is qbpm's entry point, so it only imports what it needs to talk to the
+daemon and leaves starting the full CLI to when the daemon can't be used.
+"""
+
+import json
+import os
+import socket
+import sys
+
+# commands that don't need anything from the client that the daemon can't copy
+FORWARDED_COMMANDS = {"launch", "choose", "open", "desktop", "ephemeral"}
+# commands that may show a menu, which can run in the client's terminal but not in
+# the daemon, whose stdin is /dev/null. open chooses a profile when no route matches.
+MENU_COMMANDS = {"choose", "open"}
+CONNECT_TIMEOUT = 0.5
+
+
+def socket_path() -> str | None:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        return None
+    return os.path.join(runtime_dir, "qbpm", "daemon.sock")  # noqa: PTH118
+
+
+def forwardable(args: list[str]) -> bool:
+    if not args or args[0] not in FORWARDED_COMMANDS:
+        return False
+    # the daemon can't hand its children the client's terminal
+    if "-f" in args or "--foreground" in args:
+        return False
+    return args[0] not in MENU_COMMANDS or not sys.stdin.isatty()
+
+
+def forward(args: list[str]) -> int | None:
+    """Run a qbpm command in the daemon and return its exit status.
+
+    Returns None if the command has to run in this process instead, because it
+    can't be forwarded or no daemon is running.
+    """
+    path = socket_path()
+    if not path or not forwardable(args):
+        return None
+    request = {"args": args, "cwd": os.getcwd(), "env": dict(os.environ)}  # noqa: PTH109
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(path)
+        except OSError:
+            return None
+        # choose waits on the user, so the response can take arbitrarily long
+        sock.settimeout(None)
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            response = json.loads(sock.makefile("rb").readline())
+        except (OSError, ValueError) as e:
+            # the daemon may already have acted on the command, so don't retry
+            print(f"error: lost connection to qbpm daemon: {e}", file=sys.stderr)
+            return 1
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return int(response["status"])
+
+
+def main() -> None:
+    status = forward(sys.argv[1:])
+    if status is None:
+        from .main import main as cli
+
+        cli()
+    sys.exit(status)
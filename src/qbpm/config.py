@@ -1,11 +1,9 @@
 import os
 import platform
 import sys
-import tomllib
-from dataclasses import dataclass, field, fields
+from dataclasses import dataclass, field, fields, is_dataclass, replace
 from pathlib import Path
-
-import dacite
+from typing import Any, Literal
 
 from . import paths
 from .log import error, or_phrase
@@ -13,9 +11,46 @@ from .log import error, or_phrase
 DEFAULT_CONFIG_FILE = Path(__file__).parent / "config.toml"
 
 
+@dataclass
+class Route:
+    """Urls to open in profile: on domains or their subdomains, matching globs,
+    or matching regexes anywhere."""
+
+    profile: str
+    domains: list[str] = field(default_factory=list)
+    globs: list[str] = field(default_factory=list)
+    regexes: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Resources:
+    """Scheduling priorities, CPUs, and limits to start qutebrowser with. Unset
+    values are inherited from qbpm."""
+
+    nice: int | None = None
+    io_class: Literal["realtime", "best-effort", "idle"] | None = None
+    io_priority: int | None = None
+    # like "0-3,8"
+    cpus: str | None = None
+    # like "16G"
+    max_address_space: str | None = None
+    max_open_files: int | None = None
+
+    def override(self, other: "Resources") -> "Resources":
+        """These resources with the values set in other replacing theirs."""
+        return replace(
+            self,
+            **{
+                f.name: value
+                for f in fields(other)
+                if (value := getattr(other, f.name)) is not None
+            },
+        )
+
+
 @dataclass(kw_only=True)
 class Config:
-    config_py_template: str = """
+    config_py_template: str = """\
 config.source(r'{source_config_py}')
 
 c.window.title_format += ' ({profile_name})'
@@ -23,6 +58,7 @@ c.window.title_format += ' ({profile_name})'
 config.load_autoconfig()
 """
     symlink_autoconfig: bool = False
+    share_adblock_lists: bool = False
     qutebrowser_config_directory: Path | None = None
     profile_directory: Path = field(default_factory=paths.default_profile_dir)
     generate_desktop_file: bool = platform.system() == "Linux"
@@ -33,24 +69,88 @@ config.load_autoconfig()
     menu: str | list[str] = field(default_factory=list)
     menu_prompt: str = "qutebrowser"
     qutebrowser_in_choose: bool = False
+    choose_order: Literal["alphabetical", "frecency"] = "alphabetical"
+    spare_instances: int = 0
+    spare_idle_timeout: float = 30 * 60
+    hibernate_after: float = 0
+    hibernate_exclude: list[str] = field(default_factory=list)
+    routes: list[Route] = field(default_factory=list)
+    resources: dict[str, Resources] = field(default_factory=dict)
 
     @classmethod
     def load(cls, config_file: Path | None) -> "Config":
-        config_file = config_file or DEFAULT_CONFIG_FILE
+        if not config_file:
+            # equivalent to parsing DEFAULT_CONFIG_FILE, but much faster
+            return cls()
+        from . import cache
+
+        try:
+            stat = config_file.stat()
+            # home is part of the key because ~ in paths is expanded while parsing
+            key: tuple | None = (
+                str(config_file.absolute()),
+                stat.st_mtime_ns,
+                stat.st_size,
+                str(Path.home()),
+            )
+            if (cached := cache.load("config", key)) is not None:
+                return cls.from_json(cached)
+        except Exception:
+            key = None
+
+        import tomllib
+
+        import dacite
+
         try:
             data = tomllib.loads(config_file.read_text(encoding="utf-8"))
             if extra := data.keys() - {field.name for field in fields(Config)}:
                 raise RuntimeError(f'unknown config value: "{next(iter(extra))}"')
-            return dacite.from_dict(
+            config = dacite.from_dict(
                 data_class=Config,
                 data=data,
                 config=dacite.Config(
-                    type_hooks={Path: lambda val: Path(val).expanduser()}
+                    type_hooks={Path: lambda val: Path(val).expanduser()},
+                    strict=True,
                 ),
             )
         except Exception as e:
             error(f"loading {config_file} failed with error '{e}'")
             sys.exit(1)
+        if key and cache.stable_mtime(stat.st_mtime_ns):
+            # only cache values that were set so defaults still follow the environment
+            values = {name: json_value(getattr(config, name)) for name in data}
+            cache.store("config", key, values)
+        return config
+
+    @classmethod
+    def from_json(cls, values: dict[str, Any]) -> "Config":
+        """A Config with values already validated by load and converted by
+        json_value."""
+        for f in fields(cls):
+            if f.type in (Path, Path | None) and values.get(f.name) is not None:
+                values[f.name] = Path(values[f.name])
+        if "routes" in values:
+            values["routes"] = [Route(**route) for route in values["routes"]]
+        if "resources" in values:
+            values["resources"] = {
+                name: Resources(**resources)
+                for name, resources in values["resources"].items()
+            }
+        return cls(**values)
+
+
+def json_value(value: object) -> object:
+    """value, a config value or part of one, in a form json can encode."""
+    if isinstance(value, Path):
+        return str(value)
+    if is_dataclass(value) and not isinstance(value, type):
+        return json_value(vars(value))
+    if isinstance(value, dict):
+        return {name: json_value(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [json_value(item) for item in value]
+    return value
 
 
 def find_config(config_path: Path | None) -> Config:
@@ -66,14 +166,19 @@ def find_config(config_path: Path | None) -> Config:
     return Config.load(config_path)
 
 
-def find_qutebrowser_config_dir(
-    qb_config_dir: Path | None, autoconfig: bool = False
-) -> Path | None:
-    dirs = (
+def config_dir_candidates(qb_config_dir: Path | None) -> list[Path]:
+    """Where to look for the qutebrowser config profiles source."""
+    return (
         [qb_config_dir, qb_config_dir / "config"]
         if qb_config_dir
         else list(paths.qutebrowser_config_dirs())
     )
+
+
+def find_qutebrowser_config_dir(
+    qb_config_dir: Path | None, autoconfig: bool = False
+) -> Path | None:
+    dirs = config_dir_candidates(qb_config_dir)
     for config_dir in dirs:
         if (config_dir / "config.py").exists() or (
             autoconfig and (config_dir / "autoconfig.yml").exists()
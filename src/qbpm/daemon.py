@@ -0,0 +1,194 @@
+import io
+import json
+import os
+import signal
+import socket
+import sys
+from contextlib import redirect_stderr, redirect_stdout, suppress
+from pathlib import Path
+from types import FrameType
+
+from . import client
+from .config import Config, find_config
+from .log import error, info
+
+# how long a client gets to send its request before it's dropped
+REQUEST_TIMEOUT = 5
+# how often to look after spare qutebrowser processes when there are no requests
+MAINTENANCE_INTERVAL = 10
+
+
+def serve() -> bool:
+    """Run commands forwarded by qbpm.client until terminated.
+
+    Each request runs in a process forked from this one, so modules are already
+    imported and the config and menu detection are already cached in memory, and
+    a command waiting on a menu doesn't hold up the others. Both caches are keyed
+    on file mtimes, so config changes are picked up by the next request.
+
+    The daemon also keeps the pool of spare qutebrowser processes used by
+    qbpm ephemeral, if spare_instances is set, and hibernates idle profiles, if
+    hibernate_after is set.
+    """
+    path_str = client.socket_path()
+    if not path_str:
+        error("$XDG_RUNTIME_DIR is not set")
+        return False
+    path = Path(path_str)
+    if daemon_running(path):
+        error(f"a qbpm daemon is already listening on {path}")
+        return False
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    warm_up()
+    from . import ephemeral
+    from .hibernate import IdleWatcher
+
+    ephemeral.pool = ephemeral.SparePool()
+    watcher = IdleWatcher()
+    # forwarded commands must not grab the terminal the daemon was started from
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, sys.stdin.fileno())
+    os.close(devnull)
+    signal.signal(signal.SIGTERM, terminate)
+    workers: set[int] = set()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(path))
+        server.listen()
+        server.settimeout(MAINTENANCE_INTERVAL)
+        info(f"listening on {path}")
+        try:
+            while True:
+                with suppress(TimeoutError):
+                    conn, _ = server.accept()
+                    with conn:
+                        if worker := handle(conn, server):
+                            workers.add(worker)
+                workers -= reap(workers)
+                if config := load_config():
+                    ephemeral.pool.maintain(config)
+                    watcher.maintain(config)
+        except (KeyboardInterrupt, Terminated):
+            pass
+        finally:
+            path.unlink(missing_ok=True)
+            ephemeral.pool.shutdown()
+    return True
+
+
+def daemon_running(path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+class Terminated(BaseException):
+    """Raised on SIGTERM. Unlike SystemExit it isn't caught by commands."""
+
+
+def terminate(_signum: int, _frame: FrameType | None) -> None:
+    raise Terminated
+
+
+def warm_up() -> None:
+    from . import choose, desktop, launch, profiles  # noqa: F401
+    from .menus import detect_menu
+
+    load_config()
+    detect_menu()
+
+
+def load_config() -> Config | None:
+    # a broken config is reported to each command that uses it instead
+    with suppress(SystemExit):
+        return find_config(None)
+    return None
+
+
+def handle(conn: socket.socket, server: socket.socket) -> int | None:
+    """Read a request from conn and start running it.
+
+    Returns the pid of the worker process running it, if there is one.
+    """
+    conn.settimeout(REQUEST_TIMEOUT)
+    try:
+        request = json.loads(conn.makefile("rb").readline())
+    except (OSError, ValueError) as e:
+        info(f"dropping bad request: {e}")
+        return None
+    # the command may block on a menu for as long as the user likes
+    conn.settimeout(None)
+    if request["args"][:1] == ["ephemeral"]:
+        # spares are handed out by the pool in this process
+        respond(conn, request)
+        return None
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        return pid
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        server.close()
+        respond(conn, request)
+    finally:
+        # don't run anything the daemon would on its way out
+        os._exit(0)
+
+
+def respond(conn: socket.socket, request: dict) -> None:
+    status, stdout, stderr = run(request["args"], request["cwd"], request["env"])
+    response = {"status": status, "stdout": stdout, "stderr": stderr}
+    try:
+        conn.sendall(json.dumps(response).encode() + b"\n")
+    except OSError as e:
+        info(f"client went away: {e}")
+
+
+def reap(workers: set[int]) -> set[int]:
+    """The workers that have exited."""
+    exited = set()
+    for pid in workers:
+        with suppress(ChildProcessError):
+            if os.waitpid(pid, os.WNOHANG)[0] == 0:
+                continue
+        exited.add(pid)
+    return exited
+
+
+def run(args: list[str], cwd: str, env: dict[str, str]) -> tuple[int, str, str]:
+    """Run a qbpm command as if it had been run by the client.
+
+    Returns its exit status and everything it printed.
+    """
+    from .main import main
+
+    saved_env, saved_cwd = dict(os.environ), Path.cwd()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    try:
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(cwd)
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            main(args, prog_name="qbpm")
+    except SystemExit as e:
+        status = exit_status(e.code, stderr)
+    except Exception as e:
+        stderr.write(f"error: {e}\n")
+        status = 1
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+def exit_status(code: str | int | None, stderr: io.StringIO) -> int:
+    if code is None or isinstance(code, int):
+        return code or 0
+    stderr.write(f"{code}\n")
+    return 1
@@ -0,0 +1,214 @@
+import hashlib
+import mmap
+import os
+import struct
+from collections import defaultdict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import Profile
+from .files import UNSUPPORTED, immutable, walk
+from .log import error, info
+from .processes import running_profiles
+from .units import format_size
+
+# smaller files don't take up enough space to be worth it
+MIN_SIZE = 4096
+# duplicate candidates are first compared by a hash of this many bytes
+PREFIX_SIZE = 64 * 1024
+HASH_CHUNK = 1 << 20
+# hash larger files through mmap, which saves copying them into python
+MMAP_THRESHOLD = 16 << 20
+SQLITE_HEADER = b"SQLite format 3\0"
+# from linux/fs.h
+FIDEDUPERANGE = 0xC0189436
+FILE_DEDUPE_RANGE_DIFFERS = 1
+# filesystems limit how much they dedupe per call, btrfs to 16 MiB
+DEDUPE_CHUNK = 16 << 20
+# qbpm's own files, and files qutebrowser and QtWebEngine write to while running
+EXCLUDED_DIRS = {Path("config"), Path("runtime"), Path("data/sessions")}
+EXCLUDED_NAMES = {"state", "LOCK", "CURRENT", "lockfile"}
+EXCLUDED_SUFFIXES = ("-journal", "-wal", "-shm", ".log")
+
+
+@dataclass(frozen=True)
+class Candidate:
+    path: Path
+    size: int
+    dev: int
+    ino: int
+
+
+def excluded(path: Path) -> bool:
+    return (
+        path in EXCLUDED_DIRS
+        or path.name in EXCLUDED_NAMES
+        or path.name.startswith("MANIFEST-")
+        or path.name.endswith(EXCLUDED_SUFFIXES)
+    )
+
+
+def scan(profile: Profile, hardlink: bool) -> list[Candidate]:
+    candidates = []
+    for entry, _ in walk(profile.root, Path(), excluded):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        st = entry.stat(follow_symlinks=False)
+        # a hardlinked file that's written to changes in every profile
+        if st.st_size >= MIN_SIZE and (not hardlink or immutable(st)):
+            candidates.append(
+                Candidate(Path(entry.path), st.st_size, st.st_dev, st.st_ino)
+            )
+    return candidates
+
+
+def prefix_digest(candidate: Candidate) -> bytes | None:
+    try:
+        with candidate.path.open("rb") as f:
+            prefix = f.read(PREFIX_SIZE)
+    except OSError:
+        return None
+    # sqlite databases are modified in place, and not always named like it
+    if prefix.startswith(SQLITE_HEADER):
+        return None
+    return hashlib.blake2b(prefix).digest()
+
+
+def full_digest(candidate: Candidate) -> bytes | None:
+    digest = hashlib.blake2b()
+    try:
+        with candidate.path.open("rb") as f:
+            if candidate.size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    digest.update(m)
+            else:
+                while chunk := f.read(HASH_CHUNK):
+                    digest.update(chunk)
+    except (OSError, ValueError):
+        return None
+    return digest.digest()
+
+
+def split_groups(
+    groups: list[list[Candidate]],
+    key: Callable[[Candidate], Hashable | None],
+    jobs: int | None,
+) -> list[list[Candidate]]:
+    """Split groups of candidates by key, computed in parallel, dropping candidates
+    whose key is None and groups that no longer contain more than one file."""
+    candidates = [candidate for group in groups for candidate in group]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        keys = dict(zip(candidates, executor.map(key, candidates), strict=True))
+    split: dict[tuple[int, Hashable], list[Candidate]] = defaultdict(list)
+    for i, group in enumerate(groups):
+        for candidate in group:
+            if (k := keys[candidate]) is not None:
+                split[i, k].append(candidate)
+    return [group for group in split.values() if len(group) > 1]
+
+
+def find_duplicates(
+    candidates: list[Candidate], jobs: int | None = None
+) -> list[list[Candidate]]:
+    """Groups of files with the same contents, each with a distinct inode.
+
+    Files are only read if there's another file of the same size, and only read
+    in full if their first PREFIX_SIZE bytes match too.
+    """
+    by_size: dict[tuple[int, int], dict[int, Candidate]] = defaultdict(dict)
+    for candidate in candidates:
+        # hardlinks to the same file are already deduplicated
+        by_size[candidate.dev, candidate.size].setdefault(candidate.ino, candidate)
+    groups = [list(group.values()) for group in by_size.values() if len(group) > 1]
+    groups = split_groups(groups, prefix_digest, jobs)
+    small = [group for group in groups if group[0].size <= PREFIX_SIZE]
+    large = [group for group in groups if group[0].size > PREFIX_SIZE]
+    return small + split_groups(large, full_digest, jobs)
+
+
+def dedupe_range(source: Path, target: Path, size: int) -> int:
+    """Make target share source's extents if their contents are the same.
+
+    The kernel compares the contents itself, so this is safe even if either file
+    changed since it was hashed. Returns the number of bytes deduplicated.
+    """
+    import fcntl
+
+    deduped = 0
+    with source.open("rb") as src, target.open("rb") as dst:
+        for offset in range(0, size, DEDUPE_CHUNK):
+            length = min(DEDUPE_CHUNK, size - offset)
+            arg = bytearray(
+                struct.pack("=QQHHI", offset, length, 1, 0, 0)
+                + struct.pack("=qQQiI", dst.fileno(), offset, 0, 0, 0)
+            )
+            fcntl.ioctl(src.fileno(), FIDEDUPERANGE, arg, True)
+            done, status = struct.unpack_from("=Qi", arg, 40)
+            if status < 0:
+                raise OSError(-status, os.strerror(-status), str(target))
+            if status == FILE_DEDUPE_RANGE_DIFFERS:
+                break
+            deduped += done
+    return deduped
+
+
+def replace_with_link(source: Path, target: Path) -> int:
+    tmp = target.with_name(f".{target.name}.qbpm-dedupe")
+    tmp.unlink(missing_ok=True)
+    tmp.hardlink_to(source)
+    tmp.replace(target)
+    return target.stat().st_size
+
+
+def dedupe(
+    profiles: list[Profile],
+    hardlink: bool = False,
+    dry_run: bool = False,
+    jobs: int | None = None,
+) -> bool:
+    """Deduplicate identical files across profiles with reflinks or hardlinks.
+
+    Reflinks are done with FIDEDUPERANGE, which keeps each file's inode and
+    metadata, so profiles can't tell the difference. With hardlink only
+    read-only files are considered.
+    """
+    running = running_profiles(profiles)
+    stopped = []
+    for profile in profiles:
+        if profile.name in running:
+            info(f"skipping {profile.name}, it is running")
+        else:
+            stopped.append(profile)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        scanned = executor.map(lambda profile: scan(profile, hardlink), stopped)
+        candidates = [candidate for found in scanned for candidate in found]
+    groups = find_duplicates(candidates, jobs)
+    duplicates = sum(len(group) - 1 for group in groups)
+    reclaimable = sum(group[0].size * (len(group) - 1) for group in groups)
+    if dry_run:
+        for group in groups:
+            print(f"{format_size(group[0].size)} x {len(group)}")
+            for candidate in group:
+                print(f"  {candidate.path}")
+        print(f"{duplicates} duplicate files, {format_size(reclaimable)} reclaimable")
+        return True
+
+    def apply(source: Candidate, candidate: Candidate) -> int:
+        if hardlink:
+            return replace_with_link(source.path, candidate.path)
+        return dedupe_range(source.path, candidate.path, source.size)
+
+    reclaimed = 0
+    for source, *others in groups:
+        for candidate in others:
+            try:
+                reclaimed += apply(source, candidate)
+            except OSError as e:
+                if not hardlink and e.errno in UNSUPPORTED:
+                    error("the filesystem doesn't support reflinks, try --hardlink")
+                    return False
+                error(f"deduplicating {candidate.path} failed: {e}")
+    print(f"{duplicates} duplicate files, {format_size(reclaimed)} reclaimed")
+    return True
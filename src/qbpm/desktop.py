@@ -1,4 +1,5 @@
 import textwrap
+from collections.abc import Iterable
 from pathlib import Path
 
 from . import Profile
@@ -21,8 +22,22 @@ MIME_TYPES = [
 def create_desktop_file(
     profile: Profile, application_dir: Path, application_name: str
 ) -> None:
+    create_desktop_files([profile], application_dir, application_name)
+
+
+def create_desktop_files(
+    profiles: Iterable[Profile], application_dir: Path, application_name: str
+) -> None:
+    application_dir.mkdir(parents=True, exist_ok=True)
+    for profile in profiles:
+        text = desktop_entry(profile, application_name)
+        (application_dir / f"{profile.name}.desktop").write_text(text)
+
+
+def desktop_entry(profile: Profile, application_name: str) -> str:
     application_name = application_name.format(profile_name=profile.name)
-    text = textwrap.dedent(f"""\
+    cmdline = " ".join(profile.cmdline())
+    return textwrap.dedent(f"""\
         [Desktop Entry]
         Name={application_name}
         StartupWMClass=qutebrowser
@@ -30,7 +45,7 @@ def create_desktop_file(
         Icon=qutebrowser
         Type=Application
         Categories=Network;WebBrowser;
-        Exec={" ".join([*profile.cmdline(), "--untrusted-args", "%u"])}
+        Exec={cmdline} --untrusted-args %u
         Terminal=false
         StartupNotify=true
         MimeType={";".join(MIME_TYPES)};
@@ -39,11 +54,9 @@ def create_desktop_file(
 
         [Desktop Action new-window]
         Name=New Window
-        Exec={" ".join(profile.cmdline())}
+        Exec={cmdline}
 
         [Desktop Action preferences]
         Name=Preferences
-        Exec={" ".join([*profile.cmdline(), '"qute://settings"'])}
+        Exec={cmdline} "qute://settings"
     """)
-    application_dir.mkdir(parents=True, exist_ok=True)
-    (application_dir / f"{profile.name}.desktop").write_text(text)
@@ -0,0 +1,215 @@
+import shutil
+import subprocess
+import tempfile
+import time
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import Profile, ipc
+from .config import Config
+from .launch import POLL_INTERVAL, launch_qutebrowser
+from .log import error, info
+from .paths import default_ephemeral_profile_dir, qutebrowser_exe
+from .profiles import (
+    create_config,
+    link_adblock_lists,
+    link_autoconfig,
+    link_dictionaries,
+    resolve_qutebrowser_config_dir,
+)
+
+# hard limit on spare_instances, each spare costs a few hundred MB
+MAX_SPARES = 8
+# how long to wait for a spare that is still starting
+SPARE_READY_TIMEOUT = 10
+# ephemeral profiles this recently changed may be starting up, so keep them
+STALE_AGE = 60
+
+
+def create_ephemeral_profile(config: Config) -> Profile | None:
+    """Create a throwaway profile that inherits the qutebrowser config."""
+    qb_config_dir = resolve_qutebrowser_config_dir(config)
+    if not qb_config_dir:
+        return None
+    directory = default_ephemeral_profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # short names leave room for qutebrowser's IPC socket path, which is limited
+    # to about 100 characters
+    root = Path(tempfile.mkdtemp(prefix="", dir=directory))
+    profile = Profile(root.name, directory)
+    (root / "config").mkdir()
+    if config.config_py_template:
+        create_config(profile, qb_config_dir, config.config_py_template)
+    if config.symlink_autoconfig:
+        link_autoconfig(profile, qb_config_dir)
+    link_dictionaries(profile, False)
+    if config.share_adblock_lists:
+        link_adblock_lists(profile, False)
+    return profile
+
+
+def remove_stale_profiles(keep: AbstractSet[Path] = frozenset()) -> None:
+    """Delete ephemeral profiles that are no longer running."""
+    directory = default_ephemeral_profile_dir()
+    if not directory.is_dir():
+        return
+    for root in directory.iterdir():
+        if root in keep:
+            continue
+        try:
+            age = time.time() - root.stat().st_mtime
+        except OSError:
+            continue
+        if age > STALE_AGE and not ipc.is_running(Profile(root.name, directory)):
+            info(f"removing stale ephemeral profile {root}")
+            shutil.rmtree(root, ignore_errors=True)
+
+
+@dataclass
+class Spare:
+    profile: Profile
+    process: subprocess.Popen[bytes]
+
+    @classmethod
+    def start(cls, config: Config) -> "Spare | None":
+        profile = create_ephemeral_profile(config)
+        if not profile:
+            return None
+        process = subprocess.Popen(
+            [*profile.cmdline(), "--nowindow"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        info(f"started spare qutebrowser {process.pid} in {profile.root}")
+        return cls(profile, process)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def ready(self) -> bool:
+        return self.alive() and ipc.socket_path(self.profile).exists()
+
+    def wait_ready(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.alive() and time.monotonic() < deadline:
+            if self.ready():
+                return True
+            time.sleep(POLL_INTERVAL)
+        return self.ready()
+
+    def stop(self) -> None:
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.remove()
+
+    def remove(self) -> None:
+        shutil.rmtree(self.profile.root, ignore_errors=True)
+
+
+@dataclass
+class SparePool:
+    """Idle qutebrowser processes started with --nowindow on ephemeral profiles.
+
+    An ephemeral launch hands its urls to a spare over IPC, which is much faster
+    than waiting for Qt and QtWebEngine to start. The spare then belongs to the
+    user and is replaced by a new one. If no ephemeral launch happens for
+    idle_timeout seconds the spares are stopped until the next one.
+    """
+
+    size: int = 0
+    idle_timeout: float = 30 * 60
+    spares: list[Spare] = field(default_factory=list)
+    # spares that were handed a window, removed once they exit
+    in_use: list[Spare] = field(default_factory=list)
+    last_used: float = field(default_factory=time.monotonic)
+
+    def configure(self, config: Config) -> None:
+        self.size = max(min(config.spare_instances, MAX_SPARES), 0)
+        self.idle_timeout = config.spare_idle_timeout
+
+    def idle(self) -> bool:
+        return time.monotonic() - self.last_used > self.idle_timeout
+
+    def maintain(self, config: Config) -> None:
+        """Clean up exited processes and start or stop spares to match config."""
+        self.configure(config)
+        for spare in [s for s in self.in_use if not s.alive()]:
+            spare.remove()
+            self.in_use.remove(spare)
+        for spare in [s for s in self.spares if not s.alive()]:
+            info(f"spare qutebrowser {spare.process.pid} exited")
+            spare.remove()
+            self.spares.remove(spare)
+        target = 0 if self.idle() else self.size
+        while len(self.spares) > target:
+            self.spares.pop().stop()
+        while len(self.spares) < target and shutil.which(qutebrowser_exe()):
+            if not (started := Spare.start(config)):
+                break
+            self.spares.append(started)
+        remove_stale_profiles(self.keep())
+
+    def take(self) -> Spare | None:
+        """Remove a spare from the pool, waiting for one that is still starting."""
+        self.last_used = time.monotonic()
+        ready = next(filter(Spare.ready, self.spares), None)
+        if not ready:
+            starting = next(filter(Spare.alive, self.spares), None)
+            if starting and starting.wait_ready(SPARE_READY_TIMEOUT):
+                ready = starting
+        if ready:
+            self.spares.remove(ready)
+            self.in_use.append(ready)
+        return ready
+
+    def keep(self) -> set[Path]:
+        return {spare.profile.root for spare in [*self.spares, *self.in_use]}
+
+    def shutdown(self) -> None:
+        for spare in self.spares:
+            spare.stop()
+        self.spares.clear()
+
+
+# set by the daemon, which is the only process that lives long enough for spares
+pool: SparePool | None = None
+
+
+def launch_ephemeral(
+    config: Config,
+    foreground: bool,
+    qb_args: tuple[str, ...],
+    wait_ready: float | None = None,
+) -> bool:
+    handoff = not foreground and ipc.ipc_args(qb_args) is not None
+    if handoff and pool and (spare := pool.take()):
+        sent = ipc.send(spare.profile, ("--target", "window", *qb_args))
+        if not sent:
+            error("could not hand urls to a spare qutebrowser, starting a new one")
+            pool.in_use.remove(spare)
+            spare.stop()
+        # replace the spare right away, the next launch may come soon
+        pool.maintain(config)
+        if sent:
+            print(spare.profile.root)
+            return True
+    if not pool:
+        remove_stale_profiles()
+    profile = create_ephemeral_profile(config)
+    if not profile:
+        return False
+    print(profile.root)
+    result = launch_qutebrowser(profile, foreground, qb_args, wait_ready)
+    if pool:
+        pool.maintain(config)
+    if foreground:
+        shutil.rmtree(profile.root, ignore_errors=True)
+    return result
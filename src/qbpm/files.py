@@ -0,0 +1,142 @@
+import errno
+import os
+import shutil
+import stat
+from collections import Counter
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+
+from .log import info
+
+# from linux/fs.h, shares src's extents with dst on btrfs, xfs, bcachefs, etc.
+FICLONE = 0x40049409
+# errors that mean a copy method isn't supported here rather than that it failed
+UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY}
+COPY_CHUNK = 1 << 20
+
+
+def reflink(src_fd: int, dst_fd: int) -> bool:
+    try:
+        import fcntl
+
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except (ImportError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in UNSUPPORTED:
+            raise
+        return False
+    return True
+
+
+def copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    """Copy with copy_file_range, which avoids passing data through userspace and
+    lets network and copy-on-write filesystems copy on the server or by reference.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    while copied < size:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied)
+        except OSError as e:
+            # only fall back if nothing was copied yet, dst is still empty
+            if copied or e.errno not in UNSUPPORTED:
+                raise
+            return False
+        if n == 0:
+            break
+        copied += n
+    return True
+
+
+def stream(src_fd: int, dst_fd: int) -> None:
+    while chunk := os.read(src_fd, COPY_CHUNK):
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+
+
+def copy_file(src: Path, dst: Path) -> str:
+    """Copy a regular file as cheaply as the filesystem allows.
+
+    Tries a reflink, then copy_file_range, then reading and writing. Returns the
+    method that was used.
+    """
+    with src.open("rb") as src_file, dst.open("xb") as dst_file:
+        src_fd, dst_fd = src_file.fileno(), dst_file.fileno()
+        if reflink(src_fd, dst_fd):
+            method = "reflink"
+        elif copy_range(src_fd, dst_fd, os.fstat(src_fd).st_size):
+            method = "copy_file_range"
+        else:
+            stream(src_fd, dst_fd)
+            method = "copy"
+    shutil.copystat(src, dst)
+    return method
+
+
+def immutable(st: os.stat_result) -> bool:
+    """Whether nothing may write to a file, so hardlinks to it can't diverge."""
+    return not st.st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def copy_tree(
+    src: Path,
+    dst: Path,
+    skip: Callable[[Path], bool] = lambda _: False,
+    hardlink: bool = False,
+    jobs: int | None = None,
+) -> Counter[str]:
+    """Copy the directory src to dst, which must not exist yet.
+
+    Paths relative to src for which skip returns true are left out, along with
+    anything that isn't a regular file, directory, or symlink. With hardlink,
+    read-only files are linked instead of copied. Returns how many files were
+    copied with each method.
+    """
+    methods: Counter[str] = Counter()
+    files: list[tuple[Path, Path, os.stat_result]] = []
+    dirs: list[tuple[Path, Path]] = []
+    dst.mkdir(parents=True)
+    dirs.append((src, dst))
+    for entry, relative in walk(src, Path(), skip):
+        target = dst / relative
+        if entry.is_symlink():
+            target.symlink_to(Path(entry.path).readlink())
+            methods["symlink"] += 1
+        elif entry.is_dir(follow_symlinks=False):
+            target.mkdir()
+            dirs.append((Path(entry.path), target))
+        elif entry.is_file(follow_symlinks=False):
+            files.append((Path(entry.path), target, entry.stat(follow_symlinks=False)))
+
+    def copy(item: tuple[Path, Path, os.stat_result]) -> str:
+        source, target, st = item
+        if hardlink and immutable(st):
+            with suppress(OSError):
+                target.hardlink_to(source)
+                return "hardlink"
+        return copy_file(source, target)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        methods.update(executor.map(copy, files))
+    # copying into a directory changes its mtime, so copy those last
+    for source, target in reversed(dirs):
+        shutil.copystat(source, target)
+    info(", ".join(f"{count} by {method}" for method, count in methods.items()))
+    return methods
+
+
+def walk(
+    directory: Path, relative: Path, skip: Callable[[Path], bool]
+) -> Iterator[tuple[os.DirEntry[str], Path]]:
+    """Entries below directory, each directory before its contents."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            path = relative / entry.name
+            if skip(path):
+                continue
+            yield entry, path
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(Path(entry.path), path, skip)
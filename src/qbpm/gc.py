@@ -0,0 +1,141 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import Profile, ipc
+from .index import ProfileIndex
+from .log import error, info
+from .paths import default_qbpm_cache_dir
+from .processes import running_profiles
+from .units import format_size
+from .usage import tree_size
+
+# directories QtWebEngine and qutebrowser recreate as needed: the whole cache
+# basedir, and GPU and shader caches, which QtWebEngine keeps with persistent data
+CACHE_DIRS = [
+    Path("cache"),
+    *(
+        Path("data/webengine") / name
+        for name in (
+            "GPUCache",
+            "ShaderCache",
+            "GrShaderCache",
+            "GraphiteDawnCache",
+            "DawnCache",
+        )
+    ),
+]
+
+
+@dataclass
+class ProfileCaches:
+    profile: Profile
+    last_used: float
+    dirs: dict[Path, int]
+
+    @property
+    def size(self) -> int:
+        return sum(self.dirs.values())
+
+
+def measure(profile: Profile, last_used: float) -> ProfileCaches:
+    dirs = {}
+    for relative in CACHE_DIRS:
+        path = profile.root / relative
+        # a symlinked cache is somewhere else on purpose, leave it alone
+        if path.is_dir() and not path.is_symlink():
+            dirs[path] = tree_size(path)
+    return ProfileCaches(profile, last_used, dirs)
+
+
+def remove(path: Path) -> None:
+    # move the directory out of the way first, so a qutebrowser that starts while
+    # it's being deleted gets an empty cache instead of half of one
+    trash = path.with_name(f".{path.name}.qbpm-gc")
+    shutil.rmtree(trash, ignore_errors=True)
+    path.rename(trash)
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def evict(caches: ProfileCaches) -> int:
+    """Delete a profile's caches, unless it started running. Returns bytes freed."""
+    if ipc.is_running(caches.profile):
+        info(f"skipping {caches.profile.name}, it started running")
+        return 0
+    freed = 0
+    for path, size in caches.dirs.items():
+        try:
+            remove(path)
+        except OSError as e:
+            error(f"failed to remove {path}: {e}")
+        else:
+            freed += size
+    return freed
+
+
+def lock(profile_dir: Path) -> int | None:
+    """Take a lock so runs from a timer and by hand don't overlap."""
+    import fcntl
+    import hashlib
+
+    digest = hashlib.md5(
+        str(profile_dir.absolute()).encode(), usedforsecurity=False
+    ).hexdigest()
+    path = default_qbpm_cache_dir() / f"gc-{digest}.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def collect(profile_dir: Path, budget: int, dry_run: bool = False) -> bool:
+    """Delete caches until all profiles' caches fit in budget bytes.
+
+    The caches of profiles that were launched least recently are deleted first.
+    Running profiles are counted but never touched.
+    """
+    fd = lock(profile_dir)
+    if fd is None:
+        info("another qbpm gc is already running")
+        return True
+    try:
+        index = ProfileIndex.load(profile_dir)
+        profiles = [
+            (Profile(name, profile_dir), entry.last_launch or entry.created)
+            for name, entry in index.profiles.items()
+            if entry.valid
+        ]
+        with ThreadPoolExecutor() as executor:
+            measured = list(executor.map(lambda p: measure(*p), profiles))
+        total = sum(caches.size for caches in measured)
+        running = running_profiles([caches.profile for caches in measured])
+        reclaimed = 0
+        for caches in sorted(measured, key=lambda c: (c.last_used, c.profile.name)):
+            if total - reclaimed <= budget:
+                break
+            if not caches.size:
+                continue
+            if caches.profile.name in running:
+                info(f"skipping {caches.profile.name}, it is running")
+                continue
+            freed = caches.size if dry_run else evict(caches)
+            if freed:
+                print(f"{caches.profile.name}  {format_size(freed)}")
+            reclaimed += freed
+        remaining = total - reclaimed
+        verb = "would reclaim" if dry_run else "reclaimed"
+        print(
+            f"{verb} {format_size(reclaimed)}, caches use {format_size(remaining)}"
+            f" of {format_size(budget)}"
+        )
+        if remaining > budget:
+            info("caches of running profiles don't fit in the budget")
+        return True
+    finally:
+        os.close(fd)
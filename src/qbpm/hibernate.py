@@ -0,0 +1,129 @@
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import Profile, ipc
+from .config import Config
+from .index import ProfileIndex
+from .log import error, info
+from .processes import running_instances
+from .units import format_duration
+
+# qutebrowser writes to its history whenever a page is visited
+HISTORY_FILES = [
+    Path("data/history.sqlite"),
+    Path("data/history.sqlite-journal"),
+    Path("data/history.sqlite-wal"),
+]
+# how long qutebrowser gets to save its session and quit
+QUIT_TIMEOUT = 10
+POLL_INTERVAL = 0.1
+# how often qbpm daemon looks for idle profiles
+CHECK_INTERVAL = 60
+
+
+def last_active(profile: Profile, *times: float | None) -> float:
+    """When profile last visited a page, or the latest of times."""
+    known = [t for t in times if t is not None]
+    for relative in HISTORY_FILES:
+        with suppress(OSError):
+            known.append((profile.root / relative).stat().st_mtime)
+    return max(known, default=0)
+
+
+def find_idle(
+    profiles: list[Profile], idle_after: float | None
+) -> list[tuple[Profile, float]]:
+    """Running profiles that have been idle for at least idle_after seconds, or
+    all running profiles, with how long they have been idle.
+
+    A profile is active when it starts, is launched through qbpm, or visits a page.
+    Without /proc, when it started isn't known, so only all profiles are found.
+    """
+    instances = running_instances(profiles)
+    indexes = {
+        profile_dir: ProfileIndex.load(profile_dir)
+        for profile_dir in {profile.profile_dir for profile in profiles}
+    }
+    now = time.time()
+    idle = []
+    for profile in profiles:
+        if (instance := instances.get(profile.name)) is None:
+            continue
+        if idle_after is not None and instance.started is None:
+            # it may have started after its last visit
+            continue
+        entry = indexes[profile.profile_dir].profiles.get(profile.name)
+        since = last_active(
+            profile, instance.started, entry.last_launch if entry else None
+        )
+        if idle_after is None or now - since >= idle_after:
+            idle.append((profile, now - since))
+    return idle
+
+
+def hibernate(profile: Profile, wait: bool = True) -> bool:
+    """Ask profile's qutebrowser to save its session and quit.
+
+    qutebrowser restores the session the next time the profile is launched.
+    """
+    if not ipc.send(profile, (":quit --save",)):
+        error(f"{profile.name} is not listening for commands")
+        return False
+    if not wait:
+        return True
+    deadline = time.monotonic() + QUIT_TIMEOUT
+    while ipc.is_running(profile):
+        if time.monotonic() > deadline:
+            error(f"{profile.name} did not quit within {QUIT_TIMEOUT} seconds")
+            return False
+        time.sleep(POLL_INTERVAL)
+    return True
+
+
+def hibernate_profiles(
+    profiles: list[Profile], idle_after: float | None, dry_run: bool = False
+) -> bool:
+    """Hibernate the running profiles that have been idle for idle_after seconds."""
+    result = True
+    for profile, idle in find_idle(profiles, idle_after):
+        if dry_run or hibernate(profile):
+            print(f"{profile.name}  idle {format_duration(idle)}")
+        else:
+            result = False
+    return result
+
+
+@dataclass
+class IdleWatcher:
+    """Hibernates profiles that are idle for hibernate_after seconds, for
+    qbpm daemon."""
+
+    last_check: float = field(default_factory=time.monotonic)
+    # profiles that were asked to quit, which take a while to do so
+    hibernating: set[str] = field(default_factory=set)
+
+    def maintain(self, config: Config) -> None:
+        if (
+            not config.hibernate_after
+            or time.monotonic() - self.last_check < CHECK_INTERVAL
+        ):
+            return
+        self.last_check = time.monotonic()
+        index = ProfileIndex.load(config.profile_directory)
+        profiles = [
+            Profile(name, config.profile_directory)
+            for name, entry in index.profiles.items()
+            if entry.valid and name not in config.hibernate_exclude
+        ]
+        idle = find_idle(profiles, config.hibernate_after)
+        # the profiles that aren't idle anymore have quit, or were used again
+        self.hibernating &= {profile.name for profile, _ in idle}
+        for profile, idle_for in idle:
+            if profile.name in self.hibernating:
+                continue
+            info(f"hibernating {profile.name}, idle for {format_duration(idle_for)}")
+            # don't hold up requests while it quits
+            if hibernate(profile, wait=False):
+                self.hibernating.add(profile.name)
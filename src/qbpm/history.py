@@ -0,0 +1,95 @@
+import heapq
+import sqlite3
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import islice
+
+from . import Profile
+from .log import error
+
+# how long to wait for a running qutebrowser that's writing to its history
+BUSY_TIMEOUT = 2
+
+
+@dataclass(frozen=True)
+class Visit:
+    profile: str
+    url: str
+    title: str
+    # when the url was last visited, in seconds since the epoch
+    atime: int
+
+    def to_json(self) -> dict[str, str | int]:
+        return asdict(self)
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def match_clause(query: str, glob: bool) -> tuple[str, list[str | int]]:
+    """A WHERE clause for query and its parameters.
+
+    Like qutebrowser's completion, every word in query has to appear in either the
+    url or the title, ignoring case. With glob, query is matched against the url.
+    """
+    if glob:
+        return "url GLOB ?", [query]
+    terms = query.split()
+    if not terms:
+        return "1", []
+    clause = " AND ".join(
+        "(url LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\')" for _ in terms
+    )
+    return clause, [pattern for term in terms for pattern in [like_pattern(term)] * 2]
+
+
+def query_profile(
+    profile: Profile, query: str, glob: bool, limit: int | None
+) -> list[Visit]:
+    """Visits in profile's history matching query, most recent first."""
+    path = profile.root / "data" / "history.sqlite"
+    if not path.exists():
+        return []
+    clause, params = match_clause(query, glob)
+    sql = (
+        "SELECT url, title, last_atime FROM CompletionHistory"
+        f" WHERE {clause} ORDER BY last_atime DESC"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    try:
+        # read-only, so this can't get in the way of a running qutebrowser
+        db = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+        try:
+            rows = db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        error(f"reading {path} failed: {e}")
+        return []
+    return [
+        Visit(profile.name, url, title or "", int(atime)) for url, title, atime in rows
+    ]
+
+
+def search(
+    profiles: list[Profile],
+    query: str,
+    glob: bool = False,
+    limit: int | None = None,
+) -> Iterator[Visit]:
+    """Visits matching query across profiles, most recent first.
+
+    Each profile's history is queried in parallel for its most recent limit
+    matches, which are then merged.
+    """
+    with ThreadPoolExecutor() as executor:
+        found = list(
+            executor.map(lambda p: query_profile(p, query, glob, limit), profiles)
+        )
+    merged = heapq.merge(*found, key=lambda visit: visit.atime, reverse=True)
+    return islice(merged, limit)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from . import Profile
+from .cache import stable_mtime
+from .log import info
+from .paths import default_qbpm_state_dir
+
+INDEX_VERSION = 1
+# a launch counts half as much towards a profile's frecency after this long
+FRECENCY_HALF_LIFE = 3 * 24 * 60 * 60
+
+
+@dataclass
+class ProfileEntry:
+    created: float
+    last_launch: float | None = None
+    launch_count: int = 0
+    # frecency as of last_launch
+    frecency: float = 0.0
+    # whether the profile has a config directory, as checked by profiles.check
+    valid: bool = True
+    # the profile directory's mtime when valid was last checked
+    mtime_ns: int = 0
+
+
+@dataclass
+class ProfileIndex:
+    """Profile names and launch history, so the profile directory doesn't have to
+    be scanned every time a menu is opened.
+
+    The index is rescanned whenever the profile directory's mtime changes, which
+    happens when profiles are created, deleted, or renamed.
+    """
+
+    profile_dir: Path
+    dir_mtime_ns: int = 0
+    profiles: dict[str, ProfileEntry] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, profile_dir: Path) -> "ProfileIndex":
+        index = cls(profile_dir)
+        try:
+            data = json.loads(index.path().read_text())
+            if data["version"] == INDEX_VERSION:
+                index.dir_mtime_ns = data["dir_mtime_ns"]
+                index.profiles = {
+                    name: ProfileEntry(**entry)
+                    for name, entry in data["profiles"].items()
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            info(f"rebuilding profile index: {e}")
+            index = cls(profile_dir)
+        if index.refresh():
+            index.save()
+        return index
+
+    def path(self) -> Path:
+        key = str(self.profile_dir.absolute()).encode()
+        digest = hashlib.md5(key, usedforsecurity=False).hexdigest()
+        return default_qbpm_state_dir() / f"index-{digest}.json"
+
+    def names(self) -> list[str]:
+        return sorted(self.profiles)
+
+    def refresh(self) -> bool:
+        """Rescan the profile directory if it changed. Returns whether the index
+        changed."""
+        try:
+            mtime = self.profile_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        if mtime == self.dir_mtime_ns and (mtime or not self.profiles):
+            # creating a profile's config directory only changes the profile's mtime
+            changed = False
+            for name, entry in self.profiles.items():
+                if not entry.valid:
+                    changed |= self.validate(name)
+            return changed
+        found = {}
+        if mtime:
+            with os.scandir(self.profile_dir) as entries:
+                found = {entry.name: entry for entry in entries if listed(entry.name)}
+        for name in self.profiles.keys() - found.keys():
+            del self.profiles[name]
+        for name in found.keys() - self.profiles.keys():
+            self.profiles[name] = ProfileEntry(
+                # the closest thing to a creation time most platforms have
+                created=found[name].stat().st_mtime,
+            )
+        for name in self.profiles:
+            self.validate(name)
+        # a change in the same tick as the scan could go unnoticed, so rescan
+        self.dir_mtime_ns = mtime if stable_mtime(mtime) else 0
+        return True
+
+    def validate(self, name: str) -> bool:
+        """Recheck whether a profile is valid if its directory changed since the
+        last check. Returns whether it did."""
+        entry = self.profiles[name]
+        path = self.profile_dir / name
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return False
+        if mtime == entry.mtime_ns:
+            return False
+        entry.valid = (path / "config").is_dir()
+        entry.mtime_ns = mtime if stable_mtime(mtime) else 0
+        return True
+
+    def add(self, profile: Profile) -> ProfileEntry:
+        entry = self.profiles.get(profile.name)
+        if not entry:
+            entry = ProfileEntry(created=time.time())
+            self.profiles[profile.name] = entry
+        entry.valid = (profile.root / "config").is_dir()
+        return entry
+
+    def frecency(self, name: str, now: float) -> float:
+        """Sum of all launches of a profile, each decaying exponentially with age.
+
+        Because the decay is exponential the sum can be updated on each launch
+        instead of being recomputed from every launch ever recorded.
+        """
+        entry = self.profiles.get(name)
+        if not entry or entry.last_launch is None:
+            return 0.0
+        age = max(now - entry.last_launch, 0)
+        return entry.frecency * math.exp2(-age / FRECENCY_HALF_LIFE)
+
+    def record_launch(self, profile: Profile) -> None:
+        now = time.time()
+        entry = self.add(profile)
+        entry.frecency = self.frecency(profile.name, now) + 1
+        entry.last_launch = now
+        entry.launch_count += 1
+
+    def save(self) -> None:
+        path = self.path()
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        data = {
+            "version": INDEX_VERSION,
+            "dir_mtime_ns": self.dir_mtime_ns,
+            "profiles": {name: asdict(entry) for name, entry in self.profiles.items()},
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data))
+            tmp.replace(path)
+        except OSError as e:
+            info(f"failed to write {path}: {e}")
+
+
+def listed(name: str) -> bool:
+    """Whether an entry in the profile directory is a profile rather than a clone
+    being copied or a profile backed up by clone --overwrite."""
+    return not name.startswith(".") and not name.endswith(".bak")
+
+
+def profile_names(profile_dir: Path) -> list[str]:
+    return ProfileIndex.load(profile_dir).names()
+
+
+@contextmanager
+def locked(profile_dir: Path) -> Iterator[None]:
+    """Hold a lock on profile_dir's index, so concurrent launches and creations
+    don't overwrite each other's updates."""
+    import fcntl
+
+    path = ProfileIndex(profile_dir).path().with_suffix(".lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def record_launch(profile: Profile) -> None:
+    with locked(profile.profile_dir):
+        index = ProfileIndex.load(profile.profile_dir)
+        index.record_launch(profile)
+        index.save()
+
+
+def record_new(*profiles: Profile) -> None:
+    """Add profiles, which must share a profile directory, to its index."""
+    if not profiles:
+        return
+    with locked(profiles[0].profile_dir):
+        index = ProfileIndex.load(profiles[0].profile_dir)
+        for profile in profiles:
+            index.add(profile)
+        index.save()
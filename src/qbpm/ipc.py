@@ -0,0 +1,92 @@
+import getpass
+import hashlib
+import json
+import os
+import platform
+import socket
+from pathlib import Path
+
+from . import Profile
+from .log import info
+
+# must match qutebrowser/misc/ipc.py
+PROTOCOL_VERSION = 1
+TARGETS = ["tab", "tab-bg", "tab-silent", "tab-bg-silent", "window", "private-window"]
+TIMEOUT = 0.5
+
+
+def socket_path(profile: Profile) -> Path:
+    """Location of the IPC socket qutebrowser listens on when run with --basedir."""
+    # qutebrowser normalizes --basedir with abspath, which doesn't resolve symlinks
+    basedir = os.path.abspath(profile.root)  # noqa: PTH100
+    key = f"{getpass.getuser()}-{basedir}".encode()
+    digest = hashlib.md5(key, usedforsecurity=False).hexdigest()
+    prefix = "i-" if platform.system() == "Darwin" else "ipc-"
+    return Path(basedir) / "runtime" / f"{prefix}{digest}"
+
+
+def ipc_args(qb_args: tuple[str, ...]) -> tuple[list[str], str | None] | None:
+    """Split qb_args into the urls/commands and target of an IPC message.
+
+    Returns None if qb_args contains anything that only a new qutebrowser
+    process could handle."""
+    args: list[str] = []
+    target = None
+    remaining = iter(qb_args)
+    for arg in remaining:
+        if arg == "--untrusted-args":
+            untrusted = list(remaining)
+            # let qutebrowser report invalid untrusted args
+            if len(untrusted) != 1 or untrusted[0].startswith((":", "-")):
+                return None
+            args.extend(untrusted)
+        elif arg in ("-t", "--target"):
+            target = next(remaining, None)
+        elif arg.startswith("--target="):
+            target = arg.removeprefix("--target=")
+        elif arg.startswith("-"):
+            return None
+        else:
+            args.append(arg)
+        if target is not None and target not in TARGETS:
+            return None
+    return args, target
+
+
+def send(profile: Profile, qb_args: tuple[str, ...]) -> bool:
+    """Pass qb_args on to a running instance of profile.
+
+    Returns False if no instance is listening or qb_args can't be sent over IPC,
+    in which case a new qutebrowser process should be started instead.
+    """
+    parsed = ipc_args(qb_args)
+    if parsed is None:
+        return False
+    args, target = parsed
+    path = socket_path(profile)
+    try:
+        message = {
+            "args": args,
+            "target_arg": target,
+            "protocol_version": PROTOCOL_VERSION,
+            "cwd": str(Path.cwd()),
+        }
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(str(path))
+            sock.sendall(json.dumps(message).encode() + b"\n")
+    except OSError:
+        return False
+    info(f"sent {args} to running qutebrowser at {path}")
+    return True
+
+
+def is_running(profile: Profile) -> bool:
+    """Whether a qutebrowser instance is listening for IPC messages for profile."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(TIMEOUT)
+        try:
+            sock.connect(str(socket_path(profile)))
+        except OSError:
+            return False
+    return True
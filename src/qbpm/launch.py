@@ -1,32 +1,141 @@
+import os
+import selectors
 import shutil
 import subprocess
+import time
+from contextlib import suppress
 
-from . import Profile
+from . import Profile, index, ipc
+from .config import Config, Resources
 from .log import error
 from .paths import qutebrowser_exe
 
+# how long to give qb a chance to validate input before returning to the shell
+VALIDATE_TIMEOUT = 0.1
+# how often to check whether the IPC socket exists
+POLL_INTERVAL = 0.01
+
 
 def launch_qutebrowser(
-    profile: Profile | None, foreground: bool, qb_args: tuple[str, ...] = ()
+    profile: Profile | None,
+    foreground: bool,
+    qb_args: tuple[str, ...] = (),
+    wait_ready: float | None = None,
+    config: Config | None = None,
 ) -> bool:
+    """Launch qutebrowser, with profile and the resources config gives it if set."""
+    if profile and ipc.send(profile, qb_args):
+        index.record_launch(profile)
+        return True
     qb = profile.cmdline() if profile else [qutebrowser_exe()]
-    return launch(foreground, [*qb, *qb_args])
+    resources = config.resources.get(profile.name) if config and profile else None
+    p = start(foreground, [*qb, *qb_args], resources)
+    if not p:
+        return False
+    if foreground:
+        # record before waiting so foreground launches show up as recent right away
+        if profile:
+            index.record_launch(profile)
+        return p.wait() == 0
+    result = wait_started(p, profile, wait_ready)
+    if profile and result:
+        index.record_launch(profile)
+    return result
 
 
-def launch(foreground: bool, args: list[str]) -> bool:
+def start(
+    foreground: bool, args: list[str], resources: Resources | None = None
+) -> subprocess.Popen[bytes] | None:
     if not shutil.which(args[0]):
         error("qutebrowser is not installed")
-        return False
+        return None
+    preexec = None
+    if resources:
+        from .resources import wrap
 
-    if foreground:
-        return subprocess.run(args, check=False).returncode == 0
-    else:
-        p = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         try:
-            # give qb a chance to validate input before returning to shell
-            _stdout, stderr = p.communicate(timeout=0.1)
-            print(stderr.decode(errors="ignore"), end="")
-        except subprocess.TimeoutExpired:
-            pass
+            args, preexec = wrap(args, resources)
+        except ValueError as e:
+            error(str(e))
+            return None
+    # preexec is only needed when nice, ionice, taskset, or prlimit is missing
+    return subprocess.Popen(
+        args,
+        stdout=None if foreground else subprocess.DEVNULL,
+        stderr=None if foreground else subprocess.PIPE,
+        preexec_fn=preexec,  # noqa: PLW1509
+    )
+
+
+def wait_started(
+    p: subprocess.Popen[bytes], profile: Profile | None, wait_ready: float | None
+) -> bool:
+    """Wait for a background qutebrowser to validate its arguments, or with
+    wait_ready, to be ready. Returns whether it is running or exited successfully.
+
+    Without a profile there is no IPC socket to tell when qutebrowser is ready,
+    so wait_ready only waits for it to validate its arguments.
+    """
+    assert p.stderr is not None
+    # stop reading stderr afterwards like qbpm exiting would, otherwise a long
+    # running qbpm daemon keeps the pipe open until qutebrowser blocks on it
+    with p.stderr:
+        if wait_ready is None or profile is None:
+            wait_for_ready(p, profile, VALIDATE_TIMEOUT)
+            return p.returncode in (None, 0)
+        ready = wait_for_ready(p, profile, wait_ready)
+    if not ready and p.returncode is None:
+        error(f"qutebrowser was not ready after {wait_ready} seconds")
+    return ready
+
+
+def wait_for_ready(
+    p: subprocess.Popen[bytes],
+    profile: Profile | None,
+    timeout: float,
+) -> bool:
+    """Wait until qutebrowser listens on profile's IPC socket, exits, or times out.
+
+    Anything qutebrowser writes to stderr in the meantime is passed on. Returns
+    whether qutebrowser is ready to open urls, which is also the case if it
+    exited successfully after handing its arguments to a running instance.
+    """
+    assert p.stderr is not None
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        selector.register(p.stderr, selectors.EVENT_READ)
+        pidfd = None
+        # wake up as soon as qb exits instead of on the next poll
+        with suppress(AttributeError, OSError):
+            pidfd = os.pidfd_open(p.pid)
+            selector.register(pidfd, selectors.EVENT_READ)
+        try:
+            while p.poll() is None:
+                # a qutebrowser that crashed leaves its socket behind
+                if profile and ipc.is_running(profile):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(remaining, POLL_INTERVAL) if profile else remaining
+                events = selector.select(interval)
+                forward_stderr(p, selector, events)
+            forward_stderr(p, selector, selector.select(0))
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+    return p.returncode == 0
+
 
-    return True
+def forward_stderr(
+    p: subprocess.Popen[bytes],
+    selector: selectors.BaseSelector,
+    events: list[tuple[selectors.SelectorKey, int]],
+) -> None:
+    assert p.stderr is not None
+    if not any(key.fileobj is p.stderr for key, _ in events):
+        return
+    output = os.read(p.stderr.fileno(), 4096)
+    if not output:
+        selector.unregister(p.stderr)
+    print(output.decode(errors="ignore"), end="")
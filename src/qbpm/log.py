@@ -5,6 +5,10 @@ def info(msg: str) -> None:
     logging.info(msg)
 
 
+def warning(msg: str) -> None:
+    logging.warning(msg)
+
+
 def error(msg: str) -> None:
     logging.error(msg)
 
@@ -1,21 +1,19 @@
 import logging
 import sys
 from collections.abc import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from functools import wraps
 from pathlib import Path
-from typing import Any, NoReturn, TypeVar
+from typing import Any, Literal, NoReturn, TextIO, TypeVar
 
 import click
 
-from . import Profile, profiles
-from .choose import choose_profile
-from .config import DEFAULT_CONFIG_FILE, Config, find_config
-from .desktop import create_desktop_file
-from .launch import launch_qutebrowser
-from .menus import supported_menus
+from . import Profile
+from .config import DEFAULT_CONFIG_FILE, Config, Resources, find_config
 from .paths import default_qbpm_config_dir
-from .session import profile_from_session
+
+# qbpm is often run as a url handler, so subcommands import the modules they
+# need themselves to avoid slowing down the ones that don't
 
 CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"], "max_content_width": 91}
 
@@ -39,6 +37,16 @@ class CreatorOptions:
     foreground: bool
     desktop_file: bool | None
     overwrite: bool
+    share_adblock: bool | None
+
+    def apply(self, config: Config) -> None:
+        """Override config with the options that were given."""
+        if self.qb_config_dir:
+            config.qutebrowser_config_directory = self.qb_config_dir.absolute()
+        if self.desktop_file is not None:
+            config.generate_desktop_file = self.desktop_file
+        if self.share_adblock is not None:
+            config.share_adblock_lists = self.share_adblock
 
 
 T = TypeVar("T")
@@ -46,22 +54,9 @@ T = TypeVar("T")
 
 def creator_options(orig: Callable[..., T]) -> Callable[..., T]:
     @wraps(orig)
-    def command(
-        qb_config_dir: Path | None,
-        launch: bool,
-        foreground: bool,
-        desktop_file: bool | None,
-        overwrite: bool,
-        *args: Any,  # noqa: ANN401
-        **kwargs: Any,  # noqa: ANN401
-    ) -> T:
-        return orig(
-            *args,
-            c_opts=CreatorOptions(
-                qb_config_dir, launch, foreground, desktop_file, overwrite
-            ),
-            **kwargs,
-        )
+    def command(*args: Any, **kwargs: Any) -> T:  # noqa: ANN401
+        options = {f.name: kwargs.pop(f.name) for f in fields(CreatorOptions)}
+        return orig(*args, c_opts=CreatorOptions(**options), **kwargs)
 
     for opt in reversed(
         [
@@ -89,12 +84,102 @@ def creator_options(orig: Callable[..., T]) -> Callable[..., T]:
                 is_flag=True,
                 help="Replace the current profile configuration if it exists.",
             ),
+            click.option(
+                "--share-adblock/--no-share-adblock",
+                default=None,
+                help="Use the adblock lists of the main qutebrowser profile.",
+            ),
         ]
     ):
         command = opt(command)
     return command
 
 
+def bulk_options(orig: Callable[..., T]) -> Callable[..., T]:
+    for opt in reversed(
+        [
+            click.option(
+                "-F",
+                "--file",
+                "manifest",
+                type=click.File(),
+                help="Read profiles from FILE, or stdin if FILE is -. Each line holds a "
+                "profile name, optionally followed by a home page.",
+            ),
+            click.option(
+                "-j",
+                "--jobs",
+                type=click.IntRange(min=1),
+                help="Number of profiles to create at once.",
+            ),
+        ]
+    ):
+        orig = opt(orig)
+    return orig
+
+
+@dataclass
+class LaunchOptions:
+    foreground: bool
+    wait_ready: float | None
+
+
+def launch_options(orig: Callable[..., T]) -> Callable[..., T]:
+    @wraps(orig)
+    def command(
+        foreground: bool,
+        wait_ready: bool,
+        ready_timeout: float,
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> T:
+        return orig(
+            *args,
+            l_opts=LaunchOptions(foreground, ready_timeout if wait_ready else None),
+            **kwargs,
+        )
+
+    for opt in reversed(
+        [
+            click.option(
+                "-f",
+                "--foreground",
+                is_flag=True,
+                help="Run qutebrowser in the foreground.",
+            ),
+            click.option(
+                "-w",
+                "--wait-ready",
+                is_flag=True,
+                help="Wait until qutebrowser is ready to open urls and fail if it isn't.",
+            ),
+            click.option(
+                "--ready-timeout",
+                type=float,
+                default=10,
+                show_default=True,
+                metavar="SECONDS",
+                help="How long --wait-ready waits before giving up.",
+            ),
+        ]
+    ):
+        command = opt(command)
+    return command
+
+
+class MenuOption(click.Option):
+    """--menu, with help text that lists supported menus only when it's shown."""
+
+    def get_help_record(self, ctx: click.Context) -> tuple[str, str] | None:
+        from .menus import supported_menus
+
+        self.help = (
+            "A dmenu-compatible command or one of the following supported menus: "
+            + ", ".join([menu.name() for menu in supported_menus()])
+        )
+        return super().get_help_record(ctx)
+
+
 class LowerCaseFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         record.levelname = record.levelname.lower()
@@ -121,8 +206,8 @@ class LowerCaseFormatter(logging.Formatter):
 @click.option(
     "-l",
     "--log-level",
-    default="error",
-    type=click.Choice(["debug", "info", "error"], case_sensitive=False),
+    default="warning",
+    type=click.Choice(["debug", "info", "warning", "error"], case_sensitive=False),
 )
 @click.pass_context
 def main(
@@ -133,6 +218,10 @@ def main(
 ) -> None:
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level.upper())
+    # the daemon runs many commands in one process, each with its own stderr
+    for handler in list(root_logger.handlers):
+        if isinstance(handler.formatter, LowerCaseFormatter):
+            root_logger.removeHandler(handler)
     handler = logging.StreamHandler()
     handler.setFormatter(LowerCaseFormatter("{levelname}: {message}", style="{"))
     root_logger.addHandler(handler)
@@ -140,23 +229,35 @@ def main(
 
 
 @main.command()
-@click.argument("profile_name")
+@click.argument("profile_name", required=False)
 @click.argument("home_page", required=False)
+@bulk_options
 @creator_options
 @click.pass_obj
-def new(
+def new(  # noqa: PLR0913, PLR0917
     context: Context,
-    profile_name: str,
+    profile_name: str | None,
     home_page: str | None,
+    manifest: TextIO | None,
+    jobs: int | None,
     c_opts: CreatorOptions,
 ) -> None:
-    """Create a new profile."""
+    """Create a new profile.
+
+    With --file, PROFILE_NAME is optional and the profiles in the file are
+    created along with it, in parallel, like with new-many.
+    """
+    from . import profiles
+    from .launch import launch_qutebrowser
+
+    if manifest:
+        entries = [(profile_name, home_page)] if profile_name else []
+        create_many(context, entries, manifest, jobs, c_opts)
+    if not profile_name:
+        raise click.UsageError("Missing argument 'PROFILE_NAME'.")
     config = context.load_config()
     profile = Profile(profile_name, config.profile_directory)
-    if c_opts.qb_config_dir:
-        config.qutebrowser_config_directory = c_opts.qb_config_dir.absolute()
-    if c_opts.desktop_file is not None:
-        config.generate_desktop_file = c_opts.desktop_file
+    c_opts.apply(config)
     exit_with(
         profiles.new_profile(
             profile,
@@ -164,7 +265,71 @@ def new(
             home_page,
             c_opts.overwrite,
         )
-        and ((not c_opts.launch) or launch_qutebrowser(profile, c_opts.foreground))
+        and (
+            (not c_opts.launch)
+            or launch_qutebrowser(profile, c_opts.foreground, config=config)
+        )
+    )
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@bulk_options
+@creator_options
+@click.pass_obj
+def new_many(
+    context: Context,
+    profile_names: tuple[str, ...],
+    manifest: TextIO | None,
+    jobs: int | None,
+    c_opts: CreatorOptions,
+) -> None:
+    """Create many profiles at once.
+
+    Profiles are read from PROFILE_NAMES and --file. Prints whether each
+    profile was created and exits with an error if any weren't.
+    """
+    create_many(
+        context, [(name, None) for name in profile_names], manifest, jobs, c_opts
+    )
+
+
+@main.command()
+@click.argument("source_name", metavar="SOURCE")
+@click.argument("profile_name")
+@click.option(
+    "--hardlink",
+    is_flag=True,
+    help="Hardlink read-only files instead of copying them.",
+)
+@creator_options
+@click.pass_obj
+def clone(
+    context: Context,
+    source_name: str,
+    profile_name: str,
+    hardlink: bool,
+    c_opts: CreatorOptions,
+) -> None:
+    """Create a new profile with a copy of everything in SOURCE.
+
+    Cookies, history, and other browsing data are copied along with the config.
+    On filesystems that support it, such as btrfs and xfs, files are copied
+    without duplicating their data on disk.
+    """
+    from . import profiles
+    from .launch import launch_qutebrowser
+
+    config = context.load_config()
+    c_opts.apply(config)
+    source = Profile(source_name, config.profile_directory)
+    profile = Profile(profile_name, config.profile_directory)
+    exit_with(
+        profiles.clone_profile(source, profile, config, hardlink, c_opts.overwrite)
+        and (
+            (not c_opts.launch)
+            or launch_qutebrowser(profile, c_opts.foreground, config=config)
+        )
     )
 
 
@@ -172,52 +337,137 @@ def new(
 @click.argument("session")
 @click.argument("profile_name", required=False)
 @creator_options
+@click.option(
+    "--compact",
+    "max_history",
+    type=click.IntRange(min=1),
+    metavar="MAX_HISTORY",
+    help="Compact the session, keeping at most MAX_HISTORY history entries per tab.",
+)
+@click.option(
+    "--split-by",
+    type=click.Choice(["window", "domain"]),
+    help="Create a profile for each window or each site in the session.",
+)
 @click.pass_obj
-def from_session(
+def from_session(  # noqa: PLR0913, PLR0917
     context: Context,
     session: str,
     profile_name: str | None,
     c_opts: CreatorOptions,
+    max_history: int | None,
+    split_by: Literal["window", "domain"] | None,
 ) -> None:
     """Create a new profile from a saved qutebrowser session.
 
     SESSION may be the name of a session in the global qutebrowser profile
-    or a path to a session yaml file.
+    or a path to a session yaml file. With --split-by, a profile is created for
+    each window or site, named PROFILE_NAME-1, PROFILE_NAME-example.com, etc.
     """
+    from .launch import launch_qutebrowser
+    from .log import error
+    from .session import SessionSplit, profile_from_session, profiles_from_split_session
+
+    if split_by and c_opts.launch and c_opts.foreground:
+        error("split profiles can't be launched in the foreground")
+        sys.exit(1)
     config = context.load_config()
-    if c_opts.qb_config_dir:
-        config.qutebrowser_config_directory = c_opts.qb_config_dir.absolute()
-    if c_opts.desktop_file is not None:
-        config.generate_desktop_file = c_opts.desktop_file
+    c_opts.apply(config)
+    if split_by:
+        split = SessionSplit(split_by, max_history)
+        created = profiles_from_split_session(
+            session, profile_name, config, split, c_opts.overwrite
+        )
+        if created and c_opts.launch:
+            for split_profile in created:
+                launch_qutebrowser(
+                    split_profile,
+                    False,
+                    config=config,
+                )
+        exit_with(created is not None)
     profile = profile_from_session(
         session,
         profile_name,
         config,
         c_opts.overwrite,
+        max_history,
     )
     exit_with(
         profile is not None
-        and ((not c_opts.launch) or launch_qutebrowser(profile, c_opts.foreground))
+        and (
+            (not c_opts.launch)
+            or launch_qutebrowser(profile, c_opts.foreground, config=config)
+        )
     )
 
 
 @main.command("launch", context_settings={"ignore_unknown_options": True})
 @click.argument("profile_name")
 @click.argument("qb_args", nargs=-1, type=click.UNPROCESSED)
+@launch_options
+@click.option(
+    "--nice", type=click.IntRange(-20, 19), help="Niceness to add to qutebrowser's."
+)
+@click.option(
+    "--io-class",
+    type=click.Choice(["realtime", "best-effort", "idle"]),
+    help="I/O scheduling class.",
+)
 @click.option(
-    "-f", "--foreground", is_flag=True, help="Run qutebrowser in the foreground."
+    "--io-priority",
+    type=click.IntRange(0, 7),
+    help="I/O priority within the class, 0 is highest.",
+)
+@click.option("--cpus", metavar="LIST", help="CPUs qutebrowser may run on, like 0-3,8.")
+@click.option(
+    "--max-address-space",
+    metavar="SIZE",
+    help="Limit on each process's virtual memory, like 64G.",
+)
+@click.option(
+    "--max-open-files",
+    type=click.IntRange(min=1),
+    help="Limit on each process's open files.",
 )
 @click.pass_obj
-def launch_profile(
-    context: Context, profile_name: str, foreground: bool, qb_args: tuple[str, ...]
+def launch_profile(  # noqa: PLR0913, PLR0917
+    context: Context,
+    profile_name: str,
+    qb_args: tuple[str, ...],
+    l_opts: LaunchOptions,
+    nice: int | None,
+    io_class: Literal["realtime", "best-effort", "idle"] | None,
+    io_priority: int | None,
+    cpus: str | None,
+    max_address_space: str | None,
+    max_open_files: int | None,
 ) -> None:
     """Launch qutebrowser with a specific profile.
 
-    All QB_ARGS are passed on to qutebrowser."""
-    profile = Profile(profile_name, context.load_config().profile_directory)
+    All QB_ARGS are passed on to qutebrowser. Resource options override the
+    profile's resources in config.toml and don't apply if it is already running.
+    """
+    from . import profiles
+    from .launch import launch_qutebrowser
+
+    config = context.load_config()
+    profile = Profile(profile_name, config.profile_directory)
     if not profiles.check(profile):
         sys.exit(1)
-    exit_with(launch_qutebrowser(profile, foreground, qb_args))
+    options = Resources(
+        nice, io_class, io_priority, cpus, max_address_space, max_open_files
+    )
+    resources = config.resources.get(profile_name, Resources()).override(options)
+    # only for this launch, the daemon reuses config for later ones
+    launch_config = replace(
+        config, resources={**config.resources, profile_name: resources}
+    )
+    exit_with(
+        launch_qutebrowser(
+            profile, l_opts.foreground, qb_args, l_opts.wait_ready, launch_config
+        )
+    )
 
 
 @main.command(context_settings={"ignore_unknown_options": True})
@@ -226,38 +476,641 @@ def launch_profile(
     "-m",
     "--menu",
     metavar="COMMAND",
-    help="A dmenu-compatible command or one of the following supported menus: "
-    + ", ".join([menu.name() for menu in supported_menus()]),
+    cls=MenuOption,
 )
 @click.option(
-    "-f", "--foreground", is_flag=True, help="Run qutebrowser in the foreground."
+    "-o",
+    "--order",
+    type=click.Choice(["alphabetical", "frecency"]),
+    help="Order of profiles in the menu.",
 )
+@launch_options
 @click.pass_obj
 def choose(
-    context: Context, menu: str | None, foreground: bool, qb_args: tuple[str, ...]
+    context: Context,
+    menu: str | None,
+    order: Literal["alphabetical", "frecency"] | None,
+    qb_args: tuple[str, ...],
+    l_opts: LaunchOptions,
 ) -> None:
     """Choose a profile to launch.
 
     Support is built in for many X and Wayland launchers, as well as applescript dialogs.
     All QB_ARGS are passed on to qutebrowser.
     """
+    from .choose import choose_profile
+
     config = context.load_config()
     if menu:
         config.menu = menu
+    if order:
+        config.choose_order = order
     exit_with(
         choose_profile(
             config,
-            foreground,
+            l_opts.foreground,
             qb_args,
+            l_opts.wait_ready,
+        )
+    )
+
+
+@main.command("open", context_settings={"ignore_unknown_options": True})
+@click.argument("url", required=False)
+@click.argument("qb_args", nargs=-1, type=click.UNPROCESSED)
+@launch_options
+@click.pass_obj
+def open_url(
+    context: Context,
+    url: str | None,
+    qb_args: tuple[str, ...],
+    l_opts: LaunchOptions,
+) -> None:
+    """Open URL in the profile that routes in config.toml send it to.
+
+    If no route matches, or there is no URL, a profile is chosen like with choose.
+    QB_ARGS are passed on to qutebrowser, URL is only ever treated as a url.
+    """
+    from .routing import route
+
+    config = context.load_config()
+    if url is None:
+        from .choose import choose_profile
+
+        exit_with(choose_profile(config, l_opts.foreground, qb_args, l_opts.wait_ready))
+    args = (*qb_args, "--untrusted-args", url)
+    profile_name = route(config, url)
+    if profile_name is None:
+        from .choose import choose_profile
+
+        exit_with(choose_profile(config, l_opts.foreground, args, l_opts.wait_ready))
+
+    from . import profiles
+    from .launch import launch_qutebrowser
+
+    profile = Profile(profile_name, config.profile_directory)
+    if not profiles.check(profile):
+        sys.exit(1)
+    exit_with(
+        launch_qutebrowser(
+            profile,
+            l_opts.foreground,
+            args,
+            l_opts.wait_ready,
+            config,
         )
     )
 
 
+@main.command(context_settings={"ignore_unknown_options": True})
+@click.argument("qb_args", nargs=-1, type=click.UNPROCESSED)
+@launch_options
+@click.pass_obj
+def ephemeral(
+    context: Context,
+    qb_args: tuple[str, ...],
+    l_opts: LaunchOptions,
+) -> None:
+    """Launch qutebrowser with a new throwaway profile.
+
+    The profile inherits your qutebrowser config and is deleted some time after
+    qutebrowser exits. If qbpm daemon is running with spare_instances set, an already
+    running qutebrowser is used. All QB_ARGS are passed on to qutebrowser.
+    """
+    from .ephemeral import launch_ephemeral
+
+    exit_with(
+        launch_ephemeral(
+            context.load_config(), l_opts.foreground, qb_args, l_opts.wait_ready
+        )
+    )
+
+
+@main.command()
+@click.option(
+    "--probe",
+    is_flag=True,
+    help="Check every supported menu instead of using the cached result.",
+)
+def menus(probe: bool) -> None:
+    """Show which menu program choose uses when no menu is configured."""
+    from shutil import which
+
+    from .menus import Dmenu, detect_menu, supported_menus
+
+    if probe:
+        for menu in supported_menus():
+            location = which(menu.name()) if isinstance(menu, Dmenu) else None
+            status = location or ("available" if menu.installed() else "not found")
+            print(f"{menu.name()}: {status}")
+    found = detect_menu(use_cache=not probe)
+    if isinstance(found, Dmenu):
+        print(" ".join(found.menu_command))
+    elif found:
+        print(found.name())
+    exit_with(found is not None)
+
+
+@main.command()
+def daemon() -> None:
+    """Run in the background to speed up other commands.
+
+    While the daemon is running, launch, choose, and desktop are handed to it
+    instead of starting a new qbpm process. It listens on a socket in
+    $XDG_RUNTIME_DIR and uses the environment and working directory of each
+    command it runs.
+    """
+    from .daemon import serve
+
+    exit_with(serve())
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.pass_obj
+def share_adblock(context: Context, profile_names: tuple[str, ...]) -> None:
+    """Make existing profiles share adblock lists with the main qutebrowser profile.
+
+    Applies to the given profiles, or all profiles. Their own lists are replaced.
+    """
+    from . import profiles
+
+    profile_dir = context.load_config().profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    for profile in selected:
+        profiles.link_adblock_lists(profile, True)
+        print(profile.name)
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option(
+    "--hardlink",
+    is_flag=True,
+    help="Replace read-only duplicates with hardlinks instead of reflinking all "
+    "duplicates, for filesystems without reflinks.",
+)
+@click.option(
+    "-n",
+    "--dry-run",
+    is_flag=True,
+    help="List duplicate files and how much space they take up.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Number of files to read at once.",
+)
+@click.pass_obj
+def dedupe(
+    context: Context,
+    profile_names: tuple[str, ...],
+    hardlink: bool,
+    dry_run: bool,
+    jobs: int | None,
+) -> None:
+    """Share identical files between profiles.
+
+    Checks the given profiles, or all profiles. Running profiles, databases, and
+    files that change while qutebrowser runs are skipped.
+    """
+    from .dedupe import dedupe as dedupe_profiles
+
+    profile_dir = context.load_config().profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    exit_with(dedupe_profiles(selected, hardlink, dry_run, jobs))
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option(
+    "-s",
+    "--sort",
+    type=click.Choice(
+        [
+            "name",
+            "total",
+            "cache",
+            "webengine",
+            "history",
+            "sessions",
+            "config",
+            "other",
+        ]
+    ),
+    default="total",
+    show_default=True,
+    help="Sort by name or by the size of a category, largest first.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print sizes in bytes as JSON.")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Rescan every directory instead of reusing unchanged results.",
+)
+@click.pass_obj
+def du(
+    context: Context,
+    profile_names: tuple[str, ...],
+    sort: str,
+    as_json: bool,
+    no_cache: bool,
+) -> None:
+    """Show how much disk space profiles use.
+
+    Measures the given profiles, or all profiles, broken down into cache,
+    QtWebEngine storage, history, sessions, config, and everything else.
+    """
+    from collections import Counter
+
+    from .units import format_size
+    from .usage import CATEGORIES, ProfileUsage, disk_usage
+
+    profile_dir = context.load_config().profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    usage = disk_usage(selected, not no_cache)
+    if sort == "name":
+        usage.sort(key=lambda u: u.name)
+    else:
+        usage.sort(key=lambda u: (-u.size(sort), u.name))
+    if as_json:
+        import json
+
+        print(json.dumps([u.to_json() for u in usage], indent=2))
+        return
+    total = ProfileUsage("total", sum((u.sizes for u in usage), Counter()))
+    columns = ["total", *CATEGORIES]
+    print_table(
+        [["profile", *columns]]
+        + [
+            [u.name, *(format_size(u.size(column)) for column in columns)]
+            for u in [*usage, total]
+        ]
+    )
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option("--json", "as_json", is_flag=True, help="Print processes as JSON.")
+@click.pass_obj
+def status(context: Context, profile_names: tuple[str, ...], as_json: bool) -> None:
+    """Show which profiles are running.
+
+    Lists the qutebrowser process of each running profile among the given
+    profiles, or all profiles, with its PID, uptime, memory use, and CPU time.
+    Exits with status 1 if any of the given profiles is not running.
+    """
+    from .processes import running_instances
+
+    profile_dir = context.load_config().profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    instances = sorted(running_instances(selected).values(), key=lambda i: i.profile)
+    if as_json:
+        import json
+
+        print(json.dumps([i.to_json() for i in instances], indent=2))
+    elif instances:
+        print_table(
+            [["profile", "pid", "uptime", "rss", "cpu"]]
+            + [i.columns() for i in instances]
+        )
+    if len(instances) < len(set(profile_names)):
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option(
+    "-i",
+    "--interval",
+    type=click.FloatRange(min=0.1),
+    default=2.0,
+    show_default=True,
+    help="Seconds between samples.",
+)
+@click.option("--once", is_flag=True, help="Print a single sample and exit.")
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    help="Print samples as JSON, one line per sample.",
+)
+@click.pass_obj
+def top(
+    context: Context,
+    profile_names: tuple[str, ...],
+    interval: float,
+    once: bool,
+    as_json: bool,
+) -> None:
+    """Show the memory and CPU use of running profiles.
+
+    Groups qutebrowser and its QtWebEngine processes by profile and shows each
+    profile's PSS, RSS, CPU usage, and number of processes and threads, with
+    the profiles using the most memory first. Updates every interval until
+    interrupted, unless --once is given.
+    """
+    import time
+
+    from .log import error
+    from .monitor import Monitor
+    from .processes import PROC
+
+    profile_dir = context.load_config().profile_directory
+    if profile_names:
+        # only to check they exist, the monitor finds the processes of all profiles
+        select_profiles(profile_dir, profile_names)
+    if not (PROC / "self" / "stat").exists():
+        error("qbpm top needs /proc")
+        sys.exit(1)
+    live = not once and not as_json and sys.stdout.isatty()
+    with Monitor(profile_dir, set(profile_names) or None) as monitor:
+        # CPU usage is measured between samples
+        monitor.sample()
+        try:
+            while True:
+                time.sleep(interval)
+                usage = monitor.sample()
+                if as_json:
+                    import json
+
+                    print(json.dumps([u.to_json() for u in usage]), flush=True)
+                else:
+                    if live:
+                        # clear the screen
+                        print("\x1b[H\x1b[J", end="")
+                    print_table(
+                        [["profile", "pss", "rss", "cpu%", "procs", "threads"]]
+                        + [u.columns() for u in usage]
+                    )
+                    if not live and not once:
+                        # a blank line between samples
+                        print(flush=True)
+                if once:
+                    break
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_idle(
+    _ctx: click.Context, _param: click.Parameter, value: str | None
+) -> float | None:
+    from .units import parse_duration
+
+    try:
+        return None if value is None else parse_duration(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option(
+    "-i",
+    "--idle",
+    callback=parse_idle,
+    help="Only profiles idle for this long, like 90m or 2h.",
+)
+@click.option(
+    "-n",
+    "--dry-run",
+    is_flag=True,
+    help="Show which profiles would be hibernated.",
+)
+@click.pass_obj
+def hibernate(
+    context: Context,
+    profile_names: tuple[str, ...],
+    idle: float | None,
+    dry_run: bool,
+) -> None:
+    """Save the sessions of running profiles and stop them.
+
+    Stops the given profiles, or all profiles not in hibernate_exclude that have
+    been idle for hibernate_after seconds. A profile is idle when it has neither
+    visited a page nor been launched. qutebrowser restores the session the next
+    time the profile is launched.
+    """
+    from .hibernate import hibernate_profiles
+    from .log import error
+
+    config = context.load_config()
+    if profile_names:
+        selected = select_profiles(config.profile_directory, profile_names)
+    else:
+        idle = idle or config.hibernate_after
+        if not idle:
+            error("pass --idle or set hibernate_after to choose idle profiles")
+            sys.exit(1)
+        selected = [
+            profile
+            for profile in select_profiles(config.profile_directory, ())
+            if profile.name not in config.hibernate_exclude
+        ]
+    exit_with(hibernate_profiles(selected, idle, dry_run))
+
+
+def parse_budget(_ctx: click.Context, _param: click.Parameter, value: str) -> int:
+    from .units import parse_size
+
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
+
+
+@main.command()
+@click.option(
+    "-b",
+    "--budget",
+    required=True,
+    callback=parse_budget,
+    help="Total size all profiles' caches may use, like 500M or 5G.",
+)
+@click.option(
+    "-n",
+    "--dry-run",
+    is_flag=True,
+    help="Show which profiles' caches would be deleted.",
+)
+@click.pass_obj
+def gc(context: Context, budget: int, dry_run: bool) -> None:
+    """Delete profile caches that don't fit in a disk budget.
+
+    HTTP, GPU, and shader caches of the least recently launched profiles are
+    deleted first. Running profiles are skipped.
+    """
+    from .gc import collect
+
+    exit_with(collect(context.load_config().profile_directory, budget, dry_run))
+
+
+@main.command()
+@click.argument("profile_names", nargs=-1)
+@click.option(
+    "--prune-days",
+    type=click.FloatRange(min=0),
+    help="Delete history older than this many days first.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Number of profiles to vacuum at once.  [default: 4]",
+)
+@click.pass_obj
+def vacuum(
+    context: Context,
+    profile_names: tuple[str, ...],
+    prune_days: float | None,
+    jobs: int | None,
+) -> None:
+    """Compact profiles' history, cookie, and form databases.
+
+    Runs VACUUM and ANALYZE on the databases of the given profiles, or all
+    profiles. Running profiles are skipped.
+    """
+    from .vacuum import vacuum as vacuum_profiles
+
+    profile_dir = context.load_config().profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    exit_with(vacuum_profiles(selected, prune_days, jobs))
+
+
+@main.group()
+def history() -> None:
+    """Search the browsing history of profiles."""
+
+
+@history.command()
+@click.argument("query", default="")
+@click.option(
+    "-p",
+    "--profile",
+    "profile_names",
+    multiple=True,
+    help="Only search this profile. Can be given more than once.",
+)
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Show at most this many results.",
+)
+@click.option(
+    "--glob",
+    is_flag=True,
+    help="Match the url against a glob pattern like '*://*.example.com/*'.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print results as JSON.")
+@click.option(
+    "-o",
+    "--open",
+    "open_visit",
+    is_flag=True,
+    help="Open the most recent result in the profile it was visited in.",
+)
+@click.pass_obj
+def search(  # noqa: PLR0913, PLR0917
+    context: Context,
+    query: str,
+    profile_names: tuple[str, ...],
+    limit: int,
+    glob: bool,
+    as_json: bool,
+    open_visit: bool,
+) -> None:
+    """Search the history of all profiles, most recent visits first.
+
+    Every word in QUERY has to appear in the url or title of a page.
+    """
+    import time
+
+    from .history import search as search_history
+
+    config = context.load_config()
+    profile_dir = config.profile_directory
+    selected = select_profiles(profile_dir, profile_names)
+    visits = list(search_history(selected, query, glob, limit))
+    if open_visit:
+        from .launch import launch_qutebrowser
+
+        if not visits:
+            exit_with(False)
+        profile = Profile(visits[0].profile, profile_dir)
+        exit_with(
+            launch_qutebrowser(
+                profile,
+                False,
+                ("--untrusted-args", visits[0].url),
+                config=config,
+            )
+        )
+    if as_json:
+        import json
+
+        print(json.dumps([visit.to_json() for visit in visits], indent=2))
+    else:
+        width = max((len(visit.profile) for visit in visits), default=0)
+        for visit in visits:
+            date = time.strftime("%Y-%m-%d %H:%M", time.localtime(visit.atime))
+            print(
+                f"{date}  {visit.profile:{width}}  {visit.url}  {visit.title}".rstrip()
+            )
+    exit_with(bool(visits))
+
+
+@main.group()
+def session() -> None:
+    """Manage the saved sessions of profiles."""
+
+
+@session.command()
+@click.argument("profile_name")
+@click.option(
+    "-s",
+    "--session",
+    "session_name",
+    default="_autosave",
+    show_default=True,
+    help="Name of the session to compact.",
+)
+@click.option(
+    "--max-history",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of history entries to keep per tab.",
+)
+@click.pass_obj
+def compact(
+    context: Context, profile_name: str, session_name: str, max_history: int
+) -> None:
+    """Shrink a profile's session so it restores faster.
+
+    Caps the back/forward history of each tab, drops empty tabs and windows, and
+    strips scroll positions and zoom levels from pages other than the current
+    one. The profile must not be running.
+    """
+    from . import profiles
+    from .session import compact_profile_session
+
+    profile = Profile(profile_name, context.load_config().profile_directory)
+    if not profiles.check(profile):
+        sys.exit(1)
+    exit_with(compact_profile_session(profile, session_name, max_history))
+
+
 @main.command()
 @click.argument("profile_name")
 @click.pass_obj
 def edit(context: Context, profile_name: str) -> None:
     """Edit a profile's config.py."""
+    from . import profiles
+
     profile = Profile(profile_name, context.load_config().profile_directory)
     if not profiles.check(profile):
         sys.exit(1)
@@ -268,8 +1121,10 @@ def edit(context: Context, profile_name: str) -> None:
 @click.pass_obj
 def list_(context: Context) -> None:
     """List existing profiles."""
-    for profile in sorted(context.load_config().profile_directory.iterdir()):
-        print(profile.name)
+    from .index import profile_names
+
+    for name in profile_names(context.load_config().profile_directory):
+        print(name)
 
 
 @main.command()
@@ -280,6 +1135,9 @@ def desktop(
     profile_name: str,
 ) -> None:
     """Create an XDG desktop entry for an existing profile."""
+    from . import profiles
+    from .desktop import create_desktop_file
+
     config = context.load_config()
     profile = Profile(profile_name, config.profile_directory)
     exists = profiles.check(profile)
@@ -317,5 +1175,68 @@ def default() -> None:
     print(DEFAULT_CONFIG_FILE.read_text(), end="")
 
 
+def valid_profiles(profile_dir: Path) -> list[str]:
+    from .index import ProfileIndex
+
+    index = ProfileIndex.load(profile_dir)
+    return [name for name in index.names() if index.profiles[name].valid]
+
+
+def select_profiles(profile_dir: Path, names: tuple[str, ...]) -> list[Profile]:
+    """The named profiles, or all valid ones. Exits if one of them doesn't exist."""
+    from . import profiles
+
+    selected = [
+        Profile(name, profile_dir) for name in names or valid_profiles(profile_dir)
+    ]
+    if not all(map(profiles.check, selected)):
+        sys.exit(1)
+    return selected
+
+
+def create_many(
+    context: Context,
+    entries: list[tuple[str, str | None]],
+    manifest: TextIO | None,
+    jobs: int | None,
+    c_opts: CreatorOptions,
+) -> NoReturn:
+    """Create the profiles in entries and manifest in parallel, and exit."""
+    from collections import Counter
+
+    from . import profiles
+    from .launch import launch_qutebrowser
+    from .log import error
+
+    if manifest:
+        entries = entries + profiles.parse_manifest(manifest)
+    counts = Counter(name for name, _ in entries)
+    if duplicates := sorted(name for name, count in counts.items() if count > 1):
+        error(f"duplicate profile names: {', '.join(duplicates)}")
+        sys.exit(1)
+    if c_opts.launch and c_opts.foreground and len(entries) > 1:
+        error("only one profile can be launched in the foreground")
+        sys.exit(1)
+    config = context.load_config()
+    c_opts.apply(config)
+    new = [
+        (Profile(name, config.profile_directory), home_page)
+        for name, home_page in entries
+    ]
+    created = profiles.new_profiles(new, config, c_opts.overwrite, jobs)
+    if c_opts.launch:
+        for profile in created:
+            launch_qutebrowser(profile, c_opts.foreground, config=config)
+    exit_with(len(created) == len(new))
+
+
+def print_table(rows: list[list[str]]) -> None:
+    """Print rows with the first column aligned left and the others right."""
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for name, *values in rows:
+        cells = [v.rjust(w) for v, w in zip(values, widths[1:], strict=True)]
+        print("  ".join([name.ljust(widths[0]), *cells]))
+
+
 def exit_with(result: bool) -> NoReturn:
     sys.exit(0 if result else 1)
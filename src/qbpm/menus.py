@@ -1,3 +1,4 @@
+import os
 import platform
 import shlex
 import sys
@@ -7,6 +8,7 @@ from os import environ
 from pathlib import Path
 from shutil import which
 
+from . import cache
 from .log import error, or_phrase
 
 
@@ -46,23 +48,104 @@ item 1 of profile""",
         ]
 
 
-def find_menu(menu: str | list[str] | None) -> Dmenu | ApplescriptMenu | None:
+class BuiltinMenu:
+    """Fuzzy finder that runs in qbpm itself, for terminals without fzf."""
+
+    @classmethod
+    def name(cls) -> str:
+        return "builtin"
+
+    @classmethod
+    def installed(cls) -> bool:
+        return sys.stdin.isatty()
+
+    @classmethod
+    def select(cls, profiles: list[str], prompt: str, qb_args: str) -> str | None:
+        from .picker import pick
+
+        return pick(profiles, prompt.format(qb_args=qb_args))
+
+
+Menu = Dmenu | ApplescriptMenu | BuiltinMenu
+
+
+def find_menu(menu: str | list[str] | None) -> Menu | None:
+    if menu in (BuiltinMenu.name(), [BuiltinMenu.name()]):
+        if not BuiltinMenu.installed():
+            error("the builtin menu can only be used from a terminal")
+            return None
+        return BuiltinMenu()
     if menu:
         dmenu = custom_dmenu(menu)
         if not dmenu.installed():
             error(f"{dmenu.name()} not found")
             return None
         return dmenu
-    menus = list(supported_menus())
-    found = next(filter(lambda m: m.installed(), menus), None)
+    found = detect_menu()
     if not found:
         error(
             "no menu program found, use --menu to provide a dmenu-compatible menu or install one of "
-            + or_phrase([m.name() for m in menus if isinstance(m, Dmenu)])
+            + or_phrase([m.name() for m in supported_menus() if isinstance(m, Dmenu)])
         )
     return found
 
 
+def detect_menu(use_cache: bool = True) -> Menu | None:
+    """Find the first supported menu that is installed.
+
+    Looking for each menu on a long $PATH is slow, so the result is cached until
+    the environment or a directory on $PATH changes.
+    """
+    key = environment_key()
+    if use_cache and key:
+        cached = cache.load("menu", key)
+        if cached is not None and (menu := menu_from_json(cached)):
+            return menu
+    found = next(filter(lambda m: m.installed(), supported_menus()), None)
+    if found and key:
+        cache.store("menu", key, menu_to_json(found))
+    return found
+
+
+def menu_to_json(menu: Menu) -> str | list[str]:
+    return menu.menu_command if isinstance(menu, Dmenu) else menu.name()
+
+
+def menu_from_json(value: str | list[str]) -> Menu | None:
+    if isinstance(value, list):
+        return Dmenu(value)
+    return next(
+        (menu for menu in (ApplescriptMenu(), BuiltinMenu()) if menu.name() == value),
+        None,
+    )
+
+
+def environment_key() -> tuple | None:
+    """Everything menu detection depends on, or None if it can't be cached yet."""
+    search_path = environ.get("PATH", os.defpath)
+    mtimes = []
+    for directory in search_path.split(os.pathsep):
+        try:
+            mtime = os.stat(directory or ".").st_mtime_ns  # noqa: PTH116
+        except OSError:
+            mtime = None
+        if mtime and not cache.stable_mtime(mtime):
+            return None
+        mtimes.append(mtime)
+    # relative $PATH entries depend on the working directory
+    if not all(map(os.path.isabs, search_path.split(os.pathsep))):
+        search_path += os.pathsep + os.getcwd()  # noqa: PTH109
+    return (
+        platform.system(),
+        environ.get("WAYLAND_DISPLAY"),
+        environ.get("DISPLAY"),
+        environ.get("TMUX"),
+        sys.stdin.isatty(),
+        search_path,
+        tuple(mtimes),
+    )
+
+
 def custom_dmenu(command: str | list[str]) -> Dmenu:
     split = shlex.split(command) if isinstance(command, str) else command
     if len(split) == 1 or not split[1]:
@@ -84,7 +167,7 @@ def custom_dmenu(command: str | list[str]) -> Dmenu:
     return Dmenu(split)
 
 
-def supported_menus() -> Iterator[Dmenu | ApplescriptMenu]:
+def supported_menus() -> Iterator[Menu]:
     if ApplescriptMenu.installed():
         yield ApplescriptMenu()
     if environ.get("WAYLAND_DISPLAY"):
@@ -116,3 +199,4 @@ def supported_menus() -> Iterator[Dmenu | ApplescriptMenu]:
         if environ.get("TMUX"):
             yield Dmenu(["fzf-tmux", "--prompt", "{prompt}> "])
         yield Dmenu(["fzf", "--prompt", "{prompt}> "])
+        yield BuiltinMenu()
@@ -0,0 +1,198 @@
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .processes import PROC, profile_of
+from .units import format_size
+
+# enough for /proc/PID/stat and smaps_rollup
+READ_SIZE = 4096
+
+
+def read(fd: int) -> str:
+    # procfs regenerates a file when it is read from the start, so the same fd
+    # can be read again for every sample
+    return os.pread(fd, READ_SIZE, 0).decode(errors="replace")
+
+
+def stat_fields(stat: str) -> list[str]:
+    """Fields of /proc/PID/stat after the command name, starting with state."""
+    # the command name in parentheses may contain spaces
+    return stat[stat.rindex(")") + 2 :].split()
+
+
+def parse_pss(smaps_rollup: str) -> int | None:
+    for line in smaps_rollup.splitlines():
+        if line.startswith("Pss:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+@dataclass
+class TrackedProcess:
+    """A process of a profile, with its /proc files kept open between samples."""
+
+    profile: str
+    stat: int
+    smaps: int | None
+    cpu_ticks: int
+
+    def close(self) -> None:
+        os.close(self.stat)
+        if self.smaps is not None:
+            os.close(self.smaps)
+
+
+@dataclass
+class ProfileUsage:
+    profile: str
+    processes: int = 0
+    threads: int = 0
+    rss: int = 0
+    # None if smaps_rollup can't be read
+    pss: int | None = 0
+    # None for the first sample
+    cpu_percent: float | None = None
+
+    def to_json(self) -> dict[str, str | int | float | None]:
+        return {
+            "profile": self.profile,
+            "processes": self.processes,
+            "threads": self.threads,
+            "rss": self.rss,
+            "pss": self.pss,
+            "cpu_percent": self.cpu_percent,
+        }
+
+    def columns(self) -> list[str]:
+        """Profile, PSS, RSS, CPU%, processes, and threads, formatted for a table."""
+        return [
+            self.profile,
+            "-" if self.pss is None else format_size(self.pss),
+            format_size(self.rss),
+            "-" if self.cpu_percent is None else f"{self.cpu_percent:.1f}",
+            str(self.processes),
+            str(self.threads),
+        ]
+
+
+@dataclass
+class Monitor:
+    """Samples the resource usage of profiles' qutebrowser process trees.
+
+    A process belongs to a profile if its command line has the profile as its
+    basedir, or if its parent belongs to it, which takes in QtWebEngine's
+    renderer, GPU, and utility processes. Only new processes are looked at
+    closely; processes of profiles have their stat and smaps_rollup files kept
+    open, and other processes are skipped once they are known.
+    """
+
+    profile_dir: Path
+    # only these profiles, or all
+    profiles: set[str] | None = None
+    tracked: dict[int, TrackedProcess] = field(default_factory=dict)
+    unrelated: set[int] = field(default_factory=set)
+    # unrelated in the last sample, but maybe about to exec qutebrowser
+    maybe_unrelated: set[int] = field(default_factory=set)
+    last_sample: float | None = None
+
+    def __post_init__(self) -> None:
+        self.profile_dir = self.profile_dir.resolve()
+
+    def __enter__(self) -> "Monitor":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        for process in self.tracked.values():
+            process.close()
+        self.tracked.clear()
+
+    def discover(self, pids: set[int]) -> None:
+        """Start tracking the processes among pids that belong to profiles."""
+        parents = {}
+        cpu_ticks = {}
+        for pid in pids:
+            try:
+                fields = stat_fields((PROC / str(pid) / "stat").read_text())
+            except OSError:
+                continue
+            parents[pid] = int(fields[1])
+            cpu_ticks[pid] = int(fields[11]) + int(fields[12])
+        profiles: dict[int, str | None] = {}
+
+        def profile(pid: int) -> str | None:
+            if pid in self.tracked:
+                return self.tracked[pid].profile
+            if pid not in parents:
+                return None
+            if pid not in profiles:
+                # set first in case ppids form a cycle after pid reuse
+                profiles[pid] = None
+                profiles[pid] = profile(parents[pid]) or profile_of(
+                    str(pid), self.profile_dir
+                )
+            return profiles[pid]
+
+        found = {}
+        for pid in sorted(parents):
+            name = profile(pid)
+            if name is not None and (self.profiles is None or name in self.profiles):
+                found[pid] = name
+            elif pid in self.maybe_unrelated:
+                self.unrelated.add(pid)
+            else:
+                self.maybe_unrelated.add(pid)
+        for pid, name in found.items():
+            self.maybe_unrelated.discard(pid)
+            self.track(pid, name, cpu_ticks[pid])
+
+    def track(self, pid: int, profile: str, cpu_ticks: int) -> None:
+        try:
+            stat = os.open(PROC / str(pid) / "stat", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            smaps: int | None = os.open(PROC / str(pid) / "smaps_rollup", os.O_RDONLY)
+        except OSError:
+            smaps = None
+        self.tracked[pid] = TrackedProcess(profile, stat, smaps, cpu_ticks)
+
+    def sample(self) -> list[ProfileUsage]:
+        """Usage of each profile that is running, with the most PSS first.
+
+        CPU usage is averaged since the previous sample.
+        """
+        now = time.monotonic()
+        elapsed = None if self.last_sample is None else now - self.last_sample
+        self.last_sample = now
+        pids = {int(entry.name) for entry in os.scandir(PROC) if entry.name.isdigit()}
+        self.unrelated &= pids
+        self.maybe_unrelated &= pids
+        self.discover(pids - self.tracked.keys() - self.unrelated)
+        ticks = os.sysconf("SC_CLK_TCK")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        usage: dict[str, ProfileUsage] = {}
+        for pid, process in list(self.tracked.items()):
+            try:
+                fields = stat_fields(read(process.stat))
+                pss = None if process.smaps is None else parse_pss(read(process.smaps))
+            except OSError:
+                # it exited, even if its pid was reused since
+                process.close()
+                del self.tracked[pid]
+                continue
+            profile = usage.setdefault(process.profile, ProfileUsage(process.profile))
+            profile.processes += 1
+            profile.threads += int(fields[17])
+            profile.rss += int(fields[21]) * page_size
+            profile.pss = (
+                None if pss is None or profile.pss is None else profile.pss + pss
+            )
+            cpu_ticks = int(fields[11]) + int(fields[12])
+            if elapsed:
+                # new processes count from when they were found
+                used = (cpu_ticks - process.cpu_ticks) / ticks
+                profile.cpu_percent = (profile.cpu_percent or 0) + used / elapsed * 100
+            process.cpu_ticks = cpu_ticks
+        return sorted(usage.values(), key=lambda u: (-(u.pss or u.rss), u.profile))
@@ -3,7 +3,12 @@ from collections.abc import Iterator
 from pathlib import Path
 
 from click import get_app_dir
-from xdg_base_dirs import xdg_config_home, xdg_data_home
+from xdg_base_dirs import (
+    xdg_cache_home,
+    xdg_config_home,
+    xdg_data_home,
+    xdg_state_home,
+)
 
 
 def qutebrowser_exe() -> str:
@@ -18,6 +23,18 @@ def default_qbpm_config_dir() -> Path:
     return xdg_config_home() / "qbpm"
 
 
+def default_qbpm_cache_dir() -> Path:
+    return xdg_cache_home() / "qbpm"
+
+
+def default_qbpm_state_dir() -> Path:
+    return xdg_state_home() / "qbpm"
+
+
+def default_ephemeral_profile_dir() -> Path:
+    return default_qbpm_cache_dir() / "ephemeral"
+
+
 def default_qbpm_application_dir() -> Path:
     return xdg_data_home() / "applications" / "qbpm"
 
@@ -0,0 +1,215 @@
+import os
+import termios
+import tty
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+# characters after which a match counts as the start of a word
+BOUNDARIES = " -_./:"
+CONSECUTIVE_BONUS = 4.0
+BOUNDARY_BONUS = 3.0
+BIGRAM_BONUS = 2.0
+PREFIX_BONUS = 8.0
+GAP_PENALTY = 0.2
+LENGTH_PENALTY = 0.01
+MAX_HEIGHT = 15
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """A menu entry with everything the scorer needs computed up front."""
+
+    text: str
+    lower: str
+    chars: frozenset[str]
+    bigrams: frozenset[str]
+
+    @classmethod
+    def of(cls, text: str) -> "Candidate":
+        lower = text.lower()
+        return cls(text, lower, frozenset(lower), frozenset(bigrams(lower)))
+
+
+def bigrams(text: str) -> Iterable[str]:
+    return (text[i : i + 2] for i in range(len(text) - 1))
+
+
+def score(query: str, candidate: Candidate) -> float | None:
+    """Score how well a lowercase query fuzzy matches candidate.
+
+    Higher is better and None means the query isn't a subsequence of the
+    candidate at all.
+    """
+    if not query:
+        return 0.0
+    if not candidate.chars.issuperset(query):
+        return None
+    text = candidate.lower
+    result = 0.0
+    previous = -2
+    first = text.find(query[0])
+    for char in query:
+        position = text.find(char, max(previous + 1, 0))
+        if position < 0:
+            return None
+        if position == previous + 1:
+            result += CONSECUTIVE_BONUS
+        if position == 0 or text[position - 1] in BOUNDARIES:
+            result += BOUNDARY_BONUS
+        previous = position
+    result -= (previous - first) * GAP_PENALTY
+    result += (
+        sum(bigram in candidate.bigrams for bigram in bigrams(query)) * BIGRAM_BONUS
+    )
+    if text.startswith(query):
+        result += PREFIX_BONUS
+    return result - len(text) * LENGTH_PENALTY
+
+
+def fuzzy_filter(query: str, candidates: Iterable[Candidate]) -> list[Candidate]:
+    """Candidates that match query, best first and otherwise in their original order."""
+    query = query.lower()
+    scored = [(s, c) for c in candidates if (s := score(query, c)) is not None]
+    scored.sort(key=lambda match: -match[0])
+    return [candidate for _, candidate in scored]
+
+
+class Picker:
+    """State of an interactive fuzzy search over a list of items."""
+
+    def __init__(self, items: list[str]) -> None:
+        self.query = ""
+        self.selected = 0
+        # matches for each prefix of the query: extending the query only has to
+        # filter the previous matches and deleting from it doesn't filter at all
+        self.history = [[Candidate.of(item) for item in items]]
+
+    @property
+    def matches(self) -> list[Candidate]:
+        return self.history[-1]
+
+    def type(self, text: str) -> None:
+        for char in text:
+            self.query += char
+            self.history.append(fuzzy_filter(self.query, self.matches))
+        self.selected = 0
+
+    def backspace(self, count: int = 1) -> None:
+        count = min(count, len(self.query))
+        if count:
+            self.query = self.query[:-count]
+            del self.history[-count:]
+        self.selected = 0
+
+    def delete_word(self) -> None:
+        stripped = self.query.rstrip()
+        word_start = max(stripped.rfind(sep) for sep in BOUNDARIES) + 1
+        self.backspace(len(self.query) - word_start)
+
+    def move(self, offset: int) -> None:
+        if self.matches:
+            self.selected = (self.selected + offset) % len(self.matches)
+
+    def selection(self) -> str | None:
+        return self.matches[self.selected].text if self.matches else None
+
+
+class TerminalPicker:
+    """Draws a Picker below the cursor on the terminal, like fzf --height."""
+
+    def __init__(self, picker: Picker, prompt: str, fd: int) -> None:
+        self.picker = picker
+        self.prompt = f"{prompt}> "
+        self.fd = fd
+        columns, lines = os.get_terminal_size(fd)
+        self.width = columns
+        self.height = max(min(len(picker.matches), MAX_HEIGHT, lines - 1), 0)
+        self.offset = 0
+        self.cancelled = False
+
+    def write(self, text: str) -> None:
+        os.write(self.fd, text.encode())
+
+    def draw(self) -> None:
+        matches = self.picker.matches
+        selected = self.picker.selected
+        if selected < self.offset:
+            self.offset = selected
+        elif selected >= self.offset + self.height:
+            self.offset = selected - self.height + 1
+        lines = [(self.prompt + self.picker.query)[: self.width - 1]]
+        for i, match in enumerate(matches[self.offset : self.offset + self.height]):
+            line = match.text[: self.width - 3]
+            if i + self.offset == selected:
+                lines.append(f"\x1b[7m> {line}\x1b[0m")
+            else:
+                lines.append(f"  {line}")
+        out = "\r\x1b[J" + "\r\n".join(lines)
+        if len(lines) > 1:
+            out += f"\x1b[{len(lines) - 1}A"
+        out += "\r"
+        if column := len(lines[0]):
+            out += f"\x1b[{column}C"
+        self.write(out)
+
+    def handle(self, key: str) -> bool:
+        """Update the picker for a key press. Returns whether picking is done."""
+        if key == "\r":
+            return True
+        elif key in ("\x03", "\x07", "\x1b"):  # ctrl-c, ctrl-g, escape
+            self.cancelled = True
+            return True
+        elif key in ("\x7f", "\x08"):
+            self.picker.backspace()
+        elif key == "\x15":  # ctrl-u
+            self.picker.backspace(len(self.picker.query))
+        elif key == "\x17":  # ctrl-w
+            self.picker.delete_word()
+        elif key in ("\x1b[A", "\x1bOA", "\x10", "\x0b"):  # up, ctrl-p, ctrl-k
+            self.picker.move(-1)
+        elif key in ("\x1b[B", "\x1bOB", "\x0e", "\x0a", "\t"):  # down, ctrl-n, ctrl-j
+            self.picker.move(1)
+        elif key.isprintable():
+            self.picker.type(key)
+        return False
+
+    def run(self) -> str | None:
+        # make room for the list so drawing it doesn't scroll the prompt away
+        self.write(
+            "\r\n" * self.height + (f"\x1b[{self.height}A" if self.height else "")
+        )
+        done = False
+        while not done:
+            self.draw()
+            data = os.read(self.fd, 64).decode(errors="ignore")
+            if not data:
+                break
+            for key in split_keys(data):
+                if done := self.handle(key):
+                    break
+        self.write("\r\x1b[J")
+        return None if self.cancelled else self.picker.selection()
+
+
+def split_keys(data: str) -> Iterable[str]:
+    """Split terminal input into key presses, keeping escape sequences together."""
+    i = 0
+    while i < len(data):
+        if data.startswith(("\x1b[", "\x1bO"), i) and i + 2 < len(data):
+            yield data[i : i + 3]
+            i += 3
+        else:
+            yield data[i]
+            i += 1
+
+
+def pick(items: list[str], prompt: str) -> str | None:
+    """Let the user fuzzy search items on the controlling terminal."""
+    fd = os.open("/dev/tty", os.O_RDWR)
+    attributes = termios.tcgetattr(fd)
+    try:
+        tty.setraw(fd)
+        return TerminalPicker(Picker(items), prompt, fd).run()
+    finally:
+        termios.tcsetattr(fd, termios.TCSAFLUSH, attributes)
+        os.close(fd)
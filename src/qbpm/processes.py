@@ -0,0 +1,150 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import Profile, ipc
+from .units import format_duration, format_size
+
+PROC = Path("/proc")
+
+
+@dataclass
+class Instance:
+    """A running qutebrowser. Without /proc, only profile is known."""
+
+    profile: str
+    pid: int | None = None
+    # seconds since the epoch
+    started: float | None = None
+    rss: int | None = None
+    cpu_time: float | None = None
+
+    def to_json(self) -> dict[str, str | int | float | None]:
+        return {
+            "profile": self.profile,
+            "pid": self.pid,
+            "started": self.started,
+            "uptime": None if self.started is None else time.time() - self.started,
+            "rss": self.rss,
+            "cpu_time": self.cpu_time,
+        }
+
+    def columns(self) -> list[str]:
+        """Profile, PID, uptime, RSS, and CPU time, formatted for a table."""
+        return [
+            self.profile,
+            "-" if self.pid is None else str(self.pid),
+            "-"
+            if self.started is None
+            else format_duration(time.time() - self.started),
+            "-" if self.rss is None else format_size(self.rss),
+            "-" if self.cpu_time is None else format_duration(self.cpu_time),
+        ]
+
+
+def basedir(cmdline: list[str]) -> str | None:
+    """The --basedir of a qutebrowser command line, if it is one."""
+    if not any("qutebrowser" in Path(arg).name for arg in cmdline[:3]):
+        return None
+    for i, arg in enumerate(cmdline):
+        if arg in ("-B", "--basedir") and i + 1 < len(cmdline):
+            return cmdline[i + 1]
+        if arg.startswith("--basedir="):
+            return arg.removeprefix("--basedir=")
+    return None
+
+
+def read_instance(pid: str, profile: str) -> Instance | None:
+    try:
+        stat = (PROC / pid / "stat").read_text()
+        boot_time = next(
+            float(line.split()[1])
+            for line in (PROC / "stat").read_text().splitlines()
+            if line.startswith("btime ")
+        )
+    except (OSError, StopIteration):
+        return None
+    # the command name in parentheses may contain spaces
+    fields = stat[stat.rindex(")") + 2 :].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return Instance(
+        profile,
+        int(pid),
+        started=boot_time + int(fields[19]) / ticks,
+        rss=int(fields[21]) * os.sysconf("SC_PAGE_SIZE"),
+        cpu_time=(int(fields[11]) + int(fields[12])) / ticks,
+    )
+
+
+def profile_of(pid: str, profile_dir: Path) -> str | None:
+    """The profile in profile_dir a process is a qutebrowser for, if any.
+
+    profile_dir must be resolved.
+    """
+    try:
+        cmdline = (PROC / pid / "cmdline").read_bytes()
+        root = basedir(os.fsdecode(cmdline).split("\0"))
+        if root is None:
+            return None
+        root_path = Path(root)
+        if not root_path.is_absolute():
+            # like qutebrowser, relative to where it was started
+            root_path = (PROC / pid / "cwd").readlink() / root_path
+        if root_path.parent.resolve() != profile_dir:
+            return None
+    except OSError:
+        return None
+    return root_path.name
+
+
+def find_instances(profile_dir: Path) -> dict[str, Instance] | None:
+    """qutebrowser processes whose basedir is in profile_dir, by profile name.
+
+    Found in a single pass over /proc. Returns None if there is no /proc.
+    """
+    if not (PROC / "self" / "cmdline").exists():
+        return None
+    profile_dir = profile_dir.resolve()
+    found: dict[str, Instance] = {}
+    for entry in os.scandir(PROC):
+        if not entry.name.isdigit():
+            continue
+        profile = profile_of(entry.name, profile_dir)
+        if profile is None:
+            continue
+        instance = read_instance(entry.name, profile)
+        # a wrapper script that didn't exec qutebrowser has the same arguments
+        if instance and (
+            profile not in found or (instance.rss or 0) > (found[profile].rss or 0)
+        ):
+            found[profile] = instance
+    return found
+
+
+def running_instances(profiles: list[Profile]) -> dict[str, Instance]:
+    """The running profiles' instances, by profile name.
+
+    Uses /proc where there is one and otherwise checks the IPC sockets of all
+    profiles in parallel, which only tells whether they are running.
+    """
+    names = {profile.name for profile in profiles}
+    found: dict[str, Instance] = {}
+    for profile_dir in {profile.profile_dir for profile in profiles}:
+        instances = find_instances(profile_dir)
+        if instances is None:
+            with ThreadPoolExecutor() as executor:
+                alive = executor.map(ipc.is_running, profiles)
+                return {
+                    p.name: Instance(p.name)
+                    for p, up in zip(profiles, alive, strict=True)
+                    if up
+                }
+        found |= {name: i for name, i in instances.items() if name in names}
+    return found
+
+
+def running_profiles(profiles: list[Profile]) -> set[str]:
+    """Names of the profiles that are running."""
+    return set(running_instances(profiles))
@@ -1,12 +1,23 @@
+import shutil
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 
 from . import Profile
-from .config import Config, find_qutebrowser_config_dir
-from .desktop import create_desktop_file
-from .log import error, info
+from .config import Config, config_dir_candidates, find_qutebrowser_config_dir
+from .desktop import create_desktop_file, create_desktop_files
+from .index import record_new
+from .log import error, info, warning
 from .paths import qutebrowser_data_dir
 
+# written by qutebrowser's host blocker and adblock engine
+ADBLOCK_FILES = ["blocked-hosts", "adblock-cache.dat"]
+
+# copying these from another profile wouldn't work: config.py mentions the
+# profile's name and runtime holds the IPC socket of a running qutebrowser
+CLONE_SKIP = {Path("config/config.py"), Path("runtime")}
+
 MIME_TYPES = [
     "text/html",
     "text/xml",
@@ -90,6 +101,35 @@ def link_dictionaries(profile: Profile, overwrite: bool) -> None:
     dest.symlink_to(source, target_is_directory=True)
 
 
+def link_adblock_lists(profile: Profile, overwrite: bool) -> None:
+    """Point the profile's content blocking data at the main qutebrowser profile's.
+
+    qutebrowser writes these files in place, so :adblock-update in any profile
+    that shares them updates them for all. If the main profile has no lists yet
+    the profile's own are moved there.
+    """
+    if not hasattr(Path, "symlink_to"):
+        return
+    shared_dir = qutebrowser_data_dir()
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    data_dir = profile.root / "data"
+    data_dir.mkdir(exist_ok=True)
+    for name in ADBLOCK_FILES:
+        source = shared_dir / name
+        dest = data_dir / name
+        if dest.resolve() == source.resolve():
+            continue
+        if dest.is_file() and not dest.is_symlink() and not source.exists():
+            info(f"moving {dest} to {source}")
+            dest.replace(source)
+        elif dest.exists() or dest.is_symlink():
+            if not overwrite:
+                info(f"{dest} already exists, not sharing it")
+                continue
+            dest.unlink()
+        dest.symlink_to(source)
+
+
 def back_up(dest: Path) -> None:
     backup = Path(str(dest) + ".bak")
     info(f"backing up existing {dest.name} to {backup}")
@@ -112,33 +152,188 @@ def check(profile: Profile) -> bool:
     return True
 
 
-def new_profile(
+def resolve_qutebrowser_config_dir(config: Config) -> Path | None:
+    qb_config_dir = config.qutebrowser_config_directory
+    if qb_config_dir and not qb_config_dir.is_dir():
+        error(f"{qb_config_dir} is not a directory")
+        return None
+    return find_qutebrowser_config_dir(qb_config_dir, config.symlink_autoconfig)
+
+
+def populate_profile(
     profile: Profile,
     config: Config,
+    qb_config_dir: Path,
     home_page: str | None = None,
     overwrite: bool = False,
 ) -> bool:
-    qb_config_dir = config.qutebrowser_config_directory
-    if qb_config_dir and not qb_config_dir.is_dir():
-        error(f"{qb_config_dir} is not a directory")
+    """Create a profile's directory and config, but no desktop file."""
+    if not create_profile(profile, overwrite):
         return False
-    qb_config_dir = find_qutebrowser_config_dir(
-        qb_config_dir, config.symlink_autoconfig
-    )
+    if config.config_py_template:
+        create_config(
+            profile, qb_config_dir, config.config_py_template, home_page, overwrite
+        )
+    if config.symlink_autoconfig:
+        link_autoconfig(profile, qb_config_dir, overwrite)
+    link_dictionaries(profile, overwrite)
+    if config.share_adblock_lists:
+        link_adblock_lists(profile, overwrite)
+    return True
+
+
+def new_profile(
+    profile: Profile,
+    config: Config,
+    home_page: str | None = None,
+    overwrite: bool = False,
+) -> bool:
+    qb_config_dir = resolve_qutebrowser_config_dir(config)
     if not qb_config_dir:
         return False
-    if create_profile(profile, overwrite):
-        if config.config_py_template:
-            create_config(
-                profile, qb_config_dir, config.config_py_template, home_page, overwrite
+    if not populate_profile(profile, config, qb_config_dir, home_page, overwrite):
+        return False
+    if config.generate_desktop_file:
+        create_desktop_file(
+            profile, config.desktop_file_directory, config.application_name
+        )
+    record_new(profile)
+    print(profile.root)
+    return True
+
+
+def new_profiles(
+    new: list[tuple[Profile, str | None]],
+    config: Config,
+    overwrite: bool = False,
+    jobs: int | None = None,
+) -> list[Profile]:
+    """Create many profiles at once, each with an optional home page.
+
+    Work that is the same for every profile is only done once and profiles are
+    created in parallel. Prints whether each profile was created and returns
+    the ones that were.
+    """
+    qb_config_dir = resolve_qutebrowser_config_dir(config)
+    if not qb_config_dir:
+        return []
+
+    def populate(entry: tuple[Profile, str | None]) -> bool:
+        profile, home_page = entry
+        try:
+            return populate_profile(
+                profile, config, qb_config_dir, home_page, overwrite
             )
-        if config.symlink_autoconfig:
-            link_autoconfig(profile, qb_config_dir, overwrite)
-        if config.generate_desktop_file:
-            create_desktop_file(
-                profile, config.desktop_file_directory, config.application_name
+        except OSError as e:
+            error(f"creating {profile.root} failed: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(populate, new))
+    created = [profile for (profile, _), ok in zip(new, results, strict=True) if ok]
+    if config.generate_desktop_file:
+        create_desktop_files(
+            created, config.desktop_file_directory, config.application_name
+        )
+    record_new(*created)
+    width = max((len(profile.name) for profile, _ in new), default=0)
+    for (profile, _), ok in zip(new, results, strict=True):
+        if ok:
+            print(f"created  {profile.name:{width}}  {profile.root}")
+        else:
+            print(f"failed   {profile.name}")
+    return created
+
+
+def clone_profile(
+    source: Profile,
+    profile: Profile,
+    config: Config,
+    hardlink: bool = False,
+    overwrite: bool = False,
+) -> bool:
+    """Copy everything in source to a new profile, including its browsing data.
+
+    config.py is regenerated for the new name unless it was edited by hand, in
+    which case it is copied unchanged.
+    """
+    from . import ipc
+    from .files import copy_tree
+
+    if not check(source) or not profile.check_name():
+        return False
+    if not overwrite and profile.root.exists():
+        error(f"{profile.root} already exists")
+        return False
+    if ipc.is_running(source):
+        warning(f"{source.name} is running, the copy of its data may be inconsistent")
+
+    # copy next to the destination so it appears all at once
+    tmp = profile.root.with_name(f".{profile.name}.clone")
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        copy_tree(source.root, tmp, CLONE_SKIP.__contains__, hardlink)
+        if overwrite and profile.root.exists():
+            back_up(profile.root)
+        tmp.rename(profile.root)
+        clone_config(source, profile, config)
+        if config.share_adblock_lists:
+            link_adblock_lists(profile, True)
+    except OSError as e:
+        error(f"copying {source.root} failed: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    if config.generate_desktop_file:
+        create_desktop_file(
+            profile, config.desktop_file_directory, config.application_name
+        )
+    record_new(profile)
+    print(profile.root)
+    return True
+
+
+def clone_config(source: Profile, profile: Profile, config: Config) -> None:
+    source_config = source.root / "config" / "config.py"
+    if not source_config.is_file():
+        return
+    text = source_config.read_text()
+    # without a config.py to source, there is nothing to regenerate, which is
+    # not an error when cloning
+    qb_config_dir = next(
+        (
+            config_dir.absolute()
+            for config_dir in config_dir_candidates(config.qutebrowser_config_directory)
+            if (config_dir / "config.py").is_file()
+        ),
+        None,
+    )
+    if qb_config_dir and config.config_py_template:
+        generated = (
+            config.config_py_template.format(
+                profile_name=source.name,
+                source_config_py=qb_config_dir / "config.py",
             )
-        link_dictionaries(profile, overwrite)
-        print(profile.root)
-        return True
-    return False
+            + "\n"
+        )
+        if text.startswith(generated):
+            create_config(profile, qb_config_dir, config.config_py_template)
+            # keep anything added after the template, like a home page
+            with (profile.root / "config" / "config.py").open("a") as dest_config:
+                dest_config.write(text.removeprefix(generated))
+            return
+    info(f"{source_config} was not generated by qbpm, copying it unchanged")
+    (profile.root / "config" / "config.py").write_text(text)
+
+
+def parse_manifest(lines: Iterable[str]) -> list[tuple[str, str | None]]:
+    """Read profile names and optional home pages, one profile per line.
+
+    Blank lines and lines starting with # are ignored.
+    """
+    entries: list[tuple[str, str | None]] = []
+    for line in map(str.strip, lines):
+        if not line or line.startswith("#"):
+            continue
+        name, *home_page = line.split(maxsplit=1)
+        entries.append((name, home_page[0] if home_page else None))
+    return entries
@@ -0,0 +1,114 @@
+import os
+import resource
+import shutil
+from collections.abc import Callable
+from functools import partial
+
+from .config import Resources
+from .log import error
+from .units import parse_size
+
+IO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+MAX_IO_PRIORITY = 7
+
+
+def parse_cpus(spec: str) -> list[int]:
+    """Parse CPU lists like 0-3,8 like taskset does."""
+    cpus: set[int] = set()
+    try:
+        for part in spec.split(","):
+            first, dash, last = part.strip().partition("-")
+            start, end = int(first), int(last if dash else first)
+            if start > end:
+                raise ValueError
+            cpus.update(range(start, end + 1))
+    except ValueError:
+        raise ValueError(f"invalid CPU list: {spec}") from None
+    if not cpus:
+        raise ValueError(f"invalid CPU list: {spec}")
+    return sorted(cpus)
+
+
+# a command to exec through, or failing that, what to call before exec
+Wrapper = tuple[list[str], list[Callable[[], object]]]
+
+
+def limits(resources: Resources) -> Wrapper:
+    values = []
+    if resources.max_address_space is not None:
+        size = parse_size(resources.max_address_space)
+        values.append(("as", resource.RLIMIT_AS, size))
+    if resources.max_open_files is not None:
+        values.append(("nofile", resource.RLIMIT_NOFILE, resources.max_open_files))
+    if not values:
+        return [], []
+    if shutil.which("prlimit"):
+        return ["prlimit", *(f"--{name}={value}" for name, _, value in values)], []
+    return [], [
+        partial(resource.setrlimit, limit, (value, value)) for _, limit, value in values
+    ]
+
+
+def niceness(resources: Resources) -> Wrapper:
+    if resources.nice is None:
+        return [], []
+    if shutil.which("nice"):
+        return ["nice", "-n", str(resources.nice)], []
+    return [], [partial(os.nice, resources.nice)]
+
+
+def io_priority(resources: Resources) -> Wrapper:
+    if resources.io_class is None and resources.io_priority is None:
+        return [], []
+    io_class = resources.io_class or "best-effort"
+    if io_class not in IO_CLASSES:
+        raise ValueError(f"invalid I/O class: {io_class}")
+    command = ["ionice", "-c", str(IO_CLASSES[io_class])]
+    if resources.io_priority is not None:
+        if not 0 <= resources.io_priority <= MAX_IO_PRIORITY:
+            raise ValueError(f"invalid I/O priority: {resources.io_priority}")
+        command += ["-n", str(resources.io_priority)]
+    if shutil.which("ionice"):
+        return command, []
+    # there is no ioprio_set in the standard library
+    error("ionice is not installed, starting without I/O priority")
+    return [], []
+
+
+def affinity(resources: Resources) -> Wrapper:
+    if resources.cpus is None:
+        return [], []
+    cpus = parse_cpus(resources.cpus)
+    if shutil.which("taskset"):
+        return ["taskset", "-c", ",".join(map(str, cpus))], []
+    if not hasattr(os, "sched_setaffinity"):
+        raise ValueError("CPU affinity is not supported on this system")
+    return [], [partial(os.sched_setaffinity, 0, cpus)]
+
+
+def wrap(
+    args: list[str], resources: Resources
+) -> tuple[list[str], Callable[[], None] | None]:
+    """Apply resources to the program args runs.
+
+    Returns args with prlimit, nice, ionice, and taskset in front, which each
+    apply their part and exec the next, so the program ends up with the pid of
+    the process that was started and nothing has to run between fork and exec.
+    Whatever can't be applied that way because a command isn't installed is
+    done by the returned function, to be run in the child before exec.
+    Raises ValueError for invalid resources.
+    """
+    prefix: list[str] = []
+    fallback: list[Callable[[], object]] = []
+    for part in (limits, niceness, io_priority, affinity):
+        command, functions = part(resources)
+        prefix += command
+        fallback += functions
+    if not fallback:
+        return [*prefix, *args], None
+
+    def preexec() -> None:
+        for apply in fallback:
+            apply()
+
+    return [*prefix, *args], preexec
@@ -0,0 +1,108 @@
+import re
+import sys
+from dataclasses import dataclass, field
+from fnmatch import translate
+from functools import cache
+from urllib.parse import urlsplit
+
+from .config import Config, Route
+from .log import error
+
+
+@dataclass
+class DomainNode:
+    """A level of a trie of domains, keyed by labels from the last one."""
+
+    children: dict[str, "DomainNode"] = field(default_factory=dict)
+    # index of the first route for the domain that ends here
+    route: int | None = None
+
+
+@dataclass
+class Router:
+    """Routes compiled so that matching a url takes about as long with thousands of
+    them as with a few: domains are looked up in a trie and all globs and regexes
+    are combined into one regex, each in a group named after its route."""
+
+    profiles: list[str]
+    domains: DomainNode
+    combined: re.Pattern[str] | None
+    # regexes with groups of their own, which can't be combined with others
+    separate: list[tuple[int, re.Pattern[str]]]
+
+    @classmethod
+    def compile(cls, routes: list[Route]) -> "Router":
+        domains = DomainNode()
+        alternatives = []
+        separate = []
+        for i, route in enumerate(routes):
+            for domain in route.domains:
+                node = domains
+                for label in reversed(domain.lower().strip(".").split(".")):
+                    if label != "*":
+                        node = node.children.setdefault(label, DomainNode())
+                if node.route is None:
+                    node.route = i
+            alternatives += [f"(?P<r{i}>{translate(glob)})" for glob in route.globs]
+            for regex in route.regexes:
+                try:
+                    pattern = re.compile(regex)
+                except re.error as e:
+                    raise ValueError(f"invalid regex '{regex}': {e}") from None
+                if pattern.groups or pattern.flags & ~re.UNICODE:
+                    separate.append((i, pattern))
+                else:
+                    # match() tries alternatives in order, and stops at the first
+                    alternatives.append(f"(?P<r{i}>.*?(?:{regex}))")
+        combined = re.compile("|".join(alternatives)) if alternatives else None
+        return cls([route.profile for route in routes], domains, combined, separate)
+
+    def match(self, url: str) -> str | None:
+        """The profile of the first route that matches url."""
+        found = len(self.profiles)
+        host = urlsplit(url if "://" in url else f"//{url}").hostname
+        if host:
+            node = self.domains
+            for label in reversed(host.strip(".").split(".")):
+                if (child := node.children.get(label)) is None:
+                    break
+                node = child
+                if node.route is not None:
+                    found = min(found, node.route)
+        if self.combined and (m := self.combined.match(url)) and m.lastgroup:
+            found = min(found, int(m.lastgroup[1:]))
+        for i, pattern in self.separate:
+            if i >= found:
+                break
+            if pattern.search(url):
+                found = i
+        return self.profiles[found] if found < len(self.profiles) else None
+
+
+# routes as tuples, which unlike Route can be hashed
+RouteKey = tuple[str, tuple[str, ...], tuple[str, ...], tuple[str, ...]]
+
+
+@cache
+def compiled(routes: tuple[RouteKey, ...]) -> Router:
+    """Compile routes once for every url the daemon opens with them."""
+    return Router.compile(
+        [Route(profile, *map(list, patterns)) for profile, *patterns in routes]
+    )
+
+
+def route(config: Config, url: str) -> str | None:
+    """The profile config's routes send url to, if any."""
+    if not config.routes:
+        return None
+    try:
+        router = compiled(
+            tuple(
+                (r.profile, tuple(r.domains), tuple(r.globs), tuple(r.regexes))
+                for r in config.routes
+            )
+        )
+    except ValueError as e:
+        error(f"loading routes failed: {e}")
+        sys.exit(1)
+    return router.match(url)
@@ -1,11 +1,20 @@
 import shutil
 import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Literal
+from urllib.parse import urlsplit
 
-from . import Profile, profiles
+from . import Profile, ipc, profiles
 from .config import Config
 from .log import error, or_phrase
 from .paths import qutebrowser_data_dir
+from .units import format_size
+
+# kept for history entries other than the current one of each tab, the rest like
+# scroll position and zoom only matter for the page that's being restored
+KEPT_KEYS = {"url", "title", "active", "pinned", "last_visited"}
 
 
 def profile_from_session(
@@ -13,7 +22,10 @@ def profile_from_session(
     profile_name: str | None,
     config: Config,
     overwrite: bool = False,
+    max_history: int | None = None,
 ) -> Profile | None:
+    """Create a profile that restores session. With max_history, the session is
+    compacted as if by compact_session."""
     profile, session_path = session_info(
         session, profile_name, config.profile_directory
     )
@@ -22,11 +34,322 @@ def profile_from_session(
 
     session_dir = profile.root / "data" / "sessions"
     session_dir.mkdir(parents=True, exist_ok=overwrite)
-    shutil.copy(session_path, session_dir / "_autosave.yml")
+    if max_history is None:
+        shutil.copy(session_path, session_dir / "_autosave.yml")
+    else:
+        compact_file(session_path, session_dir / "_autosave.yml", max_history)
 
     return profile
 
 
+@dataclass
+class SessionSplit:
+    """How to split a session between several profiles."""
+
+    by: Literal["window", "domain"]
+    # compact the session as if by compact_session
+    max_history: int | None = None
+
+
+def profiles_from_split_session(
+    session: str,
+    profile_name: str | None,
+    config: Config,
+    split: SessionSplit,
+    overwrite: bool = False,
+) -> list[Profile] | None:
+    """Create a profile for each window or site in session, named with profile_name
+    or the session's name as a prefix, each restoring only its part.
+
+    The session is read once and the profiles are created in parallel. Returns the
+    profiles that were created, or None if any weren't.
+    """
+    base, session_path = session_info(session, profile_name, config.profile_directory)
+    with session_path.open(encoding="utf-8") as f:
+        lines: Iterable[str] = f
+        if split.max_history is not None:
+            lines = compact_session(lines, split.max_history)
+        parts = split_session(lines, split.by)
+    if not parts:
+        error(f"{session_path} has no windows to split")
+        return None
+    new = [
+        (Profile(f"{base.name}-{key}", base.profile_dir), part)
+        for key, part in parts.items()
+    ]
+    created = profiles.new_profiles(
+        [(profile, None) for profile, _ in new], config, overwrite
+    )
+    for profile, part in new:
+        if profile not in created:
+            continue
+        session_dir = profile.root / "data" / "sessions"
+        try:
+            session_dir.mkdir(parents=True, exist_ok=True)
+            with (session_dir / "_autosave.yml").open("w", encoding="utf-8") as f:
+                f.writelines(part)
+        except OSError as e:
+            error(f"writing the session of {profile.name} failed: {e}")
+            return None
+    return created if len(created) == len(new) else None
+
+
+def split_session(lines: Iterable[str], by: str) -> dict[str, list[str]]:
+    """Split the lines of a session into a session for each window, numbered from
+    1, or for each site, as named by tab_site.
+
+    Split by site, each window becomes a window in every site's session that it
+    has tabs of. Anything in the session besides its windows is kept in each.
+    """
+    shared: list[str] = []
+    parts: dict[str, list[str]] = {}
+    window: list[str] = []
+    in_windows = False
+
+    def add(window: list[str]) -> None:
+        if by == "window":
+            parts[str(len(parts) + 1)] = window
+        else:
+            for site, part in split_window(window).items():
+                parts.setdefault(site, []).extend(part)
+
+    for line in lines:
+        if in_windows and line.startswith("- "):
+            if window:
+                add(window)
+            window = [line]
+        elif window and (blank(line) or line.startswith(" ")):
+            window.append(line)
+        else:
+            if window:
+                add(window)
+            window = []
+            in_windows = line.rstrip() == "windows:"
+            if not in_windows:
+                shared.append(line)
+    if window:
+        add(window)
+    return {key: [*shared, "windows:\n", *part] for key, part in parts.items()}
+
+
+def split_window(window: list[str]) -> dict[str, list[str]]:
+    """Split a window into windows with the tabs of each site."""
+    keys = split_keys(as_mapping(window, 0), 2)
+    by_site: dict[str, list[str]] = {}
+    for key, block in keys:
+        if key == "tabs" and block[0].rstrip() == "  tabs:":
+            for tab in split_items(block[1:], 2):
+                by_site.setdefault(tab_site(tab), []).extend(tab)
+    split = {}
+    for site, tabs in by_site.items():
+        part = []
+        for key, block in keys:
+            part += ["  tabs:\n", *tabs] if key == "tabs" else block
+        split[site] = as_item(part, 0)
+    return split
+
+
+def tab_site(tab: list[str]) -> str:
+    """The host of the page a tab is showing, or its scheme if it has no host."""
+    for key, block in split_keys(as_mapping(tab, 2), 4):
+        if key != "history" or not (entries := split_items(block[1:], 4)):
+            continue
+        current = next((entry for entry in entries if is_active(entry)), entries[-1])
+        for entry_key, entry_block in split_keys(as_mapping(current, 4), 6):
+            if entry_key == "url":
+                url = urlsplit(unquote(entry_block[0].split(":", 1)[1]))
+                if url.scheme in ("http", "https") and url.hostname:
+                    return url.hostname.removeprefix("www.")
+                return url.scheme or "other"
+    return "other"
+
+
+def unquote(scalar: str) -> str:
+    scalar = scalar.strip()
+    if scalar.startswith("'") and scalar.endswith("'"):
+        return scalar[1:-1].replace("''", "'")
+    if scalar.startswith('"') and scalar.endswith('"'):
+        return scalar[1:-1]
+    return scalar
+
+
+def compact_profile_session(profile: Profile, session: str, max_history: int) -> bool:
+    """Compact one of an existing profile's sessions in place."""
+    path = profile.root / "data" / "sessions" / f"{session}.yml"
+    if not path.is_file():
+        error(f"{profile.name} has no session named {session}")
+        return False
+    if ipc.is_running(profile):
+        error(f"{profile.name} is running, qutebrowser would overwrite the session")
+        return False
+    before = path.stat().st_size
+    tmp = path.with_name(f".{path.name}.qbpm-compact")
+    try:
+        compact_file(path, tmp, max_history)
+        tmp.replace(path)
+    except OSError as e:
+        error(f"compacting {path} failed: {e}")
+        tmp.unlink(missing_ok=True)
+        return False
+    print(f"{format_size(before)} -> {format_size(path.stat().st_size)}")
+    return True
+
+
+def compact_file(src: Path, dst: Path, max_history: int) -> None:
+    with (
+        src.open(encoding="utf-8") as lines,
+        dst.open("w", encoding="utf-8") as out,
+    ):
+        out.writelines(compact_session(lines, max_history))
+
+
+def compact_session(lines: Iterable[str], max_history: int) -> Iterator[str]:
+    """Compact the lines of a session file as qutebrowser writes them.
+
+    Each tab keeps at most max_history entries of its back/forward history, as
+    many as possible from before the current page. Entries other than the current
+    one lose everything but KEPT_KEYS, and tabs and windows without any history
+    are dropped.
+
+    Only one window is held in memory at a time. Anything that isn't part of a
+    window's tabs is passed through unchanged.
+    """
+    window: list[str] = []
+    # "windows:" is held back until a window is kept, without any windows it has
+    # to be written as an empty list instead
+    header = None
+    kept_windows = 0
+
+    def flush() -> Iterator[str]:
+        nonlocal kept_windows
+        if kept := compact_window(window, max_history):
+            if header and not kept_windows:
+                yield header
+            kept_windows += 1
+            yield from kept
+
+    for line in lines:
+        if header and line.startswith("- "):
+            yield from flush()
+            window = [line]
+        elif window and (blank(line) or line.startswith(" ")):
+            window.append(line)
+        else:
+            if header:
+                yield from flush()
+                if not kept_windows:
+                    yield "windows: []\n"
+            window = []
+            kept_windows = 0
+            header = line if line.rstrip() == "windows:" else None
+            if not header:
+                yield line
+    if header:
+        yield from flush()
+        if not kept_windows:
+            yield "windows: []\n"
+
+
+def compact_window(window: list[str], max_history: int) -> list[str]:
+    if not window:
+        return []
+    compacted = []
+    has_tabs = False
+    for key, block in split_keys(as_mapping(window, 0), 2):
+        if key != "tabs" or block[0].rstrip() != "  tabs:":
+            compacted += block
+            continue
+        tabs = [compact_tab(tab, max_history) for tab in split_items(block[1:], 2)]
+        compacted += [block[0], *(line for tab in tabs for line in tab)]
+        has_tabs = any(tabs)
+    return as_item(compacted, 0) if has_tabs else []
+
+
+def compact_tab(tab: list[str], max_history: int) -> list[str]:
+    compacted = []
+    for key, block in split_keys(as_mapping(tab, 2), 4):
+        if key != "history":
+            compacted += block
+            continue
+        entries = split_items(block[1:], 4)
+        if not entries:
+            return []
+        current = next(
+            (i for i, entry in enumerate(entries) if is_active(entry)),
+            len(entries) - 1,
+        )
+        start = max(0, current - max_history + 1)
+        kept = [
+            entry if i == current else strip_entry(entry)
+            for i, entry in enumerate(entries)
+            if start <= i < start + max_history
+        ]
+        compacted += [block[0], *(line for entry in kept for line in entry)]
+    return as_item(compacted, 2)
+
+
+def is_active(entry: list[str]) -> bool:
+    return any(line.rstrip() == "      active: true" for line in as_mapping(entry, 4))
+
+
+def strip_entry(entry: list[str]) -> list[str]:
+    kept = [
+        line
+        for key, block in split_keys(as_mapping(entry, 4), 6)
+        if key in KEPT_KEYS
+        for line in block
+    ]
+    return as_item(kept, 4) if kept else entry
+
+
+def blank(line: str) -> bool:
+    return not line.strip()
+
+
+def as_mapping(item: list[str], indent: int) -> list[str]:
+    """The lines of a block sequence item starting with "- " at indent, as a
+    mapping indented by two more spaces."""
+    first = item[0]
+    return [f"{first[:indent]}  {first[indent + 2 :]}", *item[1:]]
+
+
+def as_item(mapping: list[str], indent: int) -> list[str]:
+    first = mapping[0]
+    return [f"{first[:indent]}- {first[indent + 2 :]}", *mapping[1:]]
+
+
+def split_items(lines: list[str], indent: int) -> list[list[str]]:
+    """Split a block sequence at indent into its items."""
+    prefix = " " * indent + "- "
+    items: list[list[str]] = []
+    for line in lines:
+        if line.startswith(prefix) or not items:
+            items.append([line])
+        else:
+            items[-1].append(line)
+    return items
+
+
+def split_keys(lines: list[str], indent: int) -> list[tuple[str, list[str]]]:
+    """Split a block mapping at indent into its keys and the lines of each.
+
+    PyYAML doesn't indent sequences in mappings, so a key's lines include items
+    at the same indent as the key.
+    """
+    keys: list[tuple[str, list[str]]] = []
+    for line in lines:
+        rest = line[indent:]
+        if (
+            not blank(line)
+            and line[:indent].strip() == ""
+            and not rest.startswith((" ", "- "))
+        ) or not keys:
+            keys.append((rest.split(":", 1)[0], [line]))
+        else:
+            keys[-1][1].append(line)
+    return keys
+
+
 def session_info(
     session: str, profile_name: str | None, profile_dir: Path
 ) -> tuple[Profile, Path]:
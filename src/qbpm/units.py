@@ -0,0 +1,55 @@
+import itertools
+import math
+
+SIZE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB"]
+
+
+def format_size(size: float) -> str:
+    for unit in SIZE_UNITS[:-1]:
+        if abs(size) < 1024:  # noqa: PLR2004
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} {SIZE_UNITS[-1]}"
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes like 5G, 500MiB, or 1.5 GB. Units are powers of 1024."""
+    number = text.strip().rstrip("Bb").removesuffix("i")
+    exponent = 0
+    if number and number[-1].upper() in "KMGT":
+        exponent = "KMGT".index(number[-1].upper()) + 1
+        number = number[:-1]
+    try:
+        size = float(number) * 1024**exponent
+    except ValueError:
+        raise ValueError(f"invalid size: {text}") from None
+    if not math.isfinite(size) or size < 0:
+        raise ValueError(f"invalid size: {text}")
+    return int(size)
+
+
+def format_duration(seconds: float) -> str:
+    """Format durations like 3d 4h, 2h 5m, 5m 30s or 12s."""
+    seconds = int(seconds)
+    units = [("d", 86400), ("h", 3600), ("m", 60), ("s", 1)]
+    for (unit, length), (small_unit, small_length) in itertools.pairwise(units):
+        if seconds >= length:
+            small = seconds % length // small_length
+            return f"{seconds // length}{unit} {small}{small_unit}"
+    return f"{seconds}s"
+
+
+def parse_duration(text: str) -> float:
+    """Parse durations like 90, 90s, 30m, 1.5h or 2d into seconds."""
+    number = text.strip()
+    length = 1
+    if number and number[-1].lower() in "smhd":
+        length = {"s": 1, "m": 60, "h": 3600, "d": 86400}[number[-1].lower()]
+        number = number[:-1]
+    try:
+        seconds = float(number) * length
+    except ValueError:
+        raise ValueError(f"invalid duration: {text}") from None
+    if not math.isfinite(seconds) or seconds < 0:
+        raise ValueError(f"invalid duration: {text}")
+    return seconds
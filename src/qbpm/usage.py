@@ -0,0 +1,171 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import Profile, cache
+from .cache import stable_mtime
+
+CATEGORIES = ["cache", "webengine", "history", "sessions", "config", "other"]
+
+
+def category(relative: str) -> str:
+    """Which part of a qutebrowser basedir a path relative to it belongs to."""
+    top, _, rest = relative.partition("/")
+    if top in ("cache", "config"):
+        return top
+    if top == "data":
+        if rest == "webengine" or rest.startswith("webengine/"):
+            return "webengine"
+        if rest == "sessions" or rest.startswith("sessions/"):
+            return "sessions"
+        if rest.startswith("history.sqlite"):
+            return "history"
+    return "other"
+
+
+@dataclass
+class DirRecord:
+    """Disk usage of the files directly in a directory."""
+
+    mtime_ns: int
+    sizes: Counter[str] = field(default_factory=Counter)
+    # files with more than one link are only counted once per profile
+    links: list[tuple[int, int, str, int]] = field(default_factory=list)
+    subdirs: list[str] = field(default_factory=list)
+
+    def to_json(self) -> list:
+        return [self.mtime_ns, self.sizes, self.links, self.subdirs]
+
+    @classmethod
+    def from_json(cls, data: list) -> "DirRecord":
+        mtime_ns, sizes, links, subdirs = data
+        return cls(mtime_ns, Counter(sizes), [tuple(link) for link in links], subdirs)
+
+
+@dataclass
+class ProfileUsage:
+    name: str
+    sizes: Counter[str]
+
+    @property
+    def total(self) -> int:
+        return sum(self.sizes.values())
+
+    def size(self, column: str) -> int:
+        return self.total if column == "total" else self.sizes[column]
+
+    def to_json(self) -> dict[str, str | int]:
+        return {
+            "name": self.name,
+            **{column: self.size(column) for column in ["total", *CATEGORIES]},
+        }
+
+
+def read_dir(path: Path, relative: str, mtime_ns: int) -> DirRecord:
+    record = DirRecord(mtime_ns)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if is_dir:
+                record.subdirs.append(entry.name)
+            st = entry.stat(follow_symlinks=False)
+            # like du, count allocated blocks rather than apparent size
+            size = st.st_blocks * 512
+            name = f"{relative}/{entry.name}" if relative else entry.name
+            if st.st_nlink > 1 and not is_dir:
+                record.links.append((st.st_dev, st.st_ino, category(name), size))
+            else:
+                record.sizes[category(name)] += size
+    return record
+
+
+class UsageScanner:
+    """Measures profiles, reusing the results for directories whose mtime hasn't
+    changed since the last scan.
+
+    Adding, removing, or renaming files changes a directory's mtime, and so does
+    most of what QtWebEngine and qutebrowser write: cache entries are new files,
+    and sqlite and leveldb create and delete journals and logs as they go.
+    """
+
+    def __init__(self, cached: dict[str, DirRecord]) -> None:
+        self.cached = cached
+        self.records: dict[str, DirRecord] = {}
+
+    def record(self, path: Path, relative: str) -> DirRecord | None:
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            return None
+        key = str(path)
+        record = self.cached.get(key)
+        if not record or record.mtime_ns != mtime_ns:
+            try:
+                record = read_dir(path, relative, mtime_ns)
+            except OSError:
+                return None
+        if stable_mtime(mtime_ns):
+            self.records[key] = record
+        return record
+
+    def scan(self, profile: Profile) -> ProfileUsage:
+        sizes: Counter[str] = Counter()
+        seen: set[tuple[int, int]] = set()
+        stack = [(profile.root, "")]
+        while stack:
+            path, relative = stack.pop()
+            record = self.record(path, relative)
+            if not record:
+                continue
+            sizes.update(record.sizes)
+            for dev, ino, name, size in record.links:
+                if (dev, ino) not in seen:
+                    seen.add((dev, ino))
+                    sizes[name] += size
+            for subdir in record.subdirs:
+                stack.append((path / subdir, f"{relative}/{subdir}".lstrip("/")))
+        return ProfileUsage(profile.name, sizes)
+
+
+def disk_usage(
+    profiles: list[Profile], use_cache: bool = True, jobs: int | None = None
+) -> list[ProfileUsage]:
+    """Measure profiles in parallel, each broken down by CATEGORIES."""
+    if not profiles:
+        return []
+    key = str(profiles[0].profile_dir.absolute())
+    cached = {
+        path: DirRecord.from_json(record)
+        for path, record in ((use_cache and cache.load("du", key)) or {}).items()
+    }
+    scanner = UsageScanner(cached)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        usage = list(executor.map(scanner.scan, profiles))
+    # keep what's cached for profiles that weren't scanned this time
+    roots = tuple(f"{profile.root}{os.sep}" for profile in profiles)
+    kept = {
+        path: record
+        for path, record in cached.items()
+        if not f"{path}{os.sep}".startswith(roots)
+    }
+    records = kept | scanner.records
+    cache.store("du", key, {path: record.to_json() for path, record in records.items()})
+    return usage
+
+
+def tree_size(path: Path) -> int:
+    """Disk space used by a directory and everything in it."""
+    size = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    size += entry.stat(follow_symlinks=False).st_blocks * 512
+        except OSError:
+            continue
+    return size
@@ -0,0 +1,127 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import Profile
+from .log import error, info
+from .processes import running_profiles
+from .units import format_size
+
+# relative to a profile's data directory. Chromium has moved Cookies into
+# Network, which one depends on the QtWebEngine version
+DATABASES = [
+    Path("history.sqlite"),
+    Path("webengine/Cookies"),
+    Path("webengine/Network/Cookies"),
+    Path("webengine/Web Data"),
+]
+HISTORY = Path("history.sqlite")
+SQLITE_HEADER = b"SQLite format 3\0"
+DEFAULT_JOBS = 4
+# how long to wait for a lock held by anything else that has the database open
+BUSY_TIMEOUT = 10
+
+
+@dataclass
+class Result:
+    profile: Profile
+    database: Path
+    before: int
+    after: int
+
+
+def database_size(path: Path) -> int:
+    size = 0
+    for suffix in ("", "-wal", "-journal"):
+        with suppress(FileNotFoundError):
+            size += path.with_name(path.name + suffix).stat().st_size
+    return size
+
+
+def find_databases(profile: Profile) -> list[Path]:
+    found = []
+    for relative in DATABASES:
+        path = profile.root / "data" / relative
+        try:
+            with path.open("rb") as f:
+                if f.read(len(SQLITE_HEADER)) == SQLITE_HEADER:
+                    found.append(path)
+        except OSError:
+            continue
+    return found
+
+
+def prune_history(db: sqlite3.Connection, cutoff: float) -> int:
+    """Delete history visited before cutoff, in seconds since the epoch.
+
+    Returns the number of visits deleted.
+    """
+    deleted = db.execute("DELETE FROM History WHERE atime < ?", (cutoff,)).rowcount
+    db.execute("DELETE FROM CompletionHistory WHERE last_atime < ?", (cutoff,))
+    return deleted
+
+
+def vacuum_database(path: Path, prune_before: float | None) -> None:
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    try:
+        if prune_before is not None and path.name == HISTORY.name:
+            deleted = prune_history(db, prune_before)
+            info(f"deleted {deleted} visits from {path}")
+        db.execute("VACUUM")
+        db.execute("ANALYZE")
+        # VACUUM goes through the write-ahead log in WAL mode, so empty it last
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.close()
+
+
+def vacuum_profile(profile: Profile, prune_before: float | None) -> list[Result | None]:
+    """Vacuum each of a profile's databases. Those that failed are None."""
+    results: list[Result | None] = []
+    for path in find_databases(profile):
+        before = database_size(path)
+        try:
+            vacuum_database(path, prune_before)
+        except sqlite3.Error as e:
+            error(f"vacuuming {path} failed: {e}")
+            results.append(None)
+            continue
+        results.append(
+            Result(profile, path.relative_to(profile.root), before, database_size(path))
+        )
+    return results
+
+
+def vacuum(
+    profiles: list[Profile], prune_days: float | None = None, jobs: int | None = None
+) -> bool:
+    """Compact and analyze the SQLite databases of profiles that aren't running.
+
+    With prune_days, history older than that many days is deleted first.
+    """
+    running = running_profiles(profiles)
+    stopped = []
+    for profile in profiles:
+        if profile.name in running:
+            info(f"skipping {profile.name}, it is running")
+        else:
+            stopped.append(profile)
+    prune_before = None
+    if prune_days is not None:
+        prune_before = time.time() - prune_days * 24 * 60 * 60
+    with ThreadPoolExecutor(max_workers=jobs or DEFAULT_JOBS) as executor:
+        found = executor.map(lambda p: vacuum_profile(p, prune_before), stopped)
+        attempted = [result for results in found for result in results]
+    results = [result for result in attempted if result]
+    for result in results:
+        print(
+            f"{result.profile.name}  {result.database}  "
+            f"{format_size(result.before)} -> {format_size(result.after)}"
+        )
+    before = sum(result.before for result in results)
+    after = sum(result.after for result in results)
+    print(f"{format_size(before)} -> {format_size(after)}")
+    return len(results) == len(attempted)
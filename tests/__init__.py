@@ -1,12 +1,89 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
 from os import environ
 from pathlib import Path
 
 import pytest
 
+from qbpm import Profile
+
+# stands in for qutebrowser and a QtWebEngine process it started
+FAKE_QUTEBROWSER = f"""\
+#!{sys.executable}
+import subprocess, sys, time
+subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+open("ready", "w").close()
+time.sleep(30)
+"""
+
+
+def write_script(parent_dir: Path, name: str = "menu", contents: str = "") -> Path:
+    parent_dir.mkdir(exist_ok=True)
+    script = parent_dir / name
+    script.write_text(f"#!/bin/sh\n{contents}")
+    script.chmod(0o700)
+    return script
+
+
+def make_profile(
+    tmp_path: Path, name: str, *dirs: str, files: dict[str, bytes] | None = None
+) -> Profile:
+    """A profile in tmp_path/profiles that passes profiles.check, with dirs and
+    files relative to its root."""
+    profile = Profile(name, tmp_path / "profiles")
+    (profile.root / "config").mkdir(parents=True)
+    for relative in dirs:
+        (profile.root / relative).mkdir(parents=True, exist_ok=True)
+    for relative, data in (files or {}).items():
+        (profile.root / relative).parent.mkdir(parents=True, exist_ok=True)
+        (profile.root / relative).write_bytes(data)
+    return profile
+
 
 @pytest.fixture(autouse=True)
 def no_homedir_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     environ["XDG_CONFIG_HOME"] = str(tmp_path)
     environ["XDG_DATA_HOME"] = str(tmp_path)
+    environ["XDG_CACHE_HOME"] = str(tmp_path / "cache")
+    environ["XDG_STATE_HOME"] = str(tmp_path / "state")
+    environ["XDG_RUNTIME_DIR"] = str(tmp_path / "runtime")
     monkeypatch.setattr("qbpm.paths.get_app_dir", lambda *_args, **_kwargs: tmp_path)
     monkeypatch.setattr("qbpm.paths.Path.home", lambda: tmp_path)
+    monkeypatch.setattr("qbpm.cache._memory", {})
+
+
+@pytest.fixture(name="short_tmp_path")
+def short_tmp_path_fixture() -> Iterator[Path]:
+    """A directory for profiles with IPC sockets, whose paths can be at most about
+    100 characters long, unlike tmp_path."""
+    with tempfile.TemporaryDirectory(dir="/tmp") as directory:
+        yield Path(directory)
+
+
+@pytest.fixture(name="fake_qutebrowser")
+def fake_qutebrowser_fixture(tmp_path: Path) -> Iterator[Profile]:
+    """A process that looks like qutebrowser running profile "a" of two."""
+    profile = Profile("a", tmp_path / "profiles")
+    (profile.root / "config").mkdir(parents=True)
+    (tmp_path / "profiles" / "b" / "config").mkdir(parents=True)
+    script = tmp_path / "qutebrowser"
+    script.write_text(FAKE_QUTEBROWSER)
+    script.chmod(0o755)
+    process = subprocess.Popen(
+        [str(script), "-B", "a", "--untrusted-args"],
+        cwd=profile.profile_dir,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 5
+    while not (profile.profile_dir / "ready").exists():
+        assert process.poll() is None
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    yield profile
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
@@ -1,18 +1,14 @@
+import os
 from os import environ
 from pathlib import Path
 
+from qbpm import Profile
 from qbpm.choose import choose_profile, find_menu
 from qbpm.config import Config
+from qbpm.index import record_launch
+from qbpm.menus import Dmenu, detect_menu
 
-from . import no_homedir_fixture  # noqa: F401
-
-
-def write_script(parent_dir: Path, name: str = "menu", contents: str = "") -> Path:
-    parent_dir.mkdir(exist_ok=True)
-    menu = parent_dir / name
-    menu.write_text(f"#!/bin/sh\n{contents}")
-    menu.chmod(0o700)
-    return menu
+from . import no_homedir_fixture, write_script  # noqa: F401
 
 
 def test_choose(tmp_path: Path):
@@ -72,7 +68,7 @@ def test_override_menu_priority(tmp_path: Path):
 
 def test_custom_menu():
     dmenu = find_menu("/bin/sh -c")
-    assert dmenu is not None
+    assert isinstance(dmenu, Dmenu)
     assert dmenu.command(["p1"], "prompt", "args") == ["/bin/sh", "-c"]
 
 
@@ -94,7 +90,7 @@ def test_custom_menu_default_args(tmp_path: Path):
     environ["PATH"] = str(tmp_path / "bin")
     environ["DISPLAY"] = ":1"
     dmenu = find_menu(str(menu))
-    assert dmenu is not None
+    assert isinstance(dmenu, Dmenu)
     assert [
         str(menu),
         "-dmenu",
@@ -112,5 +108,43 @@ def test_custom_menu_custom_args(tmp_path: Path):
     environ["PATH"] = str(tmp_path / "bin")
     environ["DISPLAY"] = ":1"
     dmenu = find_menu(command)
-    assert dmenu is not None
+    assert isinstance(dmenu, Dmenu)
     assert [str(menu), "-custom", "-dmenu"] == dmenu.command([], "prompt", "")
+
+
+def test_choose_frecency(tmp_path: Path):
+    log = tmp_path / "log"
+    menu = write_script(tmp_path / "bin", contents=f"cat > {log}")
+    environ["PATH"] = "/usr/bin:/bin"
+    profile_dir = tmp_path / "profiles"
+    for name in ["p1", "p2", "p3"]:
+        (profile_dir / name).mkdir(parents=True)
+    record_launch(Profile("p3", profile_dir))
+    record_launch(Profile("p2", profile_dir))
+    record_launch(Profile("p2", profile_dir))
+    config = Config(profile_directory=profile_dir, menu=str(menu), menu_prompt="")
+    config.choose_order = "frecency"
+    choose_profile(config, False, ())
+    assert log.read_text() == "p2\np3\np1"
+
+
+def test_cached_menu(tmp_path: Path):
+    bin_dir = tmp_path / "bin"
+    write_script(bin_dir, name="dmenu")
+    environ["PATH"] = str(bin_dir)
+    environ["DISPLAY"] = ":1"
+    os.utime(bin_dir, (1000, 1000))
+    assert isinstance(detect_menu(), Dmenu)
+    # unchanged $PATH directory, so the cached result is used
+    (bin_dir / "dmenu").unlink()
+    write_script(bin_dir, name="rofi")
+    os.utime(bin_dir, (1000, 1000))
+    menu = detect_menu()
+    assert menu is not None
+    assert menu.name() == "dmenu"
+    menu = detect_menu(use_cache=False)
+    assert menu is not None
+    assert menu.name() == "rofi"
+    (bin_dir / "rofi").unlink()
+    os.utime(bin_dir, (2000, 2000))
+    assert detect_menu() is None
@@ -1,5 +1,7 @@
+import os
 from pathlib import Path
 
+from qbpm import cache
 from qbpm.config import (
     DEFAULT_CONFIG_FILE,
     Config,
@@ -83,3 +85,50 @@ def test_find_qb_config_default(tmp_path: Path):
 def test_find_qutebrowser_none(tmp_path: Path):
     assert find_qutebrowser_config_dir(None) is None
     assert find_qutebrowser_config_dir(tmp_path / "config") is None
+
+
+def test_cached_config(tmp_path: Path):
+    file = tmp_path / "config.toml"
+    file.write_text("menu_prompt = 'one'")
+    os.utime(file, (0, 0))
+    assert find_config(file).menu_prompt == "one"
+    # same size and mtime, so the cached config is used
+    file.write_text("menu_prompt = 'two'")
+    os.utime(file, (0, 0))
+    assert find_config(file).menu_prompt == "one"
+    os.utime(file, (1, 1))
+    assert find_config(file).menu_prompt == "two"
+
+
+def test_cached_config_not_shared(tmp_path: Path):
+    file = tmp_path / "config.toml"
+    file.write_text("[resources.p]\nnice = 10\n")
+    os.utime(file, (0, 0))
+    find_config(file).resources["p"].nice = 5
+    config = find_config(file)
+    assert config.resources["p"].nice == 10  # noqa: PLR2004
+    config.resources["p"].nice = 5
+    assert find_config(file).resources["p"].nice == 10  # noqa: PLR2004
+
+
+def test_cached_config_defaults(tmp_path: Path):
+    file = tmp_path / "config.toml"
+    file.write_text("menu_prompt = 'one'")
+    os.utime(file, (0, 0))
+    find_config(file)
+    os.environ["XDG_DATA_HOME"] = str(tmp_path / "data")
+    assert find_config(file) == Config(menu_prompt="one")
+    assert find_config(file).profile_directory.parent == tmp_path / "data"
+
+
+def test_cached_config_from_disk(tmp_path: Path):
+    file = tmp_path / "config.toml"
+    file.write_text(
+        "profile_directory = '~/profiles'\n"
+        "[[routes]]\nprofile = 'work'\ndomains = ['example.com']\n"
+        "[resources.p]\nnice = 10\n"
+    )
+    os.utime(file, (0, 0))
+    config = find_config(file)
+    cache._memory.clear()
+    assert find_config(file) == config
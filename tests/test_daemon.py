@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from pathlib import Path
+
+import pytest
+
+import qbpm
+from qbpm.client import forward, forwardable, socket_path
+from qbpm.daemon import daemon_running
+
+from . import no_homedir_fixture, write_script  # noqa: F401
+
+
+@pytest.fixture
+def daemon() -> Iterator[subprocess.Popen[bytes]]:
+    src = Path(qbpm.__file__).parent.parent
+    p = subprocess.Popen(
+        [sys.executable, "-m", "qbpm", "daemon"],
+        env={**environ, "PYTHONPATH": str(src)},
+        stdin=subprocess.DEVNULL,
+    )
+    path = Path(socket_path() or "")
+    deadline = time.monotonic() + 10
+    while not daemon_running(path) and p.poll() is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert daemon_running(path)
+    yield p
+    p.terminate()
+    p.wait(5)
+    assert not path.exists()
+
+
+def test_forwardable():
+    assert forwardable(["launch", "p", "a.com"])
+    assert forwardable(["desktop", "p"])
+    assert not forwardable([])
+    assert not forwardable(["new", "p"])
+    assert not forwardable(["-P", "/tmp", "launch", "p"])
+    assert not forwardable(["launch", "-f", "p"])
+    assert not forwardable(["launch", "p", "--foreground"])
+
+
+def test_menu_commands_in_terminal(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys.stdin, "isatty", lambda: True)
+    assert not forwardable(["choose"])
+    assert not forwardable(["open", "--", "https://example.com"])
+    assert not forwardable(["history", "search", "--open", "example"])
+    assert forwardable(["launch", "p"])
+    monkeypatch.setattr(sys.stdin, "isatty", lambda: False)
+    assert forwardable(["open", "--", "https://example.com"])
+
+
+def test_no_daemon():
+    assert forward(["launch", "p"]) is None
+
+
+def test_forward_launch(
+    tmp_path: Path,
+    daemon: subprocess.Popen[bytes],  # noqa: ARG001
+):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "p" / "config").mkdir(parents=True)
+    log = tmp_path / "log"
+    write_script(tmp_path / "bin", name="qutebrowser", contents=f'echo "$@" > {log}')
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    assert forward(["launch", "p", "a.com"]) == 0
+    assert log.read_text().startswith(f"-B {tmp_path / 'profiles' / 'p'} ")
+    assert log.read_text().endswith(" a.com\n")
+
+
+def test_launched_stderr_not_kept_open(
+    tmp_path: Path,
+    daemon: subprocess.Popen[bytes],  # noqa: ARG001
+):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "p" / "config").mkdir(parents=True)
+    log = tmp_path / "log"
+    # more than fits in a pipe, written once qbpm stopped waiting for qutebrowser
+    write_script(
+        tmp_path / "bin",
+        name="qutebrowser",
+        contents=f"sleep 0.5\nhead -c 1000000 /dev/zero >&2\necho done > {log}",
+    )
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    assert forward(["launch", "p"]) == 0
+    deadline = time.monotonic() + 5
+    while not log.exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_forward_launch_resources(
+    tmp_path: Path,
+    daemon: subprocess.Popen[bytes],  # noqa: ARG001
+):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "p" / "config").mkdir(parents=True)
+    log = tmp_path / "log"
+    write_script(
+        tmp_path / "bin",
+        name="qutebrowser",
+        contents=f"{sys.executable} -c 'import os; print(os.nice(0))' >> {log}",
+    )
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    # a config file, so the daemon keeps it cached
+    (tmp_path / "qbpm").mkdir()
+    (tmp_path / "qbpm" / "config.toml").write_text(
+        "[resources.p]\nmax_open_files = 100\n"
+    )
+    os.utime(tmp_path / "qbpm" / "config.toml", (0, 0))
+    base = os.nice(0)
+    # options given to one launch don't stick to the daemon's config
+    for args, launches in ((["--nice", "7"], 1), ([], 2)):
+        assert forward(["launch", *args, "p"]) == 0
+        deadline = time.monotonic() + 5
+        while len(log.read_text().split() if log.exists() else []) < launches:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    assert log.read_text().split() == [str(min(base + 7, 19)), str(base)]
+
+
+def test_requests_run_concurrently(
+    tmp_path: Path,
+    daemon: subprocess.Popen[bytes],  # noqa: ARG001
+):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "p" / "config").mkdir(parents=True)
+    write_script(tmp_path / "bin", name="qutebrowser", contents="exit 0")
+    # a user taking their time to choose
+    menu = write_script(tmp_path / "bin", contents="sleep 2\necho p")
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    with ThreadPoolExecutor() as executor:
+        chosen = executor.submit(forward, ["choose", "--menu", str(menu)])
+        time.sleep(0.2)
+        start = time.monotonic()
+        assert forward(["launch", "p"]) == 0
+        assert time.monotonic() - start < 1
+        assert not chosen.done()
+        assert chosen.result() == 0
+
+
+def test_forward_error(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    daemon: subprocess.Popen[bytes],  # noqa: ARG001
+):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    assert forward(["launch", "missing"]) == 1
+    assert "missing does not exist" in capsys.readouterr().err
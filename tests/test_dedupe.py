@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from qbpm.dedupe import SQLITE_HEADER, dedupe, excluded, find_duplicates, scan
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+SIZE = 100_000
+
+
+def write(path: Path, data: bytes, read_only: bool = False) -> None:
+    path.write_bytes(data)
+    if read_only:
+        path.chmod(0o444)
+
+
+def test_excluded():
+    assert excluded(Path("config"))
+    assert excluded(Path("runtime"))
+    assert excluded(Path("data/sessions"))
+    assert excluded(Path("data/state"))
+    assert excluded(Path("data/history.sqlite-journal"))
+    assert excluded(Path("data/webengine/Local Storage/leveldb/000003.log"))
+    assert not excluded(Path("data/blocked-hosts"))
+    assert not excluded(Path("data/webengine/Local Storage/leveldb/000005.ldb"))
+
+
+def test_find_duplicates(tmp_path: Path):
+    a, b, c = (make_profile(tmp_path, name, "data") for name in ("a", "b", "c"))
+    data = os.urandom(SIZE)
+    for profile in (a, b, c):
+        write(profile.root / "data" / "blocked-hosts", data)
+    # same size and prefix, different contents
+    write(a.root / "data" / "other", data[:-1] + b"x")
+    # identical databases are never candidates
+    database = SQLITE_HEADER + os.urandom(SIZE)
+    write(a.root / "data" / "history.sqlite", database)
+    write(b.root / "data" / "history.sqlite", database)
+    write(a.root / "config" / "big", data)
+    write(a.root / "data" / "small", b"small")
+    write(b.root / "data" / "small", b"small")
+
+    candidates = [c for profile in (a, b, c) for c in scan(profile, False)]
+    [group] = find_duplicates(candidates)
+    assert {candidate.path for candidate in group} == {
+        profile.root / "data" / "blocked-hosts" for profile in (a, b, c)
+    }
+
+
+def test_dry_run(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    a, b = (make_profile(tmp_path, name, "data") for name in ("a", "b"))
+    data = os.urandom(SIZE)
+    write(a.root / "data" / "file", data)
+    write(b.root / "data" / "file", data)
+    assert dedupe([a, b], dry_run=True)
+    assert capsys.readouterr().out.endswith("1 duplicate files, 97.7 KiB reclaimable\n")
+    assert not (a.root / "data" / "file").samefile(b.root / "data" / "file")
+
+
+def test_hardlink(tmp_path: Path):
+    a, b = (make_profile(tmp_path, name, "data") for name in ("a", "b"))
+    data = os.urandom(SIZE)
+    write(a.root / "data" / "read-only", data, read_only=True)
+    write(b.root / "data" / "read-only", data, read_only=True)
+    write(a.root / "data" / "writable", data)
+    write(b.root / "data" / "writable", data)
+    assert dedupe([a, b], hardlink=True)
+    assert (a.root / "data" / "read-only").samefile(b.root / "data" / "read-only")
+    assert not (a.root / "data" / "writable").samefile(b.root / "data" / "writable")
+
+
+def test_reflink(tmp_path: Path, caplog: pytest.LogCaptureFixture):
+    a, b = (make_profile(tmp_path, name, "data") for name in ("a", "b"))
+    data = os.urandom(SIZE)
+    write(a.root / "data" / "file", data)
+    write(b.root / "data" / "file", data)
+    if not dedupe([a, b]):
+        assert "doesn't support reflinks" in caplog.text
+    assert (b.root / "data" / "file").read_bytes() == data
+    assert not (a.root / "data" / "file").samefile(b.root / "data" / "file")
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from os import environ
+from pathlib import Path
+
+import pytest
+
+import qbpm
+from qbpm import ephemeral
+from qbpm.config import Config
+from qbpm.ephemeral import SparePool, launch_ephemeral, remove_stale_profiles
+from qbpm.paths import default_ephemeral_profile_dir
+
+from . import no_homedir_fixture  # noqa: F401
+
+# stands in for qutebrowser: listens on the IPC socket for its basedir and
+# writes every message it receives to a log in the basedir
+STAND_IN = """\
+#!{python}
+import socket, sys
+from pathlib import Path
+sys.path.insert(0, {src!r})
+from qbpm import Profile
+from qbpm.ipc import socket_path
+
+basedir = Path(sys.argv[sys.argv.index("-B") + 1])
+with (basedir / "args").open("w") as args:
+    print(*sys.argv[1:], file=args)
+path = socket_path(Profile(basedir.name, basedir.parent))
+path.parent.mkdir(parents=True, exist_ok=True)
+server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+server.bind(str(path))
+server.listen()
+server.settimeout(10)
+while True:
+    conn, _ = server.accept()
+    with conn, (basedir / "messages").open("a") as log:
+        log.write(conn.makefile().read())
+"""
+
+
+@pytest.fixture
+def stand_in(tmp_path: Path) -> Iterator[None]:
+    (tmp_path / "config.py").touch()
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "qutebrowser"
+    src = str(Path(qbpm.__file__).parent.parent)
+    script.write_text(STAND_IN.format(python=sys.executable, src=src))
+    script.chmod(0o700)
+    environ["PATH"] = f"{bin_dir}:/usr/bin:/bin"
+    # tmp_path is too long for the socket paths of profiles inside it
+    with tempfile.TemporaryDirectory() as cache_dir:
+        environ["XDG_CACHE_HOME"] = cache_dir
+        yield
+
+
+@pytest.fixture
+def pool() -> Iterator[SparePool]:
+    spares = SparePool()
+    ephemeral.pool = spares
+    yield spares
+    ephemeral.pool = None
+    spares.shutdown()
+    for spare in spares.in_use:
+        spare.stop()
+
+
+def messages(root: Path) -> list[dict]:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if (root / "messages").exists():
+            return [json.loads(line) for line in (root / "messages").open()]
+        time.sleep(0.01)
+    return []
+
+
+def test_cold_launch(stand_in: None, capsys: pytest.CaptureFixture[str]):  # noqa: ARG001
+    assert launch_ephemeral(Config(), False, ("a.com",))
+    root = Path(capsys.readouterr().out.strip())
+    assert root.parent == default_ephemeral_profile_dir()
+    assert (root / "config").is_dir()
+    assert (root / "args").read_text().endswith(" a.com\n")
+
+
+def test_spare_handoff(
+    stand_in: None,  # noqa: ARG001
+    pool: SparePool,
+    capsys: pytest.CaptureFixture[str],
+):
+    config = Config(spare_instances=1)
+    pool.maintain(config)
+    assert len(pool.spares) == 1
+    spare = pool.spares[0]
+    assert launch_ephemeral(config, False, ("a.com",))
+    assert Path(capsys.readouterr().out.strip()) == spare.profile.root
+    assert "--nowindow" in (spare.profile.root / "args").read_text()
+    [message] = messages(spare.profile.root)
+    assert message["args"] == ["a.com"]
+    assert message["target_arg"] == "window"
+    # the spare that was used is replaced
+    assert pool.in_use == [spare]
+    assert len(pool.spares) == 1
+    assert pool.spares[0] is not spare
+
+
+def test_idle_eviction(stand_in: None, pool: SparePool):  # noqa: ARG001
+    config = Config(spare_instances=2, spare_idle_timeout=60)
+    pool.maintain(config)
+    spares = list(pool.spares)
+    assert len(spares) == 2  # noqa: PLR2004
+    pool.last_used -= 120
+    pool.maintain(config)
+    assert not pool.spares
+    assert not any(spare.alive() for spare in spares)
+    assert not any(spare.profile.root.exists() for spare in spares)
+
+
+def test_pool_disabled(stand_in: None, pool: SparePool):  # noqa: ARG001
+    pool.maintain(Config())
+    assert not pool.spares
+    assert pool.take() is None
+
+
+def test_remove_stale_profiles():
+    stale = default_ephemeral_profile_dir() / "ephemeral-stale"
+    recent = default_ephemeral_profile_dir() / "ephemeral-recent"
+    stale.mkdir(parents=True)
+    recent.mkdir()
+    os.utime(stale, (1000, 1000))
+    remove_stale_profiles()
+    assert not stale.exists()
+    assert recent.exists()
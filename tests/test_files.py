@@ -0,0 +1,41 @@
+import os
+from pathlib import Path
+
+from qbpm.files import copy_file, copy_tree
+
+from . import no_homedir_fixture  # noqa: F401
+
+
+def test_copy_file(tmp_path: Path):
+    src = tmp_path / "src"
+    src.write_bytes(os.urandom(3 << 20))
+    os.utime(src, (1000, 1000))
+    method = copy_file(src, tmp_path / "dst")
+    assert method in ("reflink", "copy_file_range", "copy")
+    assert (tmp_path / "dst").read_bytes() == src.read_bytes()
+    assert (tmp_path / "dst").stat().st_mtime == 1000  # noqa: PLR2004
+
+
+def test_copy_tree(tmp_path: Path):
+    src = tmp_path / "src"
+    (src / "a" / "b").mkdir(parents=True)
+    (src / "a" / "b" / "file").write_text("file")
+    (src / "skipped").mkdir()
+    (src / "skipped" / "file").touch()
+    (src / "link").symlink_to("a/b/file")
+    read_only = src / "read-only"
+    read_only.write_text("read only")
+    read_only.chmod(0o444)
+    os.mkfifo(src / "fifo")
+
+    methods = copy_tree(
+        src, tmp_path / "dst", lambda path: path == Path("skipped"), hardlink=True
+    )
+    dst = tmp_path / "dst"
+    assert sorted(p.name for p in dst.iterdir()) == ["a", "link", "read-only"]
+    assert (dst / "a" / "b" / "file").read_text() == "file"
+    assert (dst / "link").readlink() == Path("a/b/file")
+    assert (dst / "read-only").samefile(read_only)
+    assert not (dst / "a" / "b" / "file").samefile(src / "a" / "b" / "file")
+    assert methods["hardlink"] == 1
+    assert methods["symlink"] == 1
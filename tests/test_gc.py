@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import pytest
+
+from qbpm import Profile, ipc
+from qbpm.gc import collect, lock
+from qbpm.index import ProfileIndex
+from qbpm.units import parse_size
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+SIZE = 100_000
+
+
+# caches that gc evicts, and cookies that it keeps
+FILES = {
+    "cache/webengine/entry": b"x" * SIZE,
+    "data/webengine/GPUCache/data_1": b"x" * SIZE,
+    "data/webengine/Cookies": b"x" * SIZE,
+}
+
+
+def launched_in_order(*profiles: Profile) -> None:
+    index = ProfileIndex.load(profiles[0].profile_dir)
+    for launched, profile in enumerate(profiles, start=1):
+        index.profiles[profile.name].last_launch = launched * 1000
+    index.save()
+
+
+def evicted(profile: Profile) -> bool:
+    return (
+        not (profile.root / "cache").exists()
+        and not (profile.root / "data" / "webengine" / "GPUCache").exists()
+    )
+
+
+def test_parse_size():
+    assert parse_size("5G") == 5 << 30
+    assert parse_size("500MiB") == 500 << 20
+    assert parse_size("1.5 KB") == 1536  # noqa: PLR2004
+    assert parse_size("100") == 100  # noqa: PLR2004
+    for invalid in ("", "G", "five", "-1G", "inf"):
+        with pytest.raises(ValueError, match="invalid size"):
+            parse_size(invalid)
+
+
+def test_least_recently_launched_first(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    old, middle, recent = (
+        make_profile(tmp_path, name, files=FILES)
+        for name in ("old", "middle", "recent")
+    )
+    launched_in_order(old, middle, recent)
+    # room for the caches of a bit more than one profile
+    assert collect(old.profile_dir, 3 * SIZE)
+    assert evicted(old)
+    assert evicted(middle)
+    assert not evicted(recent)
+    assert (old.root / "data" / "webengine" / "Cookies").exists()
+    assert "reclaimed" in capsys.readouterr().out
+
+
+def test_within_budget(tmp_path: Path):
+    profiles = [make_profile(tmp_path, name, files=FILES) for name in ("a", "b")]
+    assert collect(profiles[0].profile_dir, 1 << 30)
+    assert not any(map(evicted, profiles))
+
+
+def test_skip_running(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    old, recent = (
+        make_profile(tmp_path, name, files=FILES) for name in ("old", "recent")
+    )
+    launched_in_order(old, recent)
+    monkeypatch.setattr(ipc, "is_running", lambda profile: profile.name == "old")
+    assert collect(old.profile_dir, 3 * SIZE)
+    assert not evicted(old)
+    assert evicted(recent)
+
+
+def test_dry_run(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    old, recent = (
+        make_profile(tmp_path, name, files=FILES) for name in ("old", "recent")
+    )
+    launched_in_order(old, recent)
+    assert collect(old.profile_dir, 0, dry_run=True)
+    assert not evicted(old)
+    assert not evicted(recent)
+    out = capsys.readouterr().out
+    assert out.startswith("old  ")
+    assert "would reclaim" in out
+
+
+def test_concurrent_run(tmp_path: Path):
+    profile = make_profile(tmp_path, "a", files=FILES)
+    fd = lock(profile.profile_dir)
+    assert fd is not None
+    assert lock(profile.profile_dir) is None
+    assert collect(profile.profile_dir, 0)
+    assert not evicted(profile)
@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from qbpm import Profile, hibernate, ipc
+from qbpm.config import Config
+from qbpm.hibernate import CHECK_INTERVAL, IdleWatcher, find_idle, hibernate_profiles
+from qbpm.index import record_launch
+from qbpm.processes import Instance
+from qbpm.units import parse_duration
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+HOUR = 60 * 60
+
+
+# visited a page just now
+HISTORY = {"data/history.sqlite": b""}
+
+
+@pytest.fixture(autouse=True)
+def all_running_fixture(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Every profile is running, and started long ago."""
+    monkeypatch.setattr(
+        "qbpm.hibernate.running_instances",
+        lambda selected: {p.name: Instance(p.name, started=1000) for p in selected},
+    )
+
+
+def visited_long_ago(profile: Profile) -> None:
+    os.utime(profile.root / "data" / "history.sqlite", (1000, 1000))
+
+
+def test_parse_duration():
+    assert parse_duration("90") == 90  # noqa: PLR2004
+    assert parse_duration("30m") == 30 * 60
+    assert parse_duration("1.5h") == 1.5 * HOUR
+    assert parse_duration("2d") == 48 * HOUR
+    for invalid in ("", "h", "-1h", "5x", "infh"):
+        with pytest.raises(ValueError, match="invalid duration"):
+            parse_duration(invalid)
+
+
+def test_find_idle(tmp_path: Path):
+    active, idle, launched = (
+        make_profile(tmp_path, name, files=HISTORY)
+        for name in ("active", "idle", "launched")
+    )
+    visited_long_ago(idle)
+    visited_long_ago(launched)
+    record_launch(launched)
+    assert [p.name for p, _ in find_idle([active, idle, launched], HOUR)] == ["idle"]
+    assert len(find_idle([active, idle, launched], None)) == 3  # noqa: PLR2004
+
+
+def test_find_idle_without_start_time(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    profile = make_profile(tmp_path, "a", files=HISTORY)
+    visited_long_ago(profile)
+    # running_instances can't tell when qutebrowser started without /proc
+    monkeypatch.setattr(
+        "qbpm.hibernate.running_instances",
+        lambda selected: {p.name: Instance(p.name) for p in selected},
+    )
+    assert find_idle([profile], HOUR) == []
+    assert [p for p, _ in find_idle([profile], None)] == [profile]
+
+
+def test_hibernate_profiles(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+):
+    active, idle = (
+        make_profile(tmp_path, name, files=HISTORY) for name in ("active", "idle")
+    )
+    visited_long_ago(idle)
+    sent = []
+
+    def send(profile: Profile, args: tuple[str, ...]) -> bool:
+        sent.append((profile.name, args))
+        return True
+
+    monkeypatch.setattr(ipc, "send", send)
+    monkeypatch.setattr(ipc, "is_running", lambda _: False)
+    assert hibernate_profiles([active, idle], HOUR, dry_run=True)
+    assert not sent
+    assert hibernate_profiles([active, idle], HOUR)
+    assert sent == [("idle", (":quit --save",))]
+    assert capsys.readouterr().out.startswith("idle  idle ")
+    monkeypatch.setattr(ipc, "send", lambda *_: False)
+    assert not hibernate_profiles([idle], HOUR)
+
+
+def test_idle_watcher(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    profiles = [make_profile(tmp_path, name, files=HISTORY) for name in ("a", "b", "c")]
+    for profile in profiles:
+        visited_long_ago(profile)
+    sent = []
+
+    def send(profile: Profile, _args: tuple[str, ...]) -> bool:
+        sent.append(profile.name)
+        return True
+
+    monkeypatch.setattr(ipc, "send", send)
+    config = Config(
+        profile_directory=tmp_path / "profiles",
+        hibernate_after=HOUR,
+        hibernate_exclude=["b"],
+    )
+    watcher = IdleWatcher()
+    # too soon after the daemon started
+    watcher.maintain(config)
+    assert not sent
+    watcher.last_check -= CHECK_INTERVAL
+    watcher.maintain(Config(profile_directory=tmp_path / "profiles"))
+    assert not sent
+    watcher.maintain(config)
+    assert sorted(sent) == ["a", "c"]
+    # still quitting
+    watcher.last_check -= CHECK_INTERVAL
+    watcher.maintain(config)
+    assert sorted(sent) == ["a", "c"]
+    # a quits, then is launched again and left idle
+    running_instances = hibernate.running_instances
+    monkeypatch.setattr(
+        "qbpm.hibernate.running_instances",
+        lambda _: {"c": Instance("c", started=1000)},
+    )
+    watcher.last_check -= CHECK_INTERVAL
+    watcher.maintain(config)
+    monkeypatch.setattr("qbpm.hibernate.running_instances", running_instances)
+    watcher.last_check -= CHECK_INTERVAL
+    watcher.maintain(config)
+    assert sorted(sent) == ["a", "a", "c"]
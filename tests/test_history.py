@@ -0,0 +1,64 @@
+import sqlite3
+from pathlib import Path
+
+from qbpm import Profile
+from qbpm.history import search
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+
+def profile_with_visits(
+    tmp_path: Path, name: str, *visits: tuple[str, str, int]
+) -> Profile:
+    profile = make_profile(tmp_path, name, "data")
+    db = sqlite3.connect(profile.root / "data" / "history.sqlite")
+    with db:
+        db.execute("CREATE TABLE CompletionHistory (url, title, last_atime)")
+        db.executemany("INSERT INTO CompletionHistory VALUES (?, ?, ?)", visits)
+    db.close()
+    return profile
+
+
+def test_search(tmp_path: Path):
+    a = profile_with_visits(
+        tmp_path,
+        "a",
+        ("https://example.com/one", "One", 100),
+        ("https://example.com/three", "Three", 300),
+        ("https://other.org/", "Example title", 50),
+    )
+    b = profile_with_visits(tmp_path, "b", ("https://example.com/two", "Two", 200))
+    c = make_profile(tmp_path, "c")
+    visits = list(search([a, b, c], "example.com"))
+    assert [(v.profile, v.atime) for v in visits] == [
+        ("a", 300),
+        ("b", 200),
+        ("a", 100),
+    ]
+    assert [v.url for v in search([a, b], "EXAMPLE")][-1] == "https://other.org/"
+    assert [v.title for v in search([a, b], "example three")] == ["Three"]
+    assert [v.atime for v in search([a, b], "example.com", limit=2)] == [300, 200]
+
+
+def test_search_special_characters(tmp_path: Path):
+    a = profile_with_visits(
+        tmp_path,
+        "a",
+        ("https://example.com/a_b", "", 100),
+        ("https://example.com/axb", "", 200),
+        ("https://example.com/100%", "", 300),
+    )
+    assert [v.url for v in search([a], "a_b")] == ["https://example.com/a_b"]
+    assert [v.url for v in search([a], "%")] == ["https://example.com/100%"]
+
+
+def test_search_glob(tmp_path: Path):
+    a = profile_with_visits(
+        tmp_path,
+        "a",
+        ("https://example.com/", "", 100),
+        ("https://sub.example.com/page", "", 200),
+        ("https://example.org/example.com", "", 300),
+    )
+    visits = search([a], "https://*example.com/*", glob=True)
+    assert [v.atime for v in visits] == [200, 100]
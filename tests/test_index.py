@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+
+from qbpm import Profile
+from qbpm.index import (
+    FRECENCY_HALF_LIFE,
+    ProfileIndex,
+    profile_names,
+    record_launch,
+)
+from qbpm.launch import launch_qutebrowser
+
+from . import no_homedir_fixture  # noqa: F401
+
+
+def make_profile_dir(tmp_path: Path) -> Path:
+    (tmp_path / "profiles").mkdir()
+    return tmp_path / "profiles"
+
+
+def test_profile_names(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p2").mkdir()
+    (profile_dir / "p1" / "config").mkdir(parents=True)
+    assert profile_names(profile_dir) == ["p1", "p2"]
+    index = ProfileIndex.load(profile_dir)
+    assert index.profiles["p1"].valid
+    assert not index.profiles["p2"].valid
+    (profile_dir / "p2").rmdir()
+    assert profile_names(profile_dir) == ["p1"]
+
+
+def test_staged_and_backed_up_profiles_not_listed(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    for name in ("p1", ".p2.clone", "p2.bak"):
+        (profile_dir / name / "config").mkdir(parents=True)
+    assert profile_names(profile_dir) == ["p1"]
+
+
+def test_revalidate_on_profile_mtime_change(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    (profile_dir / "p2" / "config").mkdir(parents=True)
+    for path in (profile_dir / "p1", profile_dir / "p2", profile_dir):
+        os.utime(path, (1000, 1000))
+    index = ProfileIndex.load(profile_dir)
+    assert not index.profiles["p1"].valid
+    assert index.profiles["p2"].valid
+    # neither changes the profile directory's mtime
+    (profile_dir / "p1" / "config").mkdir()
+    (profile_dir / "p2" / "config").rmdir()
+    for path in (profile_dir / "p1", profile_dir / "p2", profile_dir):
+        os.utime(path, (1000, 1000))
+    os.utime(profile_dir / "p1", (2000, 2000))
+    assert ProfileIndex.load(profile_dir).profiles["p1"].valid
+    os.utime(profile_dir / "p2", (2000, 2000))
+    os.utime(profile_dir, (2000, 2000))
+    assert not ProfileIndex.load(profile_dir).profiles["p2"].valid
+
+
+def test_missing_profile_dir(tmp_path: Path):
+    assert profile_names(tmp_path / "profiles") == []
+
+
+def test_rescan_on_mtime_change(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    os.utime(profile_dir, (1000, 1000))
+    assert profile_names(profile_dir) == ["p1"]
+    (profile_dir / "p2").mkdir()
+    os.utime(profile_dir, (1000, 1000))
+    assert profile_names(profile_dir) == ["p1"]
+    os.utime(profile_dir, (2000, 2000))
+    assert profile_names(profile_dir) == ["p1", "p2"]
+
+
+def test_record_launch(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    record_launch(Profile("p1", profile_dir))
+    record_launch(Profile("p1", profile_dir))
+    entry = ProfileIndex.load(profile_dir).profiles["p1"]
+    assert entry.launch_count == 2  # noqa: PLR2004
+    assert entry.last_launch
+    assert entry.created <= entry.last_launch
+
+
+def test_concurrent_record_launch(tmp_path: Path):
+    from concurrent.futures import ProcessPoolExecutor
+
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    profiles = [Profile("p1", profile_dir)] * 20
+    with ProcessPoolExecutor(4) as executor:
+        list(executor.map(record_launch, profiles))
+    entry = ProfileIndex.load(profile_dir).profiles["p1"]
+    assert entry.launch_count == len(profiles)
+
+
+def test_failed_launch_not_recorded(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    os.environ["PATH"] = str(tmp_path / "bin")
+    assert not launch_qutebrowser(Profile("p1", profile_dir), False)
+    assert ProfileIndex.load(profile_dir).profiles["p1"].launch_count == 0
+
+
+def test_corrupt_index(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    (profile_dir / "p1").mkdir()
+    index = ProfileIndex.load(profile_dir)
+    index.path().write_text("{")
+    assert profile_names(profile_dir) == ["p1"]
+
+
+def test_frecency(tmp_path: Path):
+    profile_dir = make_profile_dir(tmp_path)
+    index = ProfileIndex.load(profile_dir)
+    index.record_launch(Profile("p1", profile_dir))
+    entry = index.profiles["p1"]
+    assert entry.last_launch
+    now = entry.last_launch
+    assert index.frecency("p1", now) == 1
+    assert index.frecency("p1", now + FRECENCY_HALF_LIFE) == 0.5  # noqa: PLR2004
+    index.record_launch(Profile("p1", profile_dir))
+    assert index.frecency("p1", now) > 1
+    assert index.frecency("p2", now) == 0
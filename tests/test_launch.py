@@ -0,0 +1,149 @@
+import json
+import socket
+import sys
+import time
+from os import environ
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from qbpm import Profile
+from qbpm.ipc import ipc_args, socket_path
+from qbpm.launch import launch_qutebrowser
+from qbpm.main import main
+
+from . import no_homedir_fixture, short_tmp_path_fixture, write_script  # noqa: F401
+
+
+def listen(profile: Profile) -> socket.socket:
+    path = socket_path(profile)
+    path.parent.mkdir(parents=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    return server
+
+
+def receive(server: socket.socket):
+    conn, _ = server.accept()
+    with conn:
+        return json.loads(conn.makefile().readline())
+
+
+def test_ipc_args():
+    assert ipc_args(()) == ([], None)
+    assert ipc_args(("a.com", ":cmd")) == (["a.com", ":cmd"], None)
+    assert ipc_args(("-t", "window", "a.com")) == (["a.com"], "window")
+    assert ipc_args(("--target=tab", "a.com")) == (["a.com"], "tab")
+    assert ipc_args(("--untrusted-args", "a.com")) == (["a.com"], None)
+    assert ipc_args(("--untrusted-args", ":quit")) is None
+    assert ipc_args(("--target", "nowhere")) is None
+    assert ipc_args(("--debug",)) is None
+
+
+def test_send_to_running_instance(tmp_path: Path, short_tmp_path: Path):
+    environ["PATH"] = str(tmp_path / "bin")
+    profile = Profile("p", short_tmp_path)
+    with listen(profile) as server:
+        assert launch_qutebrowser(profile, False, ("-t", "window", "a.com"))
+        message = receive(server)
+    assert message["args"] == ["a.com"]
+    assert message["target_arg"] == "window"
+    assert message["protocol_version"] == 1
+
+
+def test_launch_without_instance(tmp_path: Path):
+    log = tmp_path / "log"
+    write_script(tmp_path / "bin", name="qutebrowser", contents=f'echo "$@" > {log}')
+    environ["PATH"] = str(tmp_path / "bin")
+    profile = Profile("p", tmp_path)
+    assert launch_qutebrowser(profile, True, ("a.com",))
+    assert log.read_text().startswith(f"-B {profile.root} ")
+
+
+def fake_qutebrowser(tmp_path: Path, contents: str) -> None:
+    write_script(tmp_path / "bin", name="qutebrowser", contents=contents)
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+
+
+def test_wait_ready(tmp_path: Path, short_tmp_path: Path):
+    profile = Profile("p", short_tmp_path)
+    ipc_socket = socket_path(profile)
+    listen_later = (
+        "import socket, time; time.sleep(0.2); s = socket.socket(socket.AF_UNIX);"
+        f"s.bind('{ipc_socket}'); s.listen(); time.sleep(5)"
+    )
+    fake_qutebrowser(
+        tmp_path,
+        f'mkdir -p {ipc_socket.parent}\nexec {sys.executable} -c "{listen_later}"',
+    )
+    start = time.monotonic()
+    assert launch_qutebrowser(profile, False, (), wait_ready=3)
+    assert time.monotonic() - start < 3  # noqa: PLR2004
+
+
+def test_wait_ready_stale_socket(tmp_path: Path, short_tmp_path: Path):
+    profile = Profile("p", short_tmp_path)
+    # left behind by a qutebrowser that crashed
+    socket_path(profile).parent.mkdir(parents=True)
+    socket_path(profile).touch()
+    fake_qutebrowser(tmp_path, "sleep 5")
+    assert not launch_qutebrowser(profile, False, (), wait_ready=0.2)
+
+
+def test_wait_ready_without_profile(tmp_path: Path):
+    fake_qutebrowser(tmp_path, "sleep 5")
+    start = time.monotonic()
+    assert launch_qutebrowser(None, False, (), wait_ready=3)
+    assert time.monotonic() - start < 1
+
+
+def test_wait_ready_timeout(tmp_path: Path):
+    fake_qutebrowser(tmp_path, "sleep 5")
+    assert not launch_qutebrowser(Profile("p", tmp_path), False, (), wait_ready=0.2)
+
+
+def test_early_exit(tmp_path: Path, capfd: pytest.CaptureFixture[str]):
+    fake_qutebrowser(tmp_path, "echo invalid >&2\nexit 1")
+    assert not launch_qutebrowser(Profile("p", tmp_path), False, ())
+    assert "invalid" in capfd.readouterr().out
+
+
+def test_validation_is_bounded(tmp_path: Path):
+    fake_qutebrowser(tmp_path, "sleep 5")
+    start = time.monotonic()
+    assert launch_qutebrowser(Profile("p", tmp_path), False, ())
+    assert time.monotonic() - start < 1
+
+
+def test_open_routed_url(tmp_path: Path):
+    log = tmp_path / "log"
+    write_script(tmp_path / "bin", name="qutebrowser", contents=f'echo "$@" > {log}')
+    environ["PATH"] = str(tmp_path / "bin")
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "work" / "config").mkdir(parents=True)
+    config = tmp_path / "config.toml"
+    config.write_text('[[routes]]\nprofile = "work"\ndomains = ["example.com"]\n')
+    result = CliRunner().invoke(
+        main, ["-c", str(config), "open", "-f", "--", "https://example.com/"]
+    )
+    assert result.exit_code == 0
+    assert log.read_text().startswith(f"-B {tmp_path / 'profiles' / 'work'} ")
+    assert log.read_text().endswith(" --untrusted-args https://example.com/\n")
+
+
+def test_open_without_url(tmp_path: Path):
+    log = tmp_path / "log"
+    write_script(tmp_path / "bin", name="qutebrowser", contents=f'echo "$@" > {log}')
+    menu = write_script(tmp_path / "bin", contents="echo work")
+    environ["PATH"] = str(tmp_path / "bin")
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "work" / "config").mkdir(parents=True)
+    config = tmp_path / "config.toml"
+    config.write_text(f'menu = "{menu}"\n')
+    # what the desktop file runs when there is no url to open
+    result = CliRunner().invoke(main, ["-c", str(config), "open", "-f", "--"])
+    assert result.exit_code == 0
+    assert log.read_text().startswith(f"-B {tmp_path / 'profiles' / 'work'} ")
+    assert "--untrusted-args" not in log.read_text()
@@ -1,11 +1,17 @@
+import json
+import re
+import sqlite3
+import subprocess
+import sys
 from os import chdir, environ
 from pathlib import Path
 
 from click.testing import CliRunner
 
+import qbpm
 from qbpm.main import main
 
-from . import no_homedir_fixture  # noqa: F401
+from . import no_homedir_fixture, write_script  # noqa: F401
 
 
 def run(*args: str):
@@ -133,3 +139,181 @@ def test_desktop_file_directory(tmp_path: Path):
         desktop_file_directory="{tmp_path}"''')
     run("-P", str(tmp_path), "new", "-C", str(tmp_path), "test")
     assert not (tmp_path / "test.desktop").exists()
+
+
+# generous enough for slow machines, tight enough to catch a heavy import
+IMPORT_BUDGET_US = 250_000
+SUBCOMMAND_MODULES = {
+    "dacite",
+    "tomllib",
+    "qbpm.choose",
+    "qbpm.desktop",
+    "qbpm.launch",
+    "qbpm.menus",
+    "qbpm.profiles",
+    "qbpm.session",
+}
+
+
+def import_times(*args: str) -> dict[str, int]:
+    src = Path(qbpm.__file__).parent.parent
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env={**environ, "PYTHONPATH": str(src)},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    pattern = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)")
+    return {
+        match[2]: int(match[1])
+        for match in map(pattern.match, result.stderr.splitlines())
+        if match
+    }
+
+
+def test_import_main():
+    times = import_times("-c", "import qbpm.main")
+    assert not times.keys() & SUBCOMMAND_MODULES
+    assert times["qbpm.main"] < IMPORT_BUDGET_US
+
+
+def test_client_imports():
+    times = import_times("-c", "import qbpm.client")
+    assert not times.keys() & {"click", "logging", "pathlib", "qbpm.main"}
+
+
+def test_launch_imports(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path)
+    times = import_times("-m", "qbpm", "launch", "test")
+    assert "qbpm.launch" in times
+    assert not times.keys() & {"dacite", "tomllib", "qbpm.choose", "qbpm.session"}
+
+
+def test_menus_probe(tmp_path: Path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "dmenu").touch(mode=0o700)
+    environ["PATH"] = str(tmp_path / "bin")
+    environ["DISPLAY"] = ":1"
+    result = run("menus", "--probe")
+    assert result.exit_code == 0
+    assert f"dmenu: {tmp_path / 'bin' / 'dmenu'}" in result.output
+    assert "rofi: not found" in result.output
+    assert result.output.endswith("dmenu -p {prompt}\n")
+
+
+def test_new_many(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "config.py").touch()
+    result = CliRunner().invoke(
+        main,
+        ["new-many", "-C", str(tmp_path), "a", "--file", "-"],
+        input="b https://example.com\n",
+    )
+    assert result.exit_code == 0
+    assert (tmp_path / "profiles" / "a" / "config").is_dir()
+    assert (tmp_path / "profiles" / "b" / "config").is_dir()
+    assert run("list").output == "a\nb\n"
+
+
+def test_new_with_file(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "config.py").touch()
+    result = CliRunner().invoke(
+        main,
+        ["new", "-C", str(tmp_path), "--file", "-", "a", "https://a.example.com"],
+        input="b https://b.example.com\nc\n",
+    )
+    assert result.exit_code == 0
+    assert run("list").output == "a\nb\nc\n"
+    config_py = (tmp_path / "profiles" / "a" / "config" / "config.py").read_text()
+    assert "https://a.example.com" in config_py
+    assert run("new").exit_code == 2  # noqa: PLR2004
+
+
+def test_new_many_duplicates(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    result = run("new-many", "a", "a")
+    assert result.exit_code == 1
+    assert "duplicate profile names: a" in result.output
+
+
+def test_share_adblock(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    for name in ("a", "b"):
+        (tmp_path / "profiles" / name / "config").mkdir(parents=True)
+    result = run("share-adblock")
+    assert result.exit_code == 0
+    assert result.output == "a\nb\n"
+    assert (tmp_path / "profiles" / "b" / "data" / "adblock-cache.dat").is_symlink()
+
+
+def test_du(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    for name, size in (("a", 10_000), ("b", 100_000)):
+        (tmp_path / "profiles" / name / "config").mkdir(parents=True)
+        (tmp_path / "profiles" / name / "cache").mkdir()
+        (tmp_path / "profiles" / name / "cache" / "entry").write_bytes(b"x" * size)
+    result = run("du", "--json")
+    assert result.exit_code == 0
+    usage = json.loads(result.output)
+    assert [u["name"] for u in usage] == ["b", "a"]
+    assert usage[0]["cache"] > usage[1]["cache"]
+    result = run("du", "--sort", "name")
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0].split()[:3] == ["profile", "total", "cache"]
+    assert [line.split()[0] for line in lines[1:]] == ["a", "b", "total"]
+
+
+def test_history_search(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    for name, atime in (("a", 100), ("b", 200)):
+        (tmp_path / "profiles" / name / "config").mkdir(parents=True)
+        (tmp_path / "profiles" / name / "data").mkdir()
+        db = sqlite3.connect(tmp_path / "profiles" / name / "data" / "history.sqlite")
+        with db:
+            db.execute("CREATE TABLE CompletionHistory (url, title, last_atime)")
+            db.execute(
+                "INSERT INTO CompletionHistory VALUES (?, ?, ?)",
+                (f"https://{name}.example.com/", name.upper(), atime),
+            )
+        db.close()
+    result = run("history", "search", "--json", "example")
+    assert result.exit_code == 0
+    assert [visit["profile"] for visit in json.loads(result.output)] == ["b", "a"]
+    result = run("history", "search", "-p", "a", "example")
+    assert result.exit_code == 0
+    assert result.output.endswith("  a  https://a.example.com/  A\n")
+    assert run("history", "search", "nothing").exit_code == 1
+
+
+def test_history_search_open(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "a" / "config").mkdir(parents=True)
+    (tmp_path / "profiles" / "a" / "data").mkdir()
+    db = sqlite3.connect(tmp_path / "profiles" / "a" / "data" / "history.sqlite")
+    with db:
+        db.execute("CREATE TABLE CompletionHistory (url, title, last_atime)")
+        db.execute(
+            "INSERT INTO CompletionHistory VALUES (?, ?, ?)",
+            ("--temp-basedir", "example", 100),
+        )
+    db.close()
+    log = tmp_path / "log"
+    write_script(tmp_path / "bin", name="qutebrowser", contents=f'echo "$@" > {log}')
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    result = run("history", "search", "--open", "example")
+    assert result.exit_code == 0
+    assert log.read_text().endswith(" --untrusted-args --temp-basedir\n")
+
+
+def test_from_session_compact(tmp_path: Path):
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path)
+    (tmp_path / "config.py").touch()
+    session = tmp_path / "test.yml"
+    session.write_text("windows:\n- tabs:\n  - history: []\n")
+    result = run("from-session", "-C", str(tmp_path), "--compact", "5", str(session))
+    assert result.exit_code == 0
+    autosave = tmp_path / "test/data/sessions/_autosave.yml"
+    assert autosave.read_text() == "windows: []\n"
@@ -1,4 +1,4 @@
-from qbpm.menus import Dmenu, custom_dmenu
+from qbpm.menus import BuiltinMenu, Dmenu, custom_dmenu, menu_from_json, menu_to_json
 
 
 def test_menu_prompt_formatting():
@@ -17,3 +17,10 @@ def test_known_custom_menu():
 def test_custom_menu_list():
     menu = ["fuzzel", "--dmenu", "--prompt", "{prompt}>"]
     assert custom_dmenu(menu).menu_command == menu
+
+
+def test_menu_json():
+    dmenu = Dmenu(["fuzzel", "--dmenu"])
+    assert menu_from_json(menu_to_json(dmenu)) == dmenu
+    assert isinstance(menu_from_json(menu_to_json(BuiltinMenu())), BuiltinMenu)
+    assert menu_from_json("unknown") is None
@@ -0,0 +1,62 @@
+import json
+from os import environ
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from qbpm import Profile
+from qbpm.main import main
+from qbpm.monitor import Monitor, parse_pss
+
+from . import fake_qutebrowser_fixture, no_homedir_fixture  # noqa: F401
+
+# the fake browser and its child
+PROCESSES = 2
+
+pytestmark = pytest.mark.skipif(
+    not Path("/proc/self/stat").exists(), reason="needs /proc"
+)
+
+
+def test_parse_pss():
+    assert parse_pss("Rss:  200 kB\nPss:  150 kB\nPss_Anon:  100 kB\n") == 150 * 1024
+    assert parse_pss("") is None
+
+
+def test_monitor(fake_qutebrowser: Profile):
+    with Monitor(fake_qutebrowser.profile_dir) as monitor:
+        [usage] = monitor.sample()
+        assert usage.profile == "a"
+        assert usage.processes == PROCESSES
+        assert usage.threads >= PROCESSES
+        assert usage.rss > 0
+        assert usage.cpu_percent is None
+        tracked = dict(monitor.tracked)
+        [usage] = monitor.sample()
+        assert usage.processes == PROCESSES
+        assert usage.cpu_percent is not None
+        # the same files are read again
+        assert monitor.tracked == tracked
+    assert not monitor.tracked
+    with Monitor(fake_qutebrowser.profile_dir, {"b"}) as monitor:
+        assert monitor.sample() == []
+
+
+def test_top(fake_qutebrowser: Profile):
+    environ["QBPM_PROFILE_DIR"] = str(fake_qutebrowser.profile_dir)
+    result = CliRunner().invoke(main, ["top", "--once", "-i", "0.1", "--json"])
+    assert result.exit_code == 0
+    [usage] = json.loads(result.output)
+    assert usage["profile"] == "a"
+    assert usage["processes"] == PROCESSES
+    result = CliRunner().invoke(main, ["top", "--once", "-i", "0.1", "b"])
+    assert result.exit_code == 0
+    assert result.output.split() == [
+        "profile",
+        "pss",
+        "rss",
+        "cpu%",
+        "procs",
+        "threads",
+    ]
@@ -0,0 +1,57 @@
+import os
+import termios
+import tty
+
+from qbpm.picker import Candidate, Picker, TerminalPicker, fuzzy_filter, score
+
+
+def texts(candidates: list[Candidate]) -> list[str]:
+    return [c.text for c in candidates]
+
+
+def test_score():
+    assert score("", Candidate.of("work")) == 0
+    assert score("wk", Candidate.of("Work")) is not None
+    assert score("kw", Candidate.of("work")) is None
+    assert score("x", Candidate.of("work")) is None
+
+
+def test_fuzzy_filter():
+    candidates = [Candidate.of(p) for p in ["personal", "work-mail", "mail", "wm"]]
+    assert texts(fuzzy_filter("mail", candidates)) == ["mail", "work-mail"]
+    assert texts(fuzzy_filter("wm", candidates)) == ["wm", "work-mail"]
+    assert texts(fuzzy_filter("", candidates)) == texts(candidates)
+
+
+def test_picker():
+    picker = Picker(["personal", "work", "work-mail"])
+    picker.type("wm")
+    assert texts(picker.matches) == ["work-mail"]
+    picker.backspace()
+    assert texts(picker.matches) == ["work", "work-mail"]
+    picker.move(1)
+    assert picker.selection() == "work-mail"
+    picker.type("-x")
+    picker.delete_word()
+    assert picker.query == "w-"
+    assert picker.selection() == "work-mail"
+    picker.type("x")
+    assert picker.selection() is None
+
+
+def run_picker(items: list[str], keys: str) -> str | None:
+    primary, secondary = os.openpty()
+    try:
+        tty.setraw(secondary)
+        termios.tcsetwinsize(secondary, (24, 80))
+        os.write(primary, keys.encode())
+        return TerminalPicker(Picker(items), "qb", secondary).run()
+    finally:
+        os.close(primary)
+        os.close(secondary)
+
+
+def test_terminal_picker():
+    assert run_picker(["p1", "p2", "p3"], "p\x1b[B\r") == "p2"
+    assert run_picker(["p1", "p2", "p3"], "3\x7f2\r") == "p2"
+    assert run_picker(["p1", "p2", "p3"], "p\x1b") is None
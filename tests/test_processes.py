@@ -0,0 +1,61 @@
+import json
+import time
+from os import environ
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from qbpm import Profile, ipc, processes
+from qbpm.main import main
+from qbpm.processes import basedir, find_instances, running_instances
+
+from . import fake_qutebrowser_fixture, no_homedir_fixture  # noqa: F401
+
+
+def test_basedir():
+    assert basedir(["/usr/bin/qutebrowser", "-B", "/p/a"]) == "/p/a"
+    assert basedir(["python3", "-m", "qutebrowser", "--basedir", "/p/a"]) == "/p/a"
+    assert basedir(["qutebrowser", "--basedir=/p/a", "-B"]) == "/p/a"
+    assert basedir(["qutebrowser", "https://example.com"]) is None
+    assert basedir(["sh", "-c", "echo", "qutebrowser", "-B", "/p/a"]) is None
+
+
+@pytest.mark.skipif(not Path("/proc/self/cmdline").exists(), reason="needs /proc")
+def test_find_instances(fake_qutebrowser: Profile):
+    instances = find_instances(fake_qutebrowser.profile_dir)
+    assert instances is not None
+    assert list(instances) == ["a"]
+    instance = instances["a"]
+    assert instance.pid
+    assert instance.started
+    assert instance.started < time.time() + 1
+    assert instance.rss
+    assert instance.cpu_time is not None
+    assert find_instances(fake_qutebrowser.profile_dir / "a") == {}
+
+
+def test_without_proc(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, fake_qutebrowser: Profile
+):
+    monkeypatch.setattr(processes, "PROC", tmp_path / "proc")
+    monkeypatch.setattr(ipc, "is_running", lambda profile: profile.name == "b")
+    b = Profile("b", fake_qutebrowser.profile_dir)
+    instances = running_instances([fake_qutebrowser, b])
+    assert list(instances) == ["b"]
+    assert instances["b"].pid is None
+
+
+@pytest.mark.skipif(not Path("/proc/self/cmdline").exists(), reason="needs /proc")
+def test_status(fake_qutebrowser: Profile):
+    environ["QBPM_PROFILE_DIR"] = str(fake_qutebrowser.profile_dir)
+    result = CliRunner().invoke(main, ["status"])
+    assert result.exit_code == 0
+    header, row = result.output.splitlines()
+    assert header.split() == ["profile", "pid", "uptime", "rss", "cpu"]
+    assert row.split()[0] == "a"
+    result = CliRunner().invoke(main, ["status", "--json", "a", "b"])
+    assert result.exit_code == 1
+    [instance] = json.loads(result.output)
+    assert instance["profile"] == "a"
+    assert instance["uptime"] >= 0
@@ -1,7 +1,11 @@
+import logging
 from pathlib import Path
 
+import pytest
+
 from qbpm import profiles
 from qbpm.config import Config
+from qbpm.index import profile_names
 from qbpm.profiles import Profile
 
 from . import no_homedir_fixture  # noqa: F401
@@ -174,3 +178,136 @@ def test_missing_qb_config(tmp_path: Path):
     assert not profiles.new_profile(profile, config)
     config.qutebrowser_config_directory = tmp_path / "nonexistent"
     assert not profiles.new_profile(profile, config)
+
+
+def test_new_profiles(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    (tmp_path / "config.py").touch()
+    profile_dir = tmp_path / "profiles"
+    (profile_dir / "taken").mkdir(parents=True)
+    config = Config.load(None)
+    config.qutebrowser_config_directory = tmp_path
+    config.desktop_file_directory = tmp_path / "applications"
+    config.generate_desktop_file = True
+    new = [
+        (Profile("a", profile_dir), None),
+        (Profile("taken", profile_dir), None),
+        (Profile("b", profile_dir), "https://example.com"),
+    ]
+    created = profiles.new_profiles(new, config, jobs=2)
+    assert [profile.name for profile in created] == ["a", "b"]
+    check_new_profile(created[0])
+    assert "example.com" in (profile_dir / "b/config/config.py").read_text()
+    assert sorted(p.name for p in (tmp_path / "applications").iterdir()) == [
+        "a.desktop",
+        "b.desktop",
+    ]
+    assert capsys.readouterr().out.splitlines() == [
+        f"created  a      {profile_dir / 'a'}",
+        "failed   taken",
+        f"created  b      {profile_dir / 'b'}",
+    ]
+
+
+def test_parse_manifest():
+    lines = ["a\n", "\n", "# comment\n", "  b   https://example.com  \n"]
+    assert profiles.parse_manifest(lines) == [
+        ("a", None),
+        ("b", "https://example.com"),
+    ]
+
+
+def clone_setup(tmp_path: Path) -> tuple[Profile, Config]:
+    (tmp_path / "config.py").touch()
+    config = Config.load(None)
+    config.qutebrowser_config_directory = tmp_path
+    config.generate_desktop_file = False
+    source = Profile("source", tmp_path / "profiles")
+    assert profiles.new_profile(source, config, "https://example.com")
+    (source.root / "data" / "webengine").mkdir()
+    (source.root / "data" / "webengine" / "Cookies").write_text("cookies")
+    (source.root / "runtime").mkdir()
+    (source.root / "runtime" / "ipc-socket").touch()
+    return source, config
+
+
+def test_clone_profile(tmp_path: Path):
+    source, config = clone_setup(tmp_path)
+    profile = Profile("clone", source.profile_dir)
+    assert profiles.clone_profile(source, profile, config)
+    assert (profile.root / "data" / "webengine" / "Cookies").read_text() == "cookies"
+    assert not (profile.root / "runtime").exists()
+    assert (profile.root / "data" / "qtwebengine_dictionaries").is_symlink()
+    config_py = (profile.root / "config" / "config.py").read_text()
+    assert "(clone)" in config_py
+    assert "(source)" not in config_py
+    assert "https://example.com" in config_py
+    assert not profiles.clone_profile(source, profile, config)
+
+
+def test_clone_overwrite_running(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+):
+    source, config = clone_setup(tmp_path)
+    profile = Profile("clone", source.profile_dir)
+    (profile.root / "config").mkdir(parents=True)
+    monkeypatch.setattr("qbpm.ipc.is_running", lambda _profile: True)
+    caplog.set_level(logging.WARNING)
+    assert profiles.clone_profile(source, profile, config, overwrite=True)
+    assert [r.levelno for r in caplog.records if "is running" in r.message] == [
+        logging.WARNING
+    ]
+    assert (source.profile_dir / "clone.bak").is_dir()
+    assert profile_names(source.profile_dir) == ["clone", "source"]
+
+
+def test_clone_custom_config(tmp_path: Path):
+    source, config = clone_setup(tmp_path)
+    (source.root / "config" / "config.py").write_text("# custom\n")
+    profile = Profile("clone", source.profile_dir)
+    assert profiles.clone_profile(source, profile, config)
+    assert (profile.root / "config" / "config.py").read_text() == "# custom\n"
+
+
+def test_clone_without_qutebrowser_config(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+):
+    source, config = clone_setup(tmp_path)
+    (tmp_path / "config.py").unlink()
+    (tmp_path / "autoconfig.yml").touch()
+    config.symlink_autoconfig = True
+    profile = Profile("clone", source.profile_dir)
+    assert profiles.clone_profile(source, profile, config)
+    assert (profile.root / "config" / "config.py").read_text() == (
+        source.root / "config" / "config.py"
+    ).read_text()
+    assert not [r for r in caplog.records if r.levelname == "ERROR"]
+
+
+def test_link_adblock_lists(tmp_path: Path):
+    shared = tmp_path / "qutebrowser"
+    a = Profile("a", tmp_path / "profiles")
+    b = Profile("b", tmp_path / "profiles")
+    for profile in (a, b):
+        (profile.root / "data").mkdir(parents=True)
+        (profile.root / "data" / "blocked-hosts").write_text(profile.name)
+    # the first profile's lists become the shared ones
+    profiles.link_adblock_lists(a, True)
+    assert (shared / "blocked-hosts").read_text() == "a"
+    assert (a.root / "data" / "blocked-hosts").readlink() == shared / "blocked-hosts"
+    assert (a.root / "data" / "adblock-cache.dat").is_symlink()
+    profiles.link_adblock_lists(b, False)
+    assert (b.root / "data" / "blocked-hosts").read_text() == "b"
+    profiles.link_adblock_lists(b, True)
+    assert (b.root / "data" / "blocked-hosts").read_text() == "a"
+
+
+def test_new_profile_share_adblock(tmp_path: Path):
+    (tmp_path / "config.py").touch()
+    profile = Profile("test", tmp_path / "profiles")
+    config = Config.load(None)
+    config.qutebrowser_config_directory = tmp_path
+    config.generate_desktop_file = False
+    config.share_adblock_lists = True
+    assert profiles.new_profile(profile, config)
+    hosts = profile.root / "data" / "blocked-hosts"
+    assert hosts.readlink() == tmp_path / "qutebrowser" / "blocked-hosts"
@@ -0,0 +1,96 @@
+import subprocess
+import sys
+from os import environ
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from qbpm.config import Resources
+from qbpm.main import main
+from qbpm.resources import parse_cpus, wrap
+
+from . import no_homedir_fixture, write_script  # noqa: F401
+
+# niceness and open file limit of the current process
+REPORT = (
+    "import os, resource;"
+    "print(os.nice(0), resource.getrlimit(resource.RLIMIT_NOFILE)[0])"
+)
+
+
+def test_parse_cpus():
+    assert parse_cpus("0-3,8") == [0, 1, 2, 3, 8]
+    assert parse_cpus("2, 1") == [1, 2]
+    for invalid in ("", "a", "1-", "-1", "3-1", "0,"):
+        with pytest.raises(ValueError, match="invalid CPU list"):
+            parse_cpus(invalid)
+
+
+def test_override():
+    config = Resources(nice=10, cpus="0-3")
+    assert config.override(Resources(nice=5, max_open_files=100)) == Resources(
+        nice=5, cpus="0-3", max_open_files=100
+    )
+
+
+def test_wrap_with_commands(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("qbpm.resources.shutil.which", lambda name: f"/bin/{name}")
+    resources = Resources(
+        nice=10,
+        io_class="idle",
+        cpus="2,0-1",
+        max_address_space="1G",
+        max_open_files=512,
+    )
+    assert wrap(["qutebrowser", "-B", "p"], resources) == (
+        [
+            *("prlimit", f"--as={1 << 30}", "--nofile=512"),
+            *("nice", "-n", "10"),
+            *("ionice", "-c", "3"),
+            *("taskset", "-c", "0,1,2"),
+            *("qutebrowser", "-B", "p"),
+        ],
+        None,
+    )
+    assert wrap(["qutebrowser"], Resources(io_priority=7))[0] == [
+        *("ionice", "-c", "2", "-n", "7", "qutebrowser")
+    ]
+    with pytest.raises(ValueError, match="invalid I/O priority"):
+        wrap(["qutebrowser"], Resources(io_priority=8))
+    with pytest.raises(ValueError, match="invalid size"):
+        wrap(["qutebrowser"], Resources(max_address_space="lots"))
+
+
+def test_wrap_without_commands(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("qbpm.resources.shutil.which", lambda _: None)
+    args, preexec = wrap(
+        [sys.executable, "-c", REPORT], Resources(nice=5, max_open_files=100)
+    )
+    assert args == [sys.executable, "-c", REPORT]
+    assert preexec is not None
+    output = subprocess.run(
+        args, preexec_fn=preexec, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.split() == ["5", "100"]
+
+
+def test_launch_with_resources(tmp_path: Path):
+    log = tmp_path / "log"
+    write_script(
+        tmp_path / "bin",
+        name="qutebrowser",
+        contents=f"{sys.executable} -c '{REPORT}' > {log}",
+    )
+    environ["PATH"] = f"{tmp_path / 'bin'}:/usr/bin:/bin"
+    environ["QBPM_PROFILE_DIR"] = str(tmp_path / "profiles")
+    (tmp_path / "profiles" / "p" / "config").mkdir(parents=True)
+    (tmp_path / "config.toml").write_text(
+        "[resources.p]\nnice = 10\nmax_open_files = 100\n"
+    )
+    result = CliRunner().invoke(
+        main,
+        ["-c", str(tmp_path / "config.toml"), "launch", "-f", "p", "--nice", "3"],
+    )
+    assert result.exit_code == 0
+    assert log.read_text().split() == ["3", "100"]
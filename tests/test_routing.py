@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from qbpm.config import Config, Route
+from qbpm.routing import Router, compiled, route
+
+from . import no_homedir_fixture  # noqa: F401
+
+
+def test_domains():
+    router = Router.compile(
+        [
+            Route("work", domains=["example.com", "*.corp.example.org"]),
+            Route("sub", domains=["sub.example.com"]),
+        ]
+    )
+    assert router.match("https://example.com/") == "work"
+    assert router.match("https://www.EXAMPLE.com/page") == "work"
+    # the first route wins even though the second is more specific
+    assert router.match("https://sub.example.com/") == "work"
+    assert router.match("https://a.corp.example.org/") == "work"
+    assert router.match("https://notexample.com/") is None
+    assert router.match("https://example.com.evil.net/") is None
+    assert router.match("example.com/no-scheme") == "work"
+
+
+def test_globs_and_regexes():
+    router = Router.compile(
+        [
+            Route("github", globs=["https://github.com/example/*"]),
+            Route("jira", regexes=[r"^https://[^/]*\.atlassian\.net/"]),
+            Route("search", regexes=["[?&]q="]),
+            Route("any", regexes=["(?i)EXAMPLE"]),
+        ]
+    )
+    assert router.match("https://github.com/example/repo") == "github"
+    assert router.match("https://github.com/other/repo") is None
+    assert router.match("https://corp.atlassian.net/browse/X-1") == "jira"
+    assert router.match("https://duckduckgo.com/?q=x") == "search"
+    assert router.match("https://search.example/?q=x") == "search"
+    assert router.match("https://www.example.net/") == "any"
+
+
+def test_first_match_across_kinds():
+    router = Router.compile(
+        [
+            Route("regex", regexes=["/docs/"]),
+            Route("domain", domains=["example.com"]),
+            Route("grouped", regexes=["(docs|wiki)"]),
+        ]
+    )
+    assert router.match("https://example.com/docs/") == "regex"
+    assert router.match("https://example.com/wiki/") == "domain"
+    assert router.match("https://example.net/wiki/") == "grouped"
+
+
+def test_many_routes():
+    routes = [Route(f"p{i}", domains=[f"site{i}.com"]) for i in range(5000)]
+    routes += [Route(f"g{i}", globs=[f"*://glob{i}.org/*"]) for i in range(200)]
+    router = Router.compile(routes)
+    assert router.match("https://www.site4321.com/") == "p4321"
+    assert router.match("https://glob199.org/x") == "g199"
+    assert router.match("https://nothing.com/") is None
+
+
+def test_route(tmp_path: Path):
+    config = Config(routes=[Route("work", domains=["example.com"])])
+    compiled.cache_clear()
+    assert route(config, "https://example.com/") == "work"
+    # the second lookup uses the cached router
+    assert route(config, "https://example.com/") == "work"
+    assert compiled.cache_info().hits == 1
+    assert route(Config(), "https://example.com/") is None
+    with pytest.raises(SystemExit):
+        route(Config(routes=[Route("bad", regexes=["("])]), "https://example.com/")
+    config_file = tmp_path / "config.toml"
+    config_file.write_text('[[routes]]\nprofile = "work"\ndomains = ["example.com"]\n')
+    assert Config.load(config_file).routes == config.routes
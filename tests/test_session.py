@@ -0,0 +1,194 @@
+from pathlib import Path
+
+import pytest
+
+from qbpm import Profile, ipc
+from qbpm.config import Config
+from qbpm.session import (
+    SessionSplit,
+    compact_profile_session,
+    compact_session,
+    profiles_from_split_session,
+    split_session,
+)
+
+from . import no_homedir_fixture  # noqa: F401
+
+# as qutebrowser writes it, with PyYAML's block style and sorted keys
+SESSION = """\
+windows:
+- active: true
+  geometry: !!binary |
+    AdnQywADAAAAAAAAAAAAAAAAB38AAAQ3AAAAAAAAAAAAAAd/AAAENwAAAAACAAAAB4AAAAAAAAAA
+    AAAAB38AAAQ3
+  tabs:
+  - active: true
+    history:
+    - last_visited: '2024-01-01T00:00:01'
+      pinned: false
+      scroll-pos:
+        x: 0
+        y: 100
+      title: One
+      url: https://example.com/1
+      zoom: 1.0
+    - last_visited: '2024-01-01T00:00:02'
+      original-url: https://example.com/redirect
+      pinned: false
+      scroll-pos:
+        x: 0
+        y: 200
+      title: a long title that PyYAML folds over more than one line because it's
+        longer than eighty characters
+      url: https://example.com/2
+      zoom: 1.0
+    - active: true
+      last_visited: '2024-01-01T00:00:03'
+      pinned: false
+      scroll-pos:
+        x: 0
+        y: 300
+      title: Three
+      url: https://example.com/3
+      zoom: 1.5
+    - last_visited: '2024-01-01T00:00:04'
+      pinned: false
+      scroll-pos:
+        x: 0
+        y: 400
+      title: Four
+      url: https://example.com/4
+      zoom: 1.0
+  - history: []
+- geometry: !!binary |
+    AdnQywADAAAAAAAAAAAAAAAAB38AAAQ3
+  tabs: []
+"""
+
+COMPACTED = """\
+windows:
+- active: true
+  geometry: !!binary |
+    AdnQywADAAAAAAAAAAAAAAAAB38AAAQ3AAAAAAAAAAAAAAd/AAAENwAAAAACAAAAB4AAAAAAAAAA
+    AAAAB38AAAQ3
+  tabs:
+  - active: true
+    history:
+    - last_visited: '2024-01-01T00:00:02'
+      pinned: false
+      title: a long title that PyYAML folds over more than one line because it's
+        longer than eighty characters
+      url: https://example.com/2
+    - active: true
+      last_visited: '2024-01-01T00:00:03'
+      pinned: false
+      scroll-pos:
+        x: 0
+        y: 300
+      title: Three
+      url: https://example.com/3
+      zoom: 1.5
+"""
+
+
+def compact(session: str, max_history: int) -> str:
+    return "".join(compact_session(session.splitlines(keepends=True), max_history))
+
+
+def test_compact_session():
+    assert compact(SESSION, 2) == COMPACTED
+
+
+def test_keep_forward_history():
+    compacted = compact(SESSION, 10)
+    assert "https://example.com/1\n" in compacted
+    assert "https://example.com/4\n" in compacted
+    assert "y: 100" not in compacted
+    assert "original-url" not in compacted
+
+
+def test_no_windows_left():
+    assert compact("windows:\n- tabs: []\n", 10) == "windows: []\n"
+    assert compact("windows: []\n", 10) == "windows: []\n"
+
+
+def test_compact_profile_session(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+):
+    profile = Profile("a", tmp_path / "profiles")
+    session_dir = profile.root / "data" / "sessions"
+    session_dir.mkdir(parents=True)
+    (session_dir / "_autosave.yml").write_text(SESSION)
+    monkeypatch.setattr(ipc, "is_running", lambda _: True)
+    assert not compact_profile_session(profile, "_autosave", 2)
+    assert (session_dir / "_autosave.yml").read_text() == SESSION
+    monkeypatch.setattr(ipc, "is_running", lambda _: False)
+    assert compact_profile_session(profile, "_autosave", 2)
+    assert (session_dir / "_autosave.yml").read_text() == COMPACTED
+    assert " -> " in capsys.readouterr().out
+    assert not compact_profile_session(profile, "missing", 2)
+
+
+SPLIT_SESSION = """\
+windows:
+- active: true
+  geometry: !!binary |
+    AAAA
+  tabs:
+  - history:
+    - title: One
+      url: https://www.example.com/1
+  - active: true
+    history:
+    - title: Search
+      url: https://search.org/
+    - active: true
+      title: Two
+      url: 'https://example.com/2'
+- geometry: !!binary |
+    BBBB
+  tabs:
+  - history:
+    - title: Settings
+      url: qute://settings/
+"""
+
+
+def test_split_by_window():
+    parts = split_session(SPLIT_SESSION.splitlines(keepends=True), "window")
+    assert list(parts) == ["1", "2"]
+    assert "".join(parts["1"]) == SPLIT_SESSION[: SPLIT_SESSION.index("- geometry")]
+    assert "".join(parts["2"]) == (
+        "windows:\n" + SPLIT_SESSION[SPLIT_SESSION.index("- geometry") :]
+    )
+
+
+def test_split_by_domain():
+    parts = split_session(SPLIT_SESSION.splitlines(keepends=True), "domain")
+    assert list(parts) == ["example.com", "qute"]
+    assert (
+        "".join(parts["example.com"])
+        == SPLIT_SESSION[: SPLIT_SESSION.index("- geometry")]
+    )
+    assert "".join(parts["qute"]).startswith("windows:\n- geometry: !!binary |\n")
+
+
+def test_split_profiles(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    (tmp_path / "config.py").touch()
+    session = tmp_path / "work.yml"
+    session.write_text(SPLIT_SESSION)
+    config = Config(
+        qutebrowser_config_directory=tmp_path,
+        profile_directory=tmp_path / "profiles",
+        generate_desktop_file=False,
+    )
+    created = profiles_from_split_session(
+        str(session), None, config, SessionSplit("domain", max_history=1)
+    )
+    assert created
+    assert [profile.name for profile in created] == ["work-example.com", "work-qute"]
+    autosave = created[0].root / "data" / "sessions" / "_autosave.yml"
+    assert "search.org" not in autosave.read_text()
+    assert "work-qute" in capsys.readouterr().out
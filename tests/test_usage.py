@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+from qbpm import Profile, cache
+from qbpm.usage import category, disk_usage
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+
+def filled_profile(tmp_path: Path, name: str) -> Profile:
+    return make_profile(
+        tmp_path,
+        name,
+        files={
+            "config/config.py": b"c" * 5000,
+            "cache/webengine/entry": b"e" * 50_000,
+            "data/webengine/Cookies": b"w" * 20_000,
+            "data/history.sqlite": b"h" * 30_000,
+            "data/sessions/default.yml": b"s" * 10_000,
+        },
+    )
+
+
+def blocks(path: Path) -> int:
+    return os.lstat(path).st_blocks * 512
+
+
+def backdate(root: Path) -> None:
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (1000, 1000))
+
+
+def test_category():
+    assert category("cache/webengine/Cache_Data/index") == "cache"
+    assert category("config/config.py") == "config"
+    assert category("data/webengine/Local Storage/leveldb/000003.log") == "webengine"
+    assert category("data/history.sqlite") == "history"
+    assert category("data/history.sqlite-journal") == "history"
+    assert category("data/sessions/default.yml") == "sessions"
+    assert category("data/blocked-hosts") == "other"
+    assert category("runtime") == "other"
+
+
+def test_disk_usage(tmp_path: Path):
+    a = filled_profile(tmp_path, "a")
+    b = filled_profile(tmp_path, "b")
+    (b.root / "data" / "history.sqlite").unlink()
+    usage_a, usage_b = disk_usage([a, b])
+    assert usage_a.name == "a"
+    assert usage_a.sizes["cache"] >= blocks(a.root / "cache" / "webengine" / "entry")
+    assert usage_a.sizes["history"] == blocks(a.root / "data" / "history.sqlite")
+    assert usage_a.sizes["sessions"] >= blocks(
+        a.root / "data" / "sessions" / "default.yml"
+    )
+    assert usage_b.sizes["history"] == 0
+    assert usage_a.total == sum(usage_a.sizes.values())
+    assert usage_a.to_json()["total"] == usage_a.total
+
+
+def test_hardlinks_counted_once(tmp_path: Path):
+    profile = filled_profile(tmp_path, "a")
+    entry = profile.root / "cache" / "webengine" / "entry"
+    before = disk_usage([profile], use_cache=False)[0].sizes["cache"]
+    (entry.parent / "link").hardlink_to(entry)
+    assert disk_usage([profile], use_cache=False)[0].sizes["cache"] == before
+
+
+def test_unchanged_directories_are_cached(tmp_path: Path):
+    profile = filled_profile(tmp_path, "a")
+    backdate(profile.root)
+    [before] = disk_usage([profile])
+    # grow a file without changing its directory's mtime
+    with (profile.root / "data" / "history.sqlite").open("ab") as f:
+        f.write(b"h" * 100_000)
+    os.utime(profile.root / "data", (1000, 1000))
+    assert disk_usage([profile])[0].sizes == before.sizes
+    [rescanned] = disk_usage([profile], use_cache=False)
+    assert rescanned.sizes["history"] > before.sizes["history"]
+    # adding a file changes the directory's mtime
+    (profile.root / "data" / "sessions" / "other.yml").write_bytes(b"s" * 10_000)
+    [changed] = disk_usage([profile])
+    assert changed.sizes["sessions"] > before.sizes["sessions"]
+
+
+def test_cached_from_disk(tmp_path: Path):
+    profile = filled_profile(tmp_path, "a")
+    entry = profile.root / "cache" / "webengine" / "entry"
+    (entry.parent / "link").hardlink_to(entry)
+    backdate(profile.root)
+    [before] = disk_usage([profile])
+    cache._memory.clear()
+    assert disk_usage([profile])[0].sizes == before.sizes
+    assert cache._memory["du"]
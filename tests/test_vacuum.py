@@ -0,0 +1,76 @@
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from qbpm import Profile
+from qbpm.vacuum import find_databases, vacuum
+
+from . import make_profile, no_homedir_fixture  # noqa: F401
+
+DAY = 24 * 60 * 60
+
+
+def profile_with_history(tmp_path: Path, name: str) -> Profile:
+    profile = make_profile(tmp_path, name, "data/webengine")
+    db = sqlite3.connect(profile.root / "data" / "history.sqlite")
+    with db:
+        db.execute("CREATE TABLE History (url, title, atime, redirect)")
+        db.execute("CREATE TABLE CompletionHistory (url, title, last_atime)")
+        now = time.time()
+        for i in range(1000):
+            atime = now - (100 if i % 2 else 1) * DAY
+            url = f"https://example.com/{i}"
+            db.execute(
+                "INSERT INTO History VALUES (?, ?, ?, 0)", (url, "x" * 200, atime)
+            )
+            db.execute(
+                "INSERT INTO CompletionHistory VALUES (?, ?, ?)", (url, "", atime)
+            )
+    db.close()
+    return profile
+
+
+def history(profile: Profile) -> tuple[int, int]:
+    db = sqlite3.connect(profile.root / "data" / "history.sqlite")
+    counts = (
+        db.execute("SELECT count(*) FROM History").fetchone()[0],
+        db.execute("SELECT count(*) FROM CompletionHistory").fetchone()[0],
+    )
+    db.close()
+    return counts
+
+
+def test_find_databases(tmp_path: Path):
+    profile = profile_with_history(tmp_path, "a")
+    (profile.root / "data" / "webengine" / "Cookies").write_bytes(b"not sqlite")
+    assert find_databases(profile) == [profile.root / "data" / "history.sqlite"]
+
+
+def test_vacuum(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    profile = profile_with_history(tmp_path, "a")
+    path = profile.root / "data" / "history.sqlite"
+    db = sqlite3.connect(path)
+    with db:
+        db.execute("DELETE FROM History")
+    db.close()
+    before = path.stat().st_size
+    assert vacuum([profile])
+    assert path.stat().st_size < before
+    assert capsys.readouterr().out.startswith("a  data/history.sqlite  ")
+
+
+def test_prune(tmp_path: Path):
+    profile = profile_with_history(tmp_path, "a")
+    assert vacuum([profile], prune_days=30)
+    assert history(profile) == (500, 500)
+
+
+def test_skip_running(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    running = profile_with_history(tmp_path, "running")
+    stopped = profile_with_history(tmp_path, "stopped")
+    monkeypatch.setattr("qbpm.vacuum.running_profiles", lambda _: {"running"})
+    assert vacuum([running, stopped], prune_days=30)
+    assert history(running) == (1000, 1000)
+    assert history(stopped) == (500, 500)